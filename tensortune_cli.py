@@ -141,6 +141,11 @@ current_tuning_max_level = 0
 current_tuning_session_base_args: Dict[str, Any] = {} 
 current_tuning_model_path_local = "" # Specific to current tuning session
 current_tuning_model_analysis_local: Dict[str, Any] = {} # Specific to current tuning session
+current_tuning_vram_budget_mb: Optional[float] = None # Total VRAM budget used to size auto --blasbatchsize
+current_tuning_planned_offload: Optional[Dict[str, Any]] = None # Active byte-budget plan; replaces the level's OT/layers until G/C is used
+current_tuning_warm_start: Optional[Dict[str, Any]] = None # Nearest tuned models' GPU share when this model has no history
+current_tuning_offload_ladder: Optional[Dict[str, Any]] = None # GPU-resident MiB dial; G/C move along it instead of the OT levels
+current_tuning_level_ladder: Optional[Dict[str, Any]] = None # Per-level OT string, layers, args and predictions, built once per session args
 last_successful_monitored_run_details_cli: Optional[Dict[str, Any]] = None # For UI feedback in tuning
 
 # KCPP Monitoring state (used by tuning)
@@ -176,6 +181,10 @@ def refine_model_analysis_cli(model_analysis_dict):
     if not model_analysis_dict:
         return model_analysis_dict
 
+    # Layer counts read from the GGUF header are exact; the corrections below only patch filename guesses
+    if model_analysis_dict.get('details', {}).get('metadata_source') == 'gguf_header':
+        return model_analysis_dict
+
     # Special handling for MoE models to ensure they get enough layers
     if model_analysis_dict.get('is_moe', False):
         # Get current layer count
@@ -344,7 +353,7 @@ def select_gguf_file_cli() -> Optional[str]:
 
     print_title("Select GGUF Model / Main Menu")
 
-    main_menu_actions = { "s": "Select GGUF Model File", "l": "Launcher Settings", "h": "View Global Launch History", "q": "Quit Launcher" }
+    main_menu_actions = { "s": "Select GGUF Model File", "i": "Browse Model Library (indexed)", "l": "Launcher Settings", "h": "View Global Launch History", "q": "Quit Launcher" }
     print("Main Menu Options:"); [print(f"  ({k.upper()}) {d}") for k, d in main_menu_actions.items()]
 
     while True:
@@ -359,6 +368,15 @@ def select_gguf_file_cli() -> Optional[str]:
             view_db_history_cli()
             print_title("Select GGUF Model / Main Menu"); [print(f"  ({k.upper()}) {d}") for k, d in main_menu_actions.items()]
             continue
+        if action_choice == 'i':
+            library_selection = browse_model_library_cli()
+            if library_selection:
+                last_gguf_directory = os.path.dirname(library_selection)
+                CONFIG["last_used_gguf_dir"] = last_gguf_directory
+                tensortune_core.save_launcher_config(CONFIG)
+                return library_selection
+            print_title("Select GGUF Model / Main Menu"); [print(f"  ({k.upper()}) {d}") for k, d in main_menu_actions.items()]
+            continue
         if action_choice == 's': break
 
     tkinter_available = False
@@ -430,6 +448,57 @@ def select_gguf_file_cli() -> Optional[str]:
             print_error(f"Path '{potential_full_path}' is not a valid .gguf file. Please try again or press Enter to cancel.")
 
 
+def browse_model_library_cli() -> Optional[str]:
+    """Indexes the default and last-used GGUF directories and lets the user search and pick a model."""
+    library_dirs = [d for d in [DEFAULT_GGUF_DIR, last_gguf_directory] if d and os.path.isdir(d)]
+    if not library_dirs:
+        print_warning("No GGUF directories configured. Set a Default GGUF Directory in Launcher Settings first.")
+        return None
+
+    print_info(f"Indexing models in: {', '.join(library_dirs)}")
+    catalog, index_msg = tensortune_core.index_model_library(DB_FILE, library_dirs)
+    print_info(index_msg)
+    if not catalog:
+        print_warning("No .gguf files found in the configured directories.")
+        return None
+
+    query = ""
+    while True:
+        matches = tensortune_core.search_model_catalog(catalog, query)
+        shown = matches[:30]
+        title = f"Model Library ({len(matches)} of {len(catalog)} models" + (f" matching '{query}')" if query else ")")
+        if dependencies['rich']['module']:
+            library_table = Table(title=title)
+            for col_name, justify_opt in [("#", "right"), ("Model", "left"), ("File GB", "right"), ("Params(B)", "right"),
+                                          ("Quant", "center"), ("Layers", "right"), ("MoE", "center"), ("Est. VRAM GB", "right")]:
+                library_table.add_column(col_name, justify=justify_opt, overflow="fold")
+            for i, entry in enumerate(shown, 1):
+                library_table.add_row(str(i), entry["filename"], f"{entry['file_size_gb']:.1f}", str(entry["size_b"]), str(entry["quant"]),
+                                      str(entry["num_layers"]), "Y" if entry["is_moe"] else "N", f"{entry['estimated_vram_gb_full_gpu']:.1f}")
+            console.print(library_table)
+        else:
+            print_title(title)
+            for i, entry in enumerate(shown, 1):
+                print(f"  {i:>3}. {entry['filename'][:50]:<50} {entry['file_size_gb']:>6.1f}GB {str(entry['quant']):<9} "
+                      f"L{str(entry['num_layers']):<4} {'MoE' if entry['is_moe'] else '   '} ~{entry['estimated_vram_gb_full_gpu']:.1f}GB")
+        if len(matches) > len(shown):
+            print_info(f"{len(matches) - len(shown)} more matches not shown; refine the search.")
+
+        choice = (prompt("Number to select, text to search (e.g. 'qwen moe q4'), '*' to clear search, or Enter to go back") or "").strip()
+        if not choice:
+            return None
+        if choice == '*':
+            query = ""
+        elif choice.isdigit():
+            idx = int(choice) - 1
+            if 0 <= idx < len(shown):
+                print_success(f"Selected from library: {shown[idx]['filename']}")
+                return shown[idx]["filepath"]
+            print_error("Invalid number.")
+        else:
+            query = choice
+
+
 def _display_kcpp_capabilities_cli():
     kcpp_exe_path = CONFIG.get("koboldcpp_executable", "")
     if not kcpp_exe_path:
@@ -562,6 +631,12 @@ def manage_launcher_settings_cli():
                         else: print_error(f"Invalid index. Choose from available IDs for type '{effective_gpu_type.upper()}'.")
                     except ValueError: print_error("Invalid input. Please enter a number.")
             else: print_warning(f"No GPUs listed for type '{effective_gpu_type.upper()}'. Index remains {current_idx}.")
+            if len(gpus_found) > 1:
+                current_split_ids = ",".join(str(i) for i in tensortune_core.parse_gpu_index_list(CONFIG.get("multi_gpu_indices", [])))
+                split_ids_str = prompt("Split layers across GPU IDs (comma-separated, blank for single GPU)", default=current_split_ids)
+                CONFIG["multi_gpu_indices"] = [i for i in tensortune_core.parse_gpu_index_list(split_ids_str) if any(gpu['id'] == i for gpu in gpus_found)]
+                if len(CONFIG["multi_gpu_indices"]) > 1: print_success(f"Budget plans will split layers across GPUs {CONFIG['multi_gpu_indices']}.")
+                else: CONFIG["multi_gpu_indices"] = []; print_info("Multi-GPU split disabled.")
 
         elif choice == '6':
             print_info("VRAM Override Settings:")
@@ -1109,17 +1184,23 @@ def launch_and_monitor_for_tuning_cli():
     user_requested_stop_monitoring_cli = False 
     kcpp_success_event.clear(); kcpp_oom_event.clear(); kcpp_output_lines_shared.clear()
 
-    ot_string_for_launch = tensortune_core.generate_overridetensors(current_tuning_model_analysis_local, local_level_of_last_monitored_run)
-    args_for_kcpp_run_list = tensortune_core.build_command(
-        current_tuning_model_path_local, ot_string_for_launch,
-        current_tuning_model_analysis_local, current_tuning_session_base_args,
-        current_attempt_level_for_tuning=local_level_of_last_monitored_run
-    )
+    args_for_kcpp_run_list = _tuning_launch_args_cli(local_level_of_last_monitored_run)
     local_last_proposed_command_list_for_db = tensortune_core.get_command_to_run(KOBOLDCPP_EXECUTABLE, args_for_kcpp_run_list)
+    print_override_dry_run_cli(current_tuning_model_analysis_local, args_for_kcpp_run_list)
     
     _, _, _, gpu_info_rich_before_launch = tensortune_core.get_available_vram_mb(CONFIG)
     local_vram_at_decision_for_db = gpu_info_rich_before_launch.get("free_mb", 0.0) 
 
+    vram_prediction = tensortune_core.predict_vram_for_args(
+        tensortune_core.train_vram_predictor(DB_FILE, gpu_info_rich_before_launch.get("name")), current_tuning_model_analysis_local,
+        tensortune_core.args_list_to_dict(args_for_kcpp_run_list), local_vram_at_decision_for_db or None)
+    if vram_prediction.get("success"):
+        print_info(vram_prediction["message"])
+        if vram_prediction["likely_exceeds"] and CONFIG.get("vram_predictor_block_likely_oom", True):
+            print_warning("Launch history predicts this command will not fit in free VRAM. Try (C)PU More or a Budget Plan.")
+            if not confirm("Launch anyway?", default=False):
+                return "continue_tuning"
+
     kcpp_process_obj, launch_error_msg = tensortune_core.launch_process( local_last_proposed_command_list_for_db, capture_output=True, new_console=False, use_text_mode=False)
 
     if launch_error_msg or not kcpp_process_obj:
@@ -1271,6 +1352,17 @@ def launch_and_monitor_for_tuning_cli():
         local_level_of_last_monitored_run, db_outcome_to_save_str,
         local_last_approx_vram_used_kcpp_mb # Pass the locally calculated value
     )
+    if db_outcome_to_save_str.startswith("SUCCESS_LOAD") and CONFIG.get("benchmark_after_load", True) \
+       and kcpp_process_obj and kcpp_process_obj.poll() is None:
+        print_info("Benchmarking prompt processing, generation speed and time to first token...")
+        benchmark = tensortune_core.benchmark_koboldcpp(target_port_str_for_success)
+        if benchmark.get("success"):
+            print_success(benchmark["message"])
+            tensortune_core.save_benchmark_to_db(
+                DB_FILE, current_tuning_model_path_local, local_vram_at_decision_for_db,
+                local_last_proposed_command_list_for_db, local_level_of_last_monitored_run, benchmark)
+        else:
+            print_warning(benchmark["message"])
     # Pass the local VRAM info and command list to the post-monitoring choices
     return handle_post_monitoring_choices_cli(
         db_outcome_to_save_str,
@@ -1293,6 +1385,7 @@ def handle_post_monitoring_choices_cli(
 ):
     global current_tuning_attempt_level, tuning_in_progress, kcpp_process_obj # kcpp_process_obj is the monitored one
     global last_launched_process_info # For non-monitored KCPP instance
+    global current_tuning_planned_offload
     # level_of_last_monitored_run is now level_from_monitor
 
     kcpp_process_obj = monitored_kcpp_instance # Keep track of the process passed from monitor
@@ -1443,6 +1536,10 @@ def handle_post_monitoring_choices_cli(
             return "continue_tuning"
 
     # Adjust OT level for continued tuning based on other choices
+    if user_action_choice in ('s', 'g', 'c', 'a') and step_offload_dial_cli(1 if user_action_choice in ('c', 'a') else -1):
+        return "continue_tuning"
+    if user_action_choice in ('s', 'g', 'c', 'a'):
+        current_tuning_planned_offload = None  # Stepping the level hands control back to the OT ladder
     if user_action_choice == 's': # Save as Good, More GPU
         if current_tuning_attempt_level > current_tuning_min_level: current_tuning_attempt_level -= 1
         else: print_warning("Already at Max GPU, cannot go further.")
@@ -1504,7 +1601,8 @@ def launch_kobold_for_use_cli(
             db_outcome_on_success,
             vram_used_for_this_db_entry
         )
-    
+
+    print_override_dry_run_cli(model_a_for_log, command_list_to_run)
     launched_kcpp_process, launch_err_msg = tensortune_core.launch_process(command_list_to_run, capture_output=False, new_console=True)
 
     if launch_err_msg or not launched_kcpp_process:
@@ -1582,11 +1680,259 @@ def kcpp_control_loop_cli(port_to_use_for_webui: str, is_monitored_instance_bein
         else: print_error("Invalid control choice.")
 
 
+def print_override_dry_run_cli(model_analysis: Dict[str, Any], args_list: List[str]):
+    """Shows what the --overridetensors value of a launch will actually match before KoboldCpp loads the model."""
+    args_dict = tensortune_core.args_list_to_dict(args_list)
+    if not args_dict.get("--overridetensors") or not model_analysis.get('filepath'):
+        return
+    simulation = tensortune_core.simulate_override_tensors_for_args(model_analysis, args_dict)
+    if not simulation.get("success"):
+        print_info(simulation.get("message", ""))
+    elif simulation["unmatched_subpatterns"] or simulation["errors"]:
+        print_warning(tensortune_core.format_override_simulation(simulation))
+    else:
+        print_info(simulation["message"])
+
+
+def _tuning_planner_args_cli() -> Dict[str, Any]:
+    return tensortune_core.args_list_to_dict(tensortune_core.build_command(
+        current_tuning_model_path_local, None, current_tuning_model_analysis_local, current_tuning_session_base_args,
+        vram_budget_mb=current_tuning_vram_budget_mb))
+
+
+def plan_tuning_offload_cli(vram_budget_mb: float) -> Optional[Dict[str, Any]]:
+    """Runs the byte-budget offload planner for the current tuning session and prints the result."""
+    if len(tensortune_core.parse_gpu_index_list(CONFIG.get("multi_gpu_indices", []))) > 1:
+        plan = tensortune_core.plan_tensor_split_for_config(current_tuning_model_analysis_local, _tuning_planner_args_cli(), CONFIG)
+        if plan.get("success"):
+            current_tuning_session_base_args.update({"--tensor_split": plan["tensor_split"], "--maingpu": str(plan["main_gpu"])})
+    else:
+        bandwidths = tensortune_core.get_offload_bandwidths(CONFIG)
+        plan = {}
+        if current_tuning_model_analysis_local.get('is_moe'):
+            plan = tensortune_core.plan_moe_expert_offload(current_tuning_model_analysis_local, vram_budget_mb, _tuning_planner_args_cli(), bandwidths)
+        if not plan.get("success"):
+            plan = tensortune_core.plan_offload_for_budget(current_tuning_model_analysis_local, vram_budget_mb, _tuning_planner_args_cli(),
+                                                           bandwidths=bandwidths)
+    if not plan.get("success"):
+        print_warning(plan.get("message", "Offload planning failed."))
+        return None
+    if plan["fits"]: print_success(plan["message"])
+    else: print_warning(plan["message"])
+    return plan
+
+
+def build_tuning_offload_ladder_cli():
+    """(Re)builds the GPU-resident MiB dial for the session; stays None for models without a GGUF tensor table."""
+    global current_tuning_offload_ladder
+    ladder = tensortune_core.build_offload_ladder(current_tuning_model_analysis_local, _tuning_planner_args_cli(),
+                                                   bandwidths=tensortune_core.get_offload_bandwidths(CONFIG))
+    current_tuning_offload_ladder = ladder if ladder.get("success") else None
+    if current_tuning_offload_ladder:
+        print_info(ladder["message"])
+
+
+def rebuild_tuning_ladders_cli():
+    global current_tuning_level_ladder
+    current_tuning_level_ladder = tensortune_core.build_level_ladder(
+        current_tuning_model_path_local, current_tuning_model_analysis_local, current_tuning_session_base_args,
+        current_tuning_min_level, current_tuning_max_level, vram_budget_mb=current_tuning_vram_budget_mb,
+        bandwidths=tensortune_core.get_offload_bandwidths(CONFIG))
+    build_tuning_offload_ladder_cli()
+
+
+def _tuning_level_entry_cli(level: Optional[int] = None) -> Dict[str, Any]:
+    return tensortune_core.get_level_ladder_entry(current_tuning_level_ladder, current_tuning_model_analysis_local,
+                                                  current_tuning_attempt_level if level is None else level)
+
+
+def step_offload_dial_cli(delta: int) -> bool:
+    """Moves the offload dial for More GPU (-1) / More CPU (+1). False when there is no dial and the OT level should step."""
+    global current_tuning_planned_offload, current_tuning_attempt_level
+    if not current_tuning_offload_ladder:
+        return False
+    current_gpu_bytes = None
+    if not (current_tuning_planned_offload and "dial_index" in current_tuning_planned_offload):
+        current_args = tensortune_core.args_list_to_dict(tensortune_core.build_command(
+            current_tuning_model_path_local,
+            current_tuning_planned_offload["override_tensors"] if current_tuning_planned_offload else _tuning_level_entry_cli()["override_tensors"],
+            current_tuning_model_analysis_local, current_tuning_session_base_args,
+            current_attempt_level_for_tuning=current_tuning_attempt_level,
+            manual_gpu_layers_override=current_tuning_planned_offload["gpu_layers"] if current_tuning_planned_offload else None,
+            vram_budget_mb=current_tuning_vram_budget_mb))
+        current_gpu_bytes = tensortune_core.estimate_vram_usage_for_args(current_tuning_model_analysis_local, current_args).get("total_bytes")
+    rung = tensortune_core.step_offload_dial(current_tuning_model_analysis_local, current_tuning_offload_ladder, delta,
+                                             current_tuning_planned_offload, current_gpu_bytes)
+    if rung is None:
+        print_warning(f"Already at {'Max CPU' if delta > 0 else 'Max GPU'} on the offload dial.")
+        return True
+    current_tuning_planned_offload = rung
+    current_tuning_attempt_level = tensortune_core.get_level_from_overridetensors(rung["override_tensors"], current_tuning_model_analysis_local)
+    print_success(f"Shifted towards {'CPU' if delta > 0 else 'GPU'}. {rung['message']}")
+    return True
+
+
+def _tuning_launch_args_cli(level: Optional[int] = None) -> List[str]:
+    """KoboldCpp args for the current level, or the planned offload (budget plan / dial rung) when one is active."""
+    level = current_tuning_attempt_level if level is None else level
+    ot_string_for_launch = _tuning_level_entry_cli(level)["override_tensors"]
+    planned_gpu_layers = None
+    if current_tuning_planned_offload:
+        ot_string_for_launch, planned_gpu_layers = current_tuning_planned_offload["override_tensors"], current_tuning_planned_offload["gpu_layers"]
+    return tensortune_core.build_command(
+        current_tuning_model_path_local, ot_string_for_launch,
+        current_tuning_model_analysis_local, current_tuning_session_base_args,
+        current_attempt_level_for_tuning=level,
+        manual_gpu_layers_override=planned_gpu_layers,
+        vram_budget_mb=current_tuning_vram_budget_mb
+    )
+
+
+def apply_stored_runtime_tuning_cli(gpu_name: Optional[str]):
+    """
+    Applies stored search results for the session's offload plan; they are keyed by the plan, so call this once it is chosen.
+    The parameter search's optimum goes first; swept thread knees then replace its --threads (and set --nblas), since
+    the sweep measures every topology-derived count while the parameter search only tries a few.
+    """
+    plan_args = tensortune_core.args_list_to_dict(_tuning_launch_args_cli())
+    known_runtime_params = tensortune_core.get_runtime_param_optimum(DB_FILE, current_tuning_model_analysis_local, gpu_name, plan_args)
+    if known_runtime_params:
+        current_tuning_session_base_args.update(known_runtime_params["params"])
+        print_info(f"Using the searched optimum for this plan and hardware: {tensortune_core.describe_runtime_params(known_runtime_params['params'])}")
+    thread_knees = tensortune_core.get_thread_sweep_knees(DB_FILE, current_tuning_model_analysis_local, plan_args)
+    if thread_knees:
+        current_tuning_session_base_args.update({arg_key: str(knee) for arg_key, knee in thread_knees.items()})
+        print_info("Using swept thread counts for this plan and CPU: " + ", ".join(f"{arg_key} {knee}" for arg_key, knee in thread_knees.items()))
+    if known_runtime_params:
+        rebuild_tuning_ladders_cli()  # The batch size and KV quant change the VRAM estimates
+
+
+def run_context_size_search_cli():
+    """Searches the largest --contextsize for the current offload plan with real launches and stores it per model/GPU."""
+    if kcpp_process_obj and kcpp_process_obj.poll() is None:
+        print_warning("A KoboldCpp process is still running. Stop it before searching context sizes.")
+        return
+    _, _, _, gpu_info = tensortune_core.get_available_vram_mb(CONFIG)
+    stored_limit = tensortune_core.get_context_size_limit(DB_FILE, current_tuning_model_analysis_local, gpu_info.get("name"))
+    if stored_limit:
+        print_info(f"Stored maximum on this GPU: --contextsize {stored_limit['max_context']}"
+                   + (f" (min {stored_limit['min_tokens_per_second']:.1f} t/s)" if stored_limit.get("min_tokens_per_second") else ""))
+    min_speed_str = prompt("Minimum generation speed in t/s (0 = only require a successful load)", default="0").strip()
+    try:
+        min_tokens_per_second = max(0.0, float(min_speed_str))
+    except ValueError:
+        print_error("Invalid speed."); return
+    print_info("Each step launches KoboldCpp with the current offload plan; this can take several minutes.")
+    try:
+        search_result = tensortune_core.search_max_context_size(
+            KOBOLDCPP_EXECUTABLE, current_tuning_model_analysis_local, _tuning_launch_args_cli(), CONFIG,
+            min_tokens_per_second=min_tokens_per_second, vram_budget_mb=current_tuning_vram_budget_mb, progress_callback=print_info)
+    except KeyboardInterrupt:
+        print_warning("\nContext search interrupted."); return
+    if not search_result.get("success"):
+        print_error(search_result.get("message", "Context search failed.")); return
+    print_success(search_result["message"])
+    _, save_msg = tensortune_core.save_context_size_limit(DB_FILE, current_tuning_model_analysis_local, gpu_info.get("name"), search_result)
+    print_info(save_msg)
+    if confirm(f"Use --contextsize {search_result['max_context']} for this tuning session?", default=True):
+        current_tuning_session_base_args["--contextsize"] = str(search_result["max_context"])
+        rebuild_tuning_ladders_cli()
+
+
+def run_autotune_cli():
+    """Bisects the plan ladder with unattended launches and switches the session to the result."""
+    global current_tuning_attempt_level, current_tuning_planned_offload
+    if kcpp_process_obj and kcpp_process_obj.poll() is None:
+        print_warning("A KoboldCpp process is still running. Stop it before autotuning.")
+        return
+    candidates = tensortune_core.build_autotune_candidates(
+        current_tuning_model_path_local, current_tuning_model_analysis_local, current_tuning_session_base_args,
+        current_tuning_offload_ladder, current_tuning_level_ladder, current_tuning_vram_budget_mb)
+    print_info(f"Autotune bisects {len(candidates)} plans with real launches (usually 4-8). Press Ctrl+C to stop.")
+    stop_event, result_holder = threading.Event(), {}
+    worker = threading.Thread(target=lambda: result_holder.update(tensortune_core.autotune_offload(
+        KOBOLDCPP_EXECUTABLE, current_tuning_model_path_local, current_tuning_model_analysis_local, candidates, DB_FILE, CONFIG,
+        current_tuning_vram_budget_mb, progress_callback=print_info, stop_event=stop_event, warm_start=current_tuning_warm_start)), daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive(): worker.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print_warning("\nStopping autotune after the current probe is cleaned up...")
+        stop_event.set(); worker.join()
+    if not result_holder.get("success"):
+        print_warning(result_holder.get("message", "Autotune did not finish.")); return
+    print_success(result_holder["message"])
+    best = result_holder["best"]
+    current_tuning_attempt_level, current_tuning_planned_offload = best["level"], best["plan"]
+
+
+def run_runtime_param_search_cli():
+    """Successive-halving search over threads/BLAS batch/KV quant/flash attention for the current offload plan."""
+    if kcpp_process_obj and kcpp_process_obj.poll() is None:
+        print_warning("A KoboldCpp process is still running. Stop it before searching runtime parameters.")
+        return
+    _, _, _, gpu_info = tensortune_core.get_available_vram_mb(CONFIG)
+    launch_args = _tuning_launch_args_cli()
+    launch_args_dict = tensortune_core.args_list_to_dict(launch_args)
+    reuse_history = bool(tensortune_core.get_runtime_param_optimum(DB_FILE, current_tuning_model_analysis_local, gpu_info.get("name"), launch_args_dict)) \
+        and not confirm("A stored optimum exists for this plan on this hardware. Search again anyway?", default=False)
+    if not reuse_history:
+        launch_estimate = tensortune_core.estimate_param_search_launches(current_tuning_model_analysis_local, launch_args_dict, current_tuning_vram_budget_mb)
+        if not confirm(f"The search needs about {launch_estimate} KoboldCpp launches. Start it?", default=True):
+            return
+        print_info("Press Ctrl+C to stop.")
+    stop_event, result_holder = threading.Event(), {}
+    worker = threading.Thread(target=lambda: result_holder.update(tensortune_core.search_runtime_params(
+        KOBOLDCPP_EXECUTABLE, current_tuning_model_analysis_local, launch_args, DB_FILE, CONFIG, current_tuning_vram_budget_mb,
+        gpu_info.get("name"), reuse_history=reuse_history, progress_callback=print_info, stop_event=stop_event)), daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive(): worker.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print_warning("\nStopping parameter search after the current launch is cleaned up...")
+        stop_event.set(); worker.join()
+    if not result_holder.get("success"):
+        print_warning(result_holder.get("message", "Parameter search did not finish.")); return
+    print_success(result_holder["message"])
+    if confirm(f"Use {tensortune_core.describe_runtime_params(result_holder['best'])} for this tuning session?", default=True):
+        current_tuning_session_base_args.update(result_holder["best"])
+        rebuild_tuning_ladders_cli()
+
+
+def run_thread_sweep_cli():
+    """Benchmarks --threads and --nblas at topology-derived counts for the current plan and stores the knees."""
+    if kcpp_process_obj and kcpp_process_obj.poll() is None:
+        print_warning("A KoboldCpp process is still running. Stop it before sweeping thread counts.")
+        return
+    launch_args = _tuning_launch_args_cli()
+    topology = tensortune_core.get_cpu_topology()
+    candidates = tensortune_core.thread_sweep_candidates(
+        topology, tensortune_core.plan_is_memory_bound(current_tuning_model_analysis_local, tensortune_core.args_list_to_dict(launch_args)))
+    print_info(f"CPU: {tensortune_core.describe_cpu_topology(topology)}")
+    print_info(f"Sweeping --threads and --nblas over {candidates}: {2 * len(candidates)} launches. Press Ctrl+C to stop.")
+    stop_event, result_holder = threading.Event(), {}
+    worker = threading.Thread(target=lambda: result_holder.update(tensortune_core.sweep_thread_counts(
+        KOBOLDCPP_EXECUTABLE, current_tuning_model_analysis_local, launch_args, DB_FILE, CONFIG, candidates=candidates,
+        progress_callback=print_info, stop_event=stop_event)), daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive(): worker.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print_warning("\nStopping thread sweep after the current launch is cleaned up...")
+        stop_event.set(); worker.join()
+    if not result_holder.get("success"):
+        print_warning(result_holder.get("message", "Thread sweep did not finish.")); return
+    print_success(result_holder["message"])
+    if confirm("Use these thread counts for this tuning session?", default=True):
+        current_tuning_session_base_args.update({arg_key: str(knee) for arg_key, knee in result_holder["knees"].items()})
+
+
 def run_model_tuning_session_cli() -> str:
     global tuning_in_progress, current_tuning_attempt_level, current_tuning_min_level, current_tuning_max_level
     global current_tuning_session_base_args, current_tuning_model_path_local, current_tuning_model_analysis_local
     global gguf_file_global, current_model_analysis_global, level_of_last_monitored_run, last_successful_monitored_run_details_cli
-    global vram_at_decision_for_db, last_approx_vram_used_kcpp_mb 
+    global vram_at_decision_for_db, last_approx_vram_used_kcpp_mb, current_tuning_vram_budget_mb, current_tuning_planned_offload
+    global current_tuning_warm_start
 
     if not gguf_file_global or not current_model_analysis_global.get('filepath'):
         print_error("No model selected or analyzed. Please select a model first.")
@@ -1629,6 +1975,7 @@ def run_model_tuning_session_cli() -> str:
         else: initial_heuristic_level = -7
     
     effective_vram_budget_for_heuristic_mb = current_gpu_full_info.get("total_mb_budgeted", 0.0) - VRAM_SAFETY_BUFFER_MB - MIN_VRAM_FREE_AFTER_LOAD_MB
+    current_tuning_vram_budget_mb = effective_vram_budget_for_heuristic_mb if current_gpu_full_info.get("success") and effective_vram_budget_for_heuristic_mb > 0 else None
 
     if estimated_vram_needed_mb > 0 and current_budgeted_free_vram_mb > 0 :
         if estimated_vram_needed_mb > effective_vram_budget_for_heuristic_mb * 1.1:
@@ -1656,7 +2003,7 @@ def run_model_tuning_session_cli() -> str:
         approx_hist_vram_used = best_historical_config.get('approx_vram_used_kcpp_mb') 
 
         # Handle starting level based on historical outcome and current VRAM - prioritize exact match for preferred configs
-        if hist_outcome_str.endswith("_USER_MARKED_AS_BEST_CLI") or hist_outcome_str.endswith("_USER_MARKED_AS_BEST_GUI"):
+        if hist_outcome_str.endswith("_USER_MARKED_AS_BEST_CLI") or hist_outcome_str.endswith("_USER_MARKED_AS_BEST_GUI") or hist_outcome_str.endswith(tensortune_core.AUTOTUNE_BEST_SUFFIX):
             # For preferred configurations, use exactly the same level
             initial_heuristic_level = hist_lvl
             print_info(f"Using exact level {hist_lvl} from preferred historical configuration")
@@ -1681,15 +2028,41 @@ def run_model_tuning_session_cli() -> str:
     else:
         print_info(f"No suitable historical config found. Starting with heuristic OT Level: {initial_heuristic_level}")
 
+    # An autotune winner is restored with its exact offload; its stored OT level is only the nearest coarse level
+    current_tuning_planned_offload = tensortune_core.planned_offload_from_history(best_historical_config)
+    if current_tuning_planned_offload:
+        print_info(current_tuning_planned_offload["message"])
+    current_tuning_warm_start = None
+    if not (best_historical_config and best_historical_config.get("outcome", "").startswith("SUCCESS")) and current_gpu_full_info.get("success"):
+        # No proven config: start from the byte-budget plan instead of walking the level ladder launch by launch
+        plan_budget_mb = current_budgeted_free_vram_mb - VRAM_SAFETY_BUFFER_MB
+        warm_start = tensortune_core.find_similar_tuned_models(DB_FILE, current_tuning_model_analysis_local, current_actual_hw_free_vram_mb)
+        warm_start_budget_mb = tensortune_core.warm_start_vram_budget_mb(current_tuning_model_analysis_local, _tuning_planner_args_cli(), warm_start)
+        if warm_start_budget_mb:
+            # Similar models' proven GPU share is a better first guess than the static estimate
+            current_tuning_warm_start = warm_start
+            print_info(warm_start["message"])
+            plan_budget_mb = min(warm_start_budget_mb, current_tuning_vram_budget_mb or warm_start_budget_mb)
+        current_tuning_planned_offload = plan_tuning_offload_cli(plan_budget_mb)
+        if current_tuning_planned_offload:
+            initial_heuristic_level = tensortune_core.get_level_from_overridetensors(current_tuning_planned_offload["override_tensors"], current_tuning_model_analysis_local)
+    rebuild_tuning_ladders_cli()
+
     current_tuning_attempt_level = max(current_tuning_min_level, min(initial_heuristic_level, current_tuning_max_level))
     level_of_last_monitored_run = current_tuning_attempt_level
+    apply_stored_runtime_tuning_cli(current_gpu_full_info.get("name"))
 
     while tuning_in_progress:
         print("\n" + "=" * 70)
         current_tuning_attempt_level = max(current_tuning_min_level, min(current_tuning_attempt_level, current_tuning_max_level))
-        ot_string_generated = tensortune_core.generate_overridetensors(current_tuning_model_analysis_local, current_tuning_attempt_level)
-        strategy_description = tensortune_core.get_offload_description(current_tuning_model_analysis_local, current_tuning_attempt_level, ot_string_generated)
-        gpu_layers_for_level = tensortune_core.get_gpu_layers_for_level(current_tuning_model_analysis_local, current_tuning_attempt_level)
+        level_entry = _tuning_level_entry_cli()
+        ot_string_generated, strategy_description, gpu_layers_for_level = level_entry["override_tensors"], level_entry["description"], level_entry["gpu_layers"]
+        if current_tuning_planned_offload:
+            ot_string_generated = current_tuning_planned_offload["override_tensors"]
+            strategy_description = current_tuning_planned_offload["message"]
+            if "dial_index" not in current_tuning_planned_offload:
+                strategy_description += " (G/C moves the offload dial)" if current_tuning_offload_ladder else " (G/C returns to OT levels)"
+            gpu_layers_for_level = current_tuning_planned_offload["gpu_layers"]
         total_model_layers = current_tuning_model_analysis_local.get('num_layers', 32)
 
         if last_successful_monitored_run_details_cli:
@@ -1723,6 +2096,8 @@ def run_model_tuning_session_cli() -> str:
                 except ValueError:
                     # Handle case where it's not a valid integer (special strings, etc.)
                     custom_gpulayers_value = base_gpulayers_str
+        if custom_gpulayers_value is None and current_tuning_planned_offload:
+            custom_gpulayers_value = current_tuning_planned_offload["gpu_layers"]
 
         # Generate the command arguments with OT settings
         args_for_kcpp_display_list = tensortune_core.build_command(
@@ -1731,9 +2106,18 @@ def run_model_tuning_session_cli() -> str:
             current_tuning_model_analysis_local, 
             current_tuning_session_base_args, 
             current_attempt_level_for_tuning=current_tuning_attempt_level,
-            manual_gpu_layers_override=custom_gpulayers_value  # Pass the custom value if set
+            manual_gpu_layers_override=custom_gpulayers_value,  # Pass the custom value if set
+            vram_budget_mb=current_tuning_vram_budget_mb
         )
         display_full_command_list = tensortune_core.get_command_to_run(KOBOLDCPP_EXECUTABLE, args_for_kcpp_display_list)
+        display_args_dict = tensortune_core.args_list_to_dict(args_for_kcpp_display_list)
+        kv_estimate = tensortune_core.estimate_kv_cache_for_args(current_tuning_model_analysis_local, display_args_dict)
+        if kv_estimate.get("success"): print_info(kv_estimate["message"])
+        vram_estimate = tensortune_core.estimate_vram_usage_for_args(current_tuning_model_analysis_local, display_args_dict)
+        if vram_estimate.get("success"): print_info(vram_estimate["message"])
+        token_time_estimate = tensortune_core.estimate_token_time_for_args(current_tuning_model_analysis_local, display_args_dict,
+                                                                           tensortune_core.get_offload_bandwidths(CONFIG))
+        if token_time_estimate.get("success"): print_info(token_time_estimate["message"])
                 
         _, _, vram_info_message_str, current_gpu_rich_info_tuning = tensortune_core.get_available_vram_mb(CONFIG)
         if dependencies['rich']['module']: console.print(Panel(f"{vram_info_message_str}", title="Current GPU Info", style="green" if current_gpu_rich_info_tuning.get("success") else "red", expand=False))
@@ -1741,9 +2125,11 @@ def run_model_tuning_session_cli() -> str:
         
         print_title("Proposed Command for This OT Level"); print_command(tensortune_core.format_command_for_display(display_full_command_list))
         
-        menu_options_text = "(L)aunch & Monitor | (S)kip Tune & Launch Now | (G)PU More (↓Lvl) | (C)PU More (↑Lvl) | (E)dit Session Args | (P)ermanent Model Args | (H)istory (This Model) | (N)ew GGUF | (Q)uit Tuning"
+        gpu_cpu_step_text = (f"(G)PU More (↑~{current_tuning_offload_ladder['step_bytes'] // (1024**2)} MiB) | (C)PU More (↓~{current_tuning_offload_ladder['step_bytes'] // (1024**2)} MiB)"
+                             if current_tuning_offload_ladder else "(G)PU More (↓Lvl) | (C)PU More (↑Lvl)")
+        menu_options_text = f"(L)aunch & Monitor | (S)kip Tune & Launch Now | {gpu_cpu_step_text} | (B)udget Plan | A(u)totune | (M)ax Context Search | (R)untime Param Search | (T)hread Sweep | (E)dit Session Args | (P)ermanent Model Args | E(x)port Level Ladder | (H)istory (This Model) | (N)ew GGUF | (Q)uit Tuning"
         print_title("Tuning Actions"); print(menu_options_text)
-        user_tuning_choice = prompt("Your choice", choices=['l','s','g','c','e', 'p', 'h','n','q'], default='l').lower().strip()
+        user_tuning_choice = prompt("Your choice", choices=['l','s','g','c','b','u','m','r','t','e', 'p', 'x', 'h','n','q'], default='l').lower().strip()
 
         if user_tuning_choice == 'l':
             post_monitoring_action_result = launch_and_monitor_for_tuning_cli()
@@ -1764,23 +2150,50 @@ def run_model_tuning_session_cli() -> str:
                 tuning_in_progress = False; return session_control_outcome
             else: print_error("Direct launch failed. Returning to tuning menu."); continue
         elif user_tuning_choice == 'g':
-            if current_tuning_attempt_level > current_tuning_min_level: current_tuning_attempt_level -=1; print_success(f"Shifted towards GPU. New OT Level: {current_tuning_attempt_level}")
-            else: print_warning(f"Already at Max GPU (Level {current_tuning_min_level}).")
+            if not step_offload_dial_cli(-1):
+                current_tuning_planned_offload = None
+                if current_tuning_attempt_level > current_tuning_min_level: current_tuning_attempt_level -=1; print_success(f"Shifted towards GPU. New OT Level: {current_tuning_attempt_level}")
+                else: print_warning(f"Already at Max GPU (Level {current_tuning_min_level}).")
         elif user_tuning_choice == 'c':
-            if current_tuning_attempt_level < current_tuning_max_level: current_tuning_attempt_level +=1; print_success(f"Shifted towards CPU. New OT Level: {current_tuning_attempt_level}")
-            else: print_warning(f"Already at Max CPU (Level {current_tuning_max_level}).")
+            if not step_offload_dial_cli(1):
+                current_tuning_planned_offload = None
+                if current_tuning_attempt_level < current_tuning_max_level: current_tuning_attempt_level +=1; print_success(f"Shifted towards CPU. New OT Level: {current_tuning_attempt_level}")
+                else: print_warning(f"Already at Max CPU (Level {current_tuning_max_level}).")
+        elif user_tuning_choice == 'b':
+            _, _, _, gpu_info_for_plan = tensortune_core.get_available_vram_mb(CONFIG)
+            if gpu_info_for_plan.get("success"):
+                current_tuning_planned_offload = plan_tuning_offload_cli(gpu_info_for_plan.get("free_mb_budgeted", 0.0) - VRAM_SAFETY_BUFFER_MB)
+                if current_tuning_planned_offload:
+                    current_tuning_attempt_level = tensortune_core.get_level_from_overridetensors(current_tuning_planned_offload["override_tensors"], current_tuning_model_analysis_local)
+            else: print_warning("Budget plan needs GPU VRAM information.")
         elif user_tuning_choice == 'e':
             updated_session_args_overrides, permanent_change_in_editor = edit_current_args_interactive_cli(current_tuning_model_path_local, current_tuning_session_base_args)
             if updated_session_args_overrides is not None: current_tuning_session_base_args = updated_session_args_overrides
             if permanent_change_in_editor: 
                  current_tuning_session_base_args = get_effective_session_args(current_tuning_model_path_local, {}) 
                  print_info("Permanent arguments were changed. Session overrides for this model reset, effective base updated.")
+            rebuild_tuning_ladders_cli()  # Context/KV settings move the predicted bytes of every level and rung
         elif user_tuning_choice == 'p':
             print_info("Opening argument editor for permanent model-specific settings...")
             _, permanent_save_made_here = edit_current_args_interactive_cli(current_tuning_model_path_local, current_tuning_session_base_args) 
             if permanent_save_made_here:
                  current_tuning_session_base_args = get_effective_session_args(current_tuning_model_path_local, {})
                  print_info("Permanent arguments changed. Session overrides for this model reset, effective base updated.")
+                 rebuild_tuning_ladders_cli()
+        elif user_tuning_choice == 'u': run_autotune_cli()
+        elif user_tuning_choice == 'm': run_context_size_search_cli()
+        elif user_tuning_choice == 'r': run_runtime_param_search_cli()
+        elif user_tuning_choice == 't': run_thread_sweep_cli()
+        elif user_tuning_choice == 'x':
+            if not current_tuning_level_ladder:
+                print_warning("No level ladder is available for this model; nothing to export.")
+                continue
+            default_export_path = f"{os.path.splitext(os.path.basename(current_tuning_model_path_local))[0]}_ladder.json"
+            export_path = prompt("Export level ladder to", default=default_export_path).strip()
+            if export_path:
+                export_ok, export_msg = tensortune_core.export_level_ladder_json(current_tuning_level_ladder, export_path)
+                if export_ok: print_success(export_msg)
+                else: print_error(export_msg)
         elif user_tuning_choice == 'h': view_db_history_cli(model_filepath_filter=current_tuning_model_path_local)
         elif user_tuning_choice == 'n': tuning_in_progress = False; return "new_gguf"
         elif user_tuning_choice == 'q': tuning_in_progress = False; return "new_gguf" 
@@ -1930,7 +2343,12 @@ def main_cli():
         if gguf_selection_result == "main_menu": continue
 
         gguf_file_global = gguf_selection_result
-        current_model_analysis_global = tensortune_core.analyze_filename(gguf_file_global)
+        current_model_analysis_global = tensortune_core.get_model_analysis(gguf_file_global, DB_FILE)
+        if current_model_analysis_global.get('shard_count') and current_model_analysis_global['filepath'] != gguf_file_global:
+            print_info(f"Split GGUF detected ({current_model_analysis_global['shard_count']} parts); using first part {os.path.basename(current_model_analysis_global['filepath'])}.")
+            gguf_file_global = current_model_analysis_global['filepath']
+        elif tensortune_core.parse_gguf_shard_name(gguf_file_global) and current_model_analysis_global.get('details', {}).get('metadata_source') != 'gguf_header':
+            print_warning(f"Split GGUF: {current_model_analysis_global['details'].get('gguf_header_error', 'header unreadable')} Using filename estimates.")
         current_model_analysis_global = refine_model_analysis_cli(current_model_analysis_global)
 
         # Apply the refinement after analyzing the model
@@ -1939,6 +2357,9 @@ def main_cli():
         print_title("Model Actions")
         print_info(f"Selected Model: {os.path.basename(gguf_file_global)}")
         print_info(f"  Analysis: Size ~{current_model_analysis_global.get('size_b', 'N/A')}B, Quant ~{current_model_analysis_global.get('quant', 'N/A')}, MoE: {'Yes' if current_model_analysis_global.get('is_moe') else 'No'}")
+        tensor_inventory, _ = tensortune_core.get_tensor_inventory(gguf_file_global)
+        if tensor_inventory:
+            print_info(f"  Tensors: {tensortune_core.format_tensor_inventory_summary(tensor_inventory)}")
 
         model_actions_menu = {
             "t": "Start Auto-Tune / Use OT Strategy",
@@ -7,6 +7,17 @@ import time
 import threading
 import signal
 import sqlite3
+import struct
+import array
+import ctypes
+import hashlib
+import heapq
+import uuid
+import math
+import mmap
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from typing import Optional, Tuple, Dict, List, Any
 import pathlib # Should be imported directly, not as pathlib.Path
@@ -63,6 +74,10 @@ CONFIG_FILE = os.path.join(_get_user_app_config_dir(), _CONFIG_FILE_BASENAME)
 
 _DB_FILE_BASENAME_DEFAULT = "tensortune_history.db"
 CORE_VERSION = "1.2.0" # Core version updated
+ANALYSIS_CACHE_VERSION = 4 # Bump whenever analyze_filename output changes so stale cache rows are ignored
+ANALYSIS_CACHE_MAX_ENTRIES = 2000 # Above a large library's model count, so index_model_library does not evict its own rows
+LIBRARY_INDEX_CACHE_BATCH = 32 # index_model_library commits new analyses in batches of this size
+DB_SCHEMA_VERSION_FINGERPRINTS = 1 # PRAGMA user_version once init_db has backfilled launch_history fingerprints
 
 DEFAULT_CONFIG_TEMPLATE = {
     "koboldcpp_executable": "koboldcpp.exe" if sys.platform == "win32" else "./koboldcpp",
@@ -114,6 +129,12 @@ DEFAULT_CONFIG_TEMPLATE = {
     ],
     "gpu_selection_mode": "auto",
     "selected_gpu_index": 0,
+    "multi_gpu_indices": [], # Two or more GPU IDs enable the --tensor_split planner
+    "benchmark_after_load": True, # Measure prompt/generation t/s and TTFT after each successful tuning load
+    "vram_predictor_block_likely_oom": True, # Ask before tuning launches the history-based VRAM predictor expects to OOM
+    "host_memory_bandwidth_gbps": 0, # Offload cost model bandwidths in GB/s; 0 = detect (or fall back to a default)
+    "pcie_bandwidth_gbps": 0,
+    "gpu_memory_bandwidth_gbps": 0,
     "override_vram_budget": False,
     "manual_vram_total_mb": 8192,
     "launcher_core_version": CORE_VERSION, # Ensure CORE_VERSION is defined, e.g., "1.1.1-TT"
@@ -135,8 +156,11 @@ KOBOLDCPP_ARG_DEFINITIONS = [
     {"key": "--flashattention", "name": "Flash Attention", "help": "Enable FlashAttention optimization (if supported by model and GPU).", "type_hint": "bool", "category": "GPU Optimizations"},
     {"key": "--nommap", "name": "No Memory Map", "help": "Disable memory mapping of the model file.", "type_hint": "bool", "category": "Memory"},
     {"key": "--lowvram", "name": "Low VRAM Mode", "help": "Enable optimizations for systems with low VRAM.", "type_hint": "bool", "category": "Memory"},
+    {"key": "--useswa", "name": "Sliding Window Attention", "help": "Use a sliding-window KV cache on SWA models (e.g. Gemma 2/3). Saves memory but disables context shifting.", "type_hint": "bool", "category": "Memory"},
     {"key": "--quantkv", "name": "Quantize K/V Cache", "help": "Quantization for K/V cache. 'auto', 'off', or number (0=F32, 1=Q8_0, etc.).", "type_hint": "str_auto_num", "category": "GPU Optimizations"},
     {"key": "--blasbatchsize", "name": "BLAS Batch Size", "help": "Batch size for BLAS operations. 'auto', 'off', or number (e.g., 128, 512).", "type_hint": "str_auto_num", "category": "Performance"},
+    {"key": "--tensor_split", "name": "Tensor Split", "help": "Multi-GPU: share of the offloaded layers per GPU, in device order (e.g. '3 1').", "type_hint": "str", "category": "GPU Offload"},
+    {"key": "--maingpu", "name": "Main GPU", "help": "Multi-GPU: ID of the main GPU; it also holds the compute buffers.", "type_hint": "int", "category": "GPU Offload"},
     {"key": "--overridetensors", "name": "Override Tensors", "help": "Advanced: Specify tensor offload patterns to CPU (regex).", "type_hint": "str_regex", "category": "GPU Offload (Advanced)"},
 ]
 
@@ -499,7 +523,10 @@ def init_db(db_file):
                 UNIQUE(model_filepath, vram_at_launch_decision_mb, kobold_args_json, attempt_level_used)
             )
         ''')
-        cols_to_check = {"launch_outcome": "TEXT", "approx_vram_used_kcpp_mb": "INTEGER"}
+        cols_to_check = {"launch_outcome": "TEXT", "approx_vram_used_kcpp_mb": "INTEGER", "model_fingerprint": "TEXT",
+                         "planned_gpu_mb": "INTEGER", "gpu_name": "TEXT",
+                         "bench_gen_tps": "REAL", "bench_prompt_tps": "REAL", "bench_ttft_s": "REAL",
+                         "num_layers": "INTEGER", "model_weights_mb": "INTEGER", "gpu_weight_fraction": "REAL"}
         table_info = cursor.execute("PRAGMA table_info(launch_history)").fetchall()
         existing_cols = [col_info[1] for col_info in table_info]
         for col, col_type in cols_to_check.items():
@@ -510,6 +537,18 @@ def init_db(db_file):
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_lh_timestamp ON launch_history (timestamp DESC);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_lh_model_filepath ON launch_history (model_filepath);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_lh_launch_outcome ON launch_history (launch_outcome);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_lh_fingerprint ON launch_history (model_fingerprint, attempt_level_used);")
+        # One-shot migration (tracked in PRAGMA user_version): fingerprint rows recorded before the column
+        # existed, for models still at their old path. Rows that cannot be fingerprinted stay NULL and are not retried;
+        # new launches of those models fill the fingerprint in through save_config_to_db.
+        if cursor.execute("PRAGMA user_version").fetchone()[0] < DB_SCHEMA_VERSION_FINGERPRINTS:
+            for (old_model_path,) in cursor.execute("SELECT DISTINCT model_filepath FROM launch_history WHERE model_fingerprint IS NULL").fetchall():
+                if old_model_path and os.path.isfile(old_model_path):
+                    old_fingerprint = compute_model_fingerprint(old_model_path)
+                    if old_fingerprint:
+                        cursor.execute("UPDATE launch_history SET model_fingerprint = ? WHERE model_filepath = ? AND model_fingerprint IS NULL",
+                                       (old_fingerprint, old_model_path))
+            cursor.execute(f"PRAGMA user_version = {DB_SCHEMA_VERSION_FINGERPRINTS}")
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_lh_lookup_for_best ON launch_history (
                 model_filepath, model_quant_type, is_moe,
@@ -522,6 +561,37 @@ def init_db(db_file):
                 vram_at_launch_decision_mb, attempt_level_used
             );
         """)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS model_analysis_cache (
+                realpath TEXT NOT NULL, file_size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+                cache_version INTEGER NOT NULL, analysis_json TEXT NOT NULL, last_accessed REAL NOT NULL,
+                PRIMARY KEY (realpath, file_size, mtime_ns)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mac_last_accessed ON model_analysis_cache (last_accessed);")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS context_size_limits (
+                model_key TEXT NOT NULL, model_filepath TEXT, gpu_name TEXT NOT NULL,
+                max_context INTEGER NOT NULL, min_tokens_per_second REAL, tokens_per_second REAL,
+                approx_vram_used_kcpp_mb INTEGER, kobold_args_json TEXT, timestamp DATETIME,
+                PRIMARY KEY (model_key, gpu_name)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS runtime_param_results (
+                hardware_key TEXT NOT NULL, model_key TEXT NOT NULL, plan_key TEXT NOT NULL, search_id TEXT NOT NULL,
+                params_json TEXT NOT NULL, search_round INTEGER, launch_outcome TEXT, gen_tps REAL, prompt_tps REAL, ttft_s REAL,
+                completed INTEGER NOT NULL DEFAULT 0, timestamp DATETIME,
+                PRIMARY KEY (hardware_key, model_key, plan_key, search_id, params_json)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS thread_sweep_results (
+                cpu_key TEXT NOT NULL, model_key TEXT NOT NULL, plan_key TEXT NOT NULL, arg_key TEXT NOT NULL,
+                knee_threads INTEGER, knee_tps REAL, best_threads INTEGER, best_tps REAL, curve_json TEXT, timestamp DATETIME,
+                PRIMARY KEY (cpu_key, model_key, plan_key, arg_key)
+            )
+        ''')
         conn.commit()
         return True, f"Database initialized successfully at {db_file}"
     except sqlite3.Error as e:
@@ -530,18 +600,25 @@ def init_db(db_file):
         if conn:
             conn.close()
 
-def save_config_to_db(db_file, model_filepath, model_analysis, vram_at_decision_mb, command_args_list_with_exe, attempt_level, outcome, approx_vram_used_kcpp_mb=None):
+def _args_for_db(command_args_list_with_exe):
+    """KoboldCpp args of a launch command, without the executable (or python + script) prefix."""
+    num_prefix_items_to_skip = 1
+    if command_args_list_with_exe and command_args_list_with_exe[0].lower() == sys.executable.lower() and \
+       len(command_args_list_with_exe) > 1 and \
+       (command_args_list_with_exe[1].lower().endswith(".py") or os.path.basename(command_args_list_with_exe[1].lower()) == os.path.basename(DEFAULT_CONFIG_TEMPLATE["koboldcpp_executable"].lower())):
+        num_prefix_items_to_skip = 2
+    return command_args_list_with_exe[num_prefix_items_to_skip:] if command_args_list_with_exe else []
+
+def _args_json_for_db(command_args_list_with_exe):
+    return json.dumps(_args_for_db(command_args_list_with_exe))
+
+def save_config_to_db(db_file, model_filepath, model_analysis, vram_at_decision_mb, command_args_list_with_exe, attempt_level, outcome, approx_vram_used_kcpp_mb=None,
+                      gpu_name=None):
     conn = None
     try:
         conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
         cursor = conn.cursor()
-        num_prefix_items_to_skip = 1
-        if command_args_list_with_exe and command_args_list_with_exe[0].lower() == sys.executable.lower() and \
-           len(command_args_list_with_exe) > 1 and \
-           (command_args_list_with_exe[1].lower().endswith(".py") or os.path.basename(command_args_list_with_exe[1].lower()) == os.path.basename(DEFAULT_CONFIG_TEMPLATE["koboldcpp_executable"].lower())):
-            num_prefix_items_to_skip = 2
-
-        args_to_save_list = command_args_list_with_exe[num_prefix_items_to_skip:] if command_args_list_with_exe else []
+        args_to_save_list = _args_for_db(command_args_list_with_exe)
         args_json_str = json.dumps(args_to_save_list)
 
         vram_at_decision_mb_int = int(vram_at_decision_mb) if vram_at_decision_mb is not None else None
@@ -551,25 +628,44 @@ def save_config_to_db(db_file, model_filepath, model_analysis, vram_at_decision_
         model_size_to_db = model_analysis.get('size_b')
         if isinstance(model_size_to_db, str): model_size_to_db = None
         elif model_size_to_db is not None: model_size_to_db = float(model_size_to_db)
+        gpu_name = gpu_name or _last_detected_gpu_name
+        num_layers = model_analysis.get('num_layers') if isinstance(model_analysis.get('num_layers'), int) else None
+        planned_gpu_mb_int = model_weights_mb_int = gpu_weight_fraction = None
+        try:  # Estimates are extra columns; args they cannot evaluate (e.g. a broken --overridetensors) must not lose the record
+            # Planned GPU bytes and the GPU model are the VRAM predictor's inputs (see train_vram_predictor)
+            planned_estimate = estimate_vram_usage_for_args(model_analysis, args_list_to_dict(args_to_save_list))
+            planned_gpu_mb_int = int(planned_estimate["total_bytes"] / (1024 * 1024)) if planned_estimate.get("success") else None
+            # Share of the weights placed on the GPU, what find_similar_tuned_models transfers to new models
+            model_weights_bytes = estimate_gpu_weight_bytes(model_analysis, 999)
+            model_weights_mb_int = int(model_weights_bytes / (1024 * 1024)) if model_weights_bytes else None
+            gpu_weight_fraction = planned_estimate["weights_bytes"] / model_weights_bytes if model_weights_bytes and planned_estimate.get("success") else None
+        except Exception as e:
+            print(f"Warning: launch record saved without VRAM estimates: {type(e).__name__}: {e}")
 
         try:
             cursor.execute('''
                 INSERT INTO launch_history
                 (model_filepath, model_size_b, model_quant_type, is_moe, vram_at_launch_decision_mb,
-                 kobold_args_json, attempt_level_used, launch_outcome, approx_vram_used_kcpp_mb, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 kobold_args_json, attempt_level_used, launch_outcome, approx_vram_used_kcpp_mb, timestamp, model_fingerprint,
+                 planned_gpu_mb, gpu_name, num_layers, model_weights_mb, gpu_weight_fraction)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (model_filepath, model_size_to_db, model_analysis.get('quant'),
                   model_analysis.get('is_moe', False), vram_at_decision_mb_int,
-                  args_json_str, attempt_level, outcome, approx_vram_used_kcpp_mb_int, current_timestamp))
+                  args_json_str, attempt_level, outcome, approx_vram_used_kcpp_mb_int, current_timestamp,
+                  model_analysis.get('fingerprint'), planned_gpu_mb_int, gpu_name, num_layers, model_weights_mb_int, gpu_weight_fraction))
             success_msg = f"Saved new launch record to database (Outcome: {outcome})."
         except sqlite3.IntegrityError:
             cursor.execute('''
-                UPDATE launch_history SET launch_outcome = ?, approx_vram_used_kcpp_mb = ?, timestamp = ?
+                UPDATE launch_history SET launch_outcome = ?, approx_vram_used_kcpp_mb = ?, timestamp = ?,
+                    model_fingerprint = COALESCE(?, model_fingerprint), planned_gpu_mb = COALESCE(?, planned_gpu_mb),
+                    gpu_name = COALESCE(?, gpu_name), num_layers = COALESCE(?, num_layers),
+                    model_weights_mb = COALESCE(?, model_weights_mb), gpu_weight_fraction = COALESCE(?, gpu_weight_fraction)
                 WHERE model_filepath = ?
                   AND (vram_at_launch_decision_mb = ? OR (vram_at_launch_decision_mb IS NULL AND ? IS NULL))
                   AND kobold_args_json = ?
                   AND attempt_level_used = ?
-            ''', (outcome, approx_vram_used_kcpp_mb_int, current_timestamp, model_filepath,
+            ''', (outcome, approx_vram_used_kcpp_mb_int, current_timestamp, model_analysis.get('fingerprint'),
+                  planned_gpu_mb_int, gpu_name, num_layers, model_weights_mb_int, gpu_weight_fraction, model_filepath,
                   vram_at_decision_mb_int, vram_at_decision_mb_int,
                   args_json_str, attempt_level))
             if cursor.rowcount == 0:
@@ -611,13 +707,14 @@ def find_best_historical_config(db_file, current_model_analysis, current_availab
         problematic_levels_query = """
             SELECT DISTINCT attempt_level_used
             FROM launch_history
-            WHERE model_filepath = ? AND model_quant_type = ? AND is_moe = ?
+            WHERE (model_fingerprint = ? OR (model_filepath = ? AND model_quant_type = ? AND is_moe = ?))
               AND (launch_outcome LIKE '%OOM%' OR launch_outcome LIKE '%CRASH%' OR launch_outcome LIKE '%TIGHT%')
               AND vram_at_launch_decision_mb IS NOT NULL
               AND vram_at_launch_decision_mb >= (? * (1 - ?))
         """
+        model_fingerprint = current_model_analysis.get('fingerprint')
         cursor.execute(problematic_levels_query, (
-            current_model_analysis['filepath'], current_model_analysis.get('quant'),
+            model_fingerprint, current_model_analysis['filepath'], current_model_analysis.get('quant'),
             current_model_analysis.get('is_moe', False),
             current_vram_for_query,
             vram_tolerance_percent_oom_avoid
@@ -630,12 +727,14 @@ def find_best_historical_config(db_file, current_model_analysis, current_availab
             placeholders = ','.join(['?'] * len(failed_levels_list))
             where_clause_failed_levels_filter = f"""
               AND NOT (
-                    h.attempt_level_used IN ({placeholders})
+                    h.launch_outcome NOT LIKE '%MARKED_AS_BEST%' -- A plan marked best was confirmed as is; keep it even if its level failed with other args
+                    AND h.attempt_level_used IN ({placeholders})
                     AND ? <= COALESCE((SELECT MAX(sub_h.vram_at_launch_decision_mb)
                                       FROM launch_history sub_h
-                                      WHERE sub_h.model_filepath = h.model_filepath
-                                        AND sub_h.model_quant_type = h.model_quant_type
-                                        AND sub_h.is_moe = h.is_moe
+                                      WHERE (sub_h.model_fingerprint = h.model_fingerprint
+                                             OR (sub_h.model_filepath = h.model_filepath
+                                                 AND sub_h.model_quant_type = h.model_quant_type
+                                                 AND sub_h.is_moe = h.is_moe))
                                         AND sub_h.attempt_level_used = h.attempt_level_used
                                         AND (sub_h.launch_outcome LIKE '%OOM%' OR sub_h.launch_outcome LIKE '%CRASH%')
                                      ), 0) * (1 + ?)
@@ -648,9 +747,9 @@ def find_best_historical_config(db_file, current_model_analysis, current_availab
         query = f"""
             SELECT
                 h.kobold_args_json, h.attempt_level_used, h.vram_at_launch_decision_mb,
-                h.launch_outcome, h.approx_vram_used_kcpp_mb
+                h.launch_outcome, h.approx_vram_used_kcpp_mb, h.bench_gen_tps
             FROM launch_history h
-            WHERE h.model_filepath = ? AND h.model_quant_type = ? AND h.is_moe = ?
+            WHERE (h.model_fingerprint = ? OR (h.model_filepath = ? AND h.model_quant_type = ? AND h.is_moe = ?))
               AND (? IS NULL OR h.model_size_b IS NULL OR ABS(h.model_size_b - ?) < ?)
               AND (
                   h.vram_at_launch_decision_mb IS NULL OR
@@ -661,6 +760,7 @@ def find_best_historical_config(db_file, current_model_analysis, current_availab
             ORDER BY
               CASE WHEN h.launch_outcome LIKE '%_USER_MARKED_AS_BEST_GUI' THEN -2 -- Highest priority for GUI marked best
                    WHEN h.launch_outcome LIKE '%_USER_MARKED_AS_BEST_CLI' THEN -1 -- Next for CLI marked best
+                   WHEN h.launch_outcome LIKE '%_MARKED_AS_BEST_AUTOTUNE' THEN -1 -- Autotuner's result ranks like a CLI mark
                    WHEN h.launch_outcome LIKE 'SUCCESS_USER_CONFIRMED%' THEN 0
                    WHEN h.launch_outcome LIKE '%_USER_SAVED_GOOD_GPU_%' THEN 1 -- Catches _GUI and _CLI variants
                    ELSE 10 END ASC,
@@ -676,13 +776,14 @@ def find_best_historical_config(db_file, current_model_analysis, current_availab
                    WHEN h.launch_outcome LIKE '%_USER_ACCEPTED_TUNED_%' THEN 5 -- Catches _GUI and _CLI variants
                    ELSE 10 END ASC,
               CASE WHEN h.launch_outcome LIKE 'SUCCESS%' THEN 6 ELSE 10 END ASC,
+              COALESCE(h.bench_gen_tps, 0) DESC, -- Among equally trusted successes the fastest benchmarked one wins
               ABS(COALESCE(h.vram_at_launch_decision_mb, ?) - ?) ASC,
               h.attempt_level_used ASC,
               h.timestamp DESC
             LIMIT 1
         """
         base_params = [
-            current_model_analysis['filepath'], current_model_analysis.get('quant'),
+            model_fingerprint, current_model_analysis['filepath'], current_model_analysis.get('quant'),
             current_model_analysis.get('is_moe', False),
             model_size_query_for_db, model_size_query_for_db, model_size_tolerance_b,
             current_vram_for_query, vram_tolerance_percent_success_match,
@@ -705,7 +806,8 @@ def find_best_historical_config(db_file, current_model_analysis, current_availab
                         "attempt_level": row[1],
                         "historical_vram_mb": row[2],
                         "outcome": row[3],
-                        "approx_vram_used_kcpp_mb": row[4]}
+                        "approx_vram_used_kcpp_mb": row[4],
+                        "bench_gen_tps": row[5]}
             except json.JSONDecodeError:
                 # This might happen if args_json is corrupt in DB for some reason
                 print(f"Warning: Could not parse JSON args from historical DB entry for model {current_model_analysis['filepath']}.")
@@ -742,6 +844,224 @@ def get_history_entries(db_file, limit=50):
         if conn:
             conn.close()
 
+# --- Nearest-Neighbour Warm Start ---
+WARM_START_NEIGHBOURS = 3
+WARM_START_MAX_DISTANCE = 2.0  # Roughly "twice the size on the same card" or "half the VRAM for the same model"
+# Per-feature weights of the model distance (size and VRAM are compared in log2 units)
+WARM_START_DISTANCE_WEIGHTS = {"size_b": 1.0, "quant_bits": 0.25, "is_moe": 2.0, "num_layers": 1.0, "vram_mb": 1.0}
+
+
+def _quant_bits(quant: Optional[str]) -> Optional[float]:
+    quant_upper = (quant or "").upper()
+    if "BF16" in quant_upper or "F16" in quant_upper:
+        return 16.0
+    if "F32" in quant_upper:
+        return 32.0
+    match = re.search(r"Q(\d)", quant_upper)
+    return float(match.group(1)) if match else None
+
+
+def _log2_distance(a, b) -> float:
+    if not isinstance(a, (int, float)) or not isinstance(b, (int, float)) or a <= 0 or b <= 0:
+        return 1.0  # Unknown on either side: as far as a doubling
+    return abs(math.log2(a / b))
+
+
+def model_similarity_distance(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """Weighted distance between two models/launches described by size_b, quant, is_moe, num_layers and vram_mb."""
+    bits_a, bits_b = _quant_bits(a.get("quant")), _quant_bits(b.get("quant"))
+    layers_a, layers_b = a.get("num_layers"), b.get("num_layers")
+    terms = {
+        "size_b": _log2_distance(a.get("size_b"), b.get("size_b")),
+        "quant_bits": abs(bits_a - bits_b) if bits_a is not None and bits_b is not None else (0.0 if a.get("quant") == b.get("quant") else 2.0),
+        "is_moe": 0.0 if bool(a.get("is_moe")) == bool(b.get("is_moe")) else 1.0,
+        "num_layers": abs(layers_a - layers_b) / max(layers_a, layers_b) if layers_a and layers_b else 0.5,
+        "vram_mb": _log2_distance(a.get("vram_mb"), b.get("vram_mb")),
+    }
+    return sum(WARM_START_DISTANCE_WEIGHTS[key] * value for key, value in terms.items())
+
+
+def find_similar_tuned_models(db_file: str, model_analysis: dict, current_vram_mb: Optional[float],
+                              max_neighbours: int = WARM_START_NEIGHBOURS) -> Dict[str, Any]:
+    """
+    Nearest already-tuned models in launch_history (by size, quant bits, MoE, layer count and VRAM at decision),
+    for models without history of their own. From each neighbour's most GPU-heavy clean load it takes the GPU
+    weight bytes per MiB of free VRAM, averages them weighted by closeness and scales to current_vram_mb,
+    which gives the GPU weight bytes (and fraction of this model's weights) to start tuning from.
+    """
+    model_weights_bytes = estimate_gpu_weight_bytes(model_analysis, 999)
+    if not model_weights_bytes or not current_vram_mb:
+        return {"success": False, "message": "Warm start needs the GGUF tensor table and the current free VRAM."}
+    own_keys = {model_analysis.get('filepath'), model_analysis.get('fingerprint')} - {None}
+    conn = None
+    try:
+        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        rows = conn.execute("""
+            SELECT model_filepath, model_fingerprint, model_size_b, model_quant_type, is_moe, num_layers,
+                   vram_at_launch_decision_mb, model_weights_mb, gpu_weight_fraction
+            FROM launch_history
+            WHERE gpu_weight_fraction IS NOT NULL AND model_weights_mb IS NOT NULL AND vram_at_launch_decision_mb > 0
+              AND launch_outcome LIKE 'SUCCESS%' AND launch_outcome NOT LIKE '%TIGHT%'
+        """).fetchall()
+    except sqlite3.Error as e:
+        return {"success": False, "message": f"Warm start lookup failed: {e}"}
+    finally:
+        if conn:
+            conn.close()
+
+    target = {"size_b": model_analysis.get('size_b'), "quant": model_analysis.get('quant'), "is_moe": model_analysis.get('is_moe'),
+              "num_layers": model_analysis.get('num_layers'), "vram_mb": current_vram_mb}
+    best_per_model: Dict[str, Dict[str, Any]] = {}
+    for filepath, fingerprint, size_b, quant, is_moe, num_layers, vram_mb, weights_mb, fraction in rows:
+        if filepath in own_keys or fingerprint in own_keys:
+            continue
+        gpu_mb_per_vram_mb = fraction * weights_mb / vram_mb
+        distance = model_similarity_distance(target, {"size_b": size_b, "quant": quant, "is_moe": is_moe,
+                                                      "num_layers": num_layers, "vram_mb": vram_mb})
+        known = best_per_model.get(fingerprint or filepath)
+        if known is None or gpu_mb_per_vram_mb > known["gpu_mb_per_vram_mb"]:
+            best_per_model[fingerprint or filepath] = {"model": os.path.basename(filepath), "distance": distance, "fraction": fraction,
+                                                       "gpu_mb_per_vram_mb": gpu_mb_per_vram_mb, "vram_mb": vram_mb}
+    neighbours = sorted((n for n in best_per_model.values() if n["distance"] <= WARM_START_MAX_DISTANCE),
+                        key=lambda n: n["distance"])[:max_neighbours]
+    if not neighbours:
+        return {"success": False, "neighbours": [], "message": "Warm start: no similar tuned model in history."}
+
+    weights = [1.0 / (0.1 + n["distance"]) for n in neighbours]
+    gpu_mb_per_vram_mb = sum(w * n["gpu_mb_per_vram_mb"] for w, n in zip(weights, neighbours)) / sum(weights)
+    target_bytes = min(model_weights_bytes, int(gpu_mb_per_vram_mb * current_vram_mb * 1024 * 1024))
+    fraction = target_bytes / model_weights_bytes
+    names = ", ".join(f"{n['model']} (d={n['distance']:.2f})" for n in neighbours)
+    return {"success": True, "neighbours": neighbours, "gpu_weight_fraction": fraction, "target_gpu_weight_bytes": target_bytes,
+            "message": f"Warm start from {names}: ~{fraction * 100:.0f}% of the weights ({target_bytes / (1024**2):.0f} MiB) on GPU"}
+
+
+def warm_start_vram_budget_mb(model_analysis: dict, args_dict: dict, warm_start: Dict[str, Any]) -> Optional[float]:
+    """
+    The VRAM budget for the offload planners that reproduces a warm start: its GPU weight bytes plus the
+    KV cache and compute buffer the session args need with the whole model on the GPU.
+    """
+    if not warm_start.get("success"):
+        return None
+    full_offload = estimate_vram_usage_for_args(model_analysis, dict(args_dict, **{"--gpulayers": "999"}))
+    if not full_offload.get("success"):
+        return None
+    return (warm_start["target_gpu_weight_bytes"] + full_offload["kv_bytes"] + full_offload["compute_bytes"]) / (1024 * 1024)
+
+
+# --- VRAM Predictor ---
+VRAM_PREDICTOR_MIN_SAMPLES = 5            # Fewer successful launches with a VRAM reading: no prediction
+VRAM_PREDICTOR_FULL_MODEL_SAMPLES = 15    # Below this only planned MiB + intercept are fitted
+VRAM_PREDICTOR_UPPER_QUANTILE = 0.9       # Residual quantile added on top of the fit for the "likely peak"
+VRAM_PREDICTOR_FEATURES = ("planned_gpu_mb", "context_k", "quantkv", "flashattention", "blasbatchsize_256", "intercept")
+
+
+def _vram_predictor_features(planned_gpu_mb: float, args_dict: dict) -> List[float]:
+    return [float(planned_gpu_mb), _arg_as_int(args_dict, "--contextsize", 4096) / 1024.0,
+            float(_arg_as_int(args_dict, "--quantkv", 0)), 1.0 if _arg_as_bool(args_dict, "--flashattention") else 0.0,
+            _arg_as_int(args_dict, "--blasbatchsize", KOBOLDCPP_DEFAULT_BLAS_BATCH_SIZE) / 256.0, 1.0]
+
+
+def _solve_linear_system(matrix: List[List[float]], rhs: List[float]) -> Optional[List[float]]:
+    """Gaussian elimination with partial pivoting; None if the system is singular."""
+    n = len(rhs)
+    augmented = [row[:] + [rhs[r]] for r, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(augmented[r][col]))
+        if abs(augmented[pivot][col]) < 1e-12:
+            return None
+        augmented[col], augmented[pivot] = augmented[pivot], augmented[col]
+        for r in range(col + 1, n):
+            factor = augmented[r][col] / augmented[col][col]
+            for c in range(col, n + 1):
+                augmented[r][c] -= factor * augmented[col][c]
+    solution = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        solution[r] = (augmented[r][n] - sum(augmented[r][c] * solution[c] for c in range(r + 1, n))) / augmented[r][r]
+    return solution
+
+
+def train_vram_predictor(db_file: str, gpu_name: Optional[str] = None, ridge_lambda: float = 1.0) -> Dict[str, Any]:
+    """
+    Fits KoboldCpp's observed VRAM use (approx_vram_used_kcpp_mb of successful launches) as a ridge-regularized
+    linear function of the planned GPU MiB, context size, --quantkv, --flashattention and --blasbatchsize.
+    Uses rows of gpu_name when there are enough of them, otherwise every GPU. The upper quantile of the
+    residuals gives a conservative margin on top of the fit.
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        rows = conn.execute("""
+            SELECT planned_gpu_mb, kobold_args_json, approx_vram_used_kcpp_mb, gpu_name FROM launch_history
+            WHERE launch_outcome LIKE 'SUCCESS%' AND planned_gpu_mb IS NOT NULL
+              AND approx_vram_used_kcpp_mb IS NOT NULL AND approx_vram_used_kcpp_mb > 0
+        """).fetchall()
+    except sqlite3.Error as e:
+        return {"success": False, "message": f"VRAM predictor: could not read launch history: {e}"}
+    finally:
+        if conn:
+            conn.close()
+
+    samples_by_gpu: Dict[Optional[str], List[Tuple[List[float], float]]] = {}
+    for planned_mb, args_json, observed_mb, row_gpu_name in rows:
+        try:
+            args_dict = args_list_to_dict(json.loads(args_json))
+        except (json.JSONDecodeError, TypeError):
+            continue
+        samples_by_gpu.setdefault(row_gpu_name, []).append((_vram_predictor_features(planned_mb, args_dict), float(observed_mb)))
+    samples = samples_by_gpu.get(gpu_name, []) if gpu_name else []
+    scope = gpu_name
+    if len(samples) < VRAM_PREDICTOR_MIN_SAMPLES:
+        samples, scope = [sample for group in samples_by_gpu.values() for sample in group], "all GPUs"
+    if len(samples) < VRAM_PREDICTOR_MIN_SAMPLES:
+        return {"success": False, "samples": len(samples),
+                "message": f"VRAM predictor: {len(samples)} usable launches recorded, {VRAM_PREDICTOR_MIN_SAMPLES} needed."}
+
+    # Few samples: fit only the planned MiB slope and intercept; the other coefficients stay 0
+    used = list(range(len(VRAM_PREDICTOR_FEATURES))) if len(samples) >= VRAM_PREDICTOR_FULL_MODEL_SAMPLES else [0, len(VRAM_PREDICTOR_FEATURES) - 1]
+    xtx = [[sum(x[i] * x[j] for x, _ in samples) + (ridge_lambda if i == j and i != used[-1] else 0.0) for j in used] for i in used]
+    xty = [sum(x[i] * y for x, y in samples) for i in used]
+    solved = _solve_linear_system(xtx, xty)
+    if solved is None:
+        return {"success": False, "samples": len(samples), "message": "VRAM predictor: launch history is degenerate (singular fit)."}
+    coefficients = [0.0] * len(VRAM_PREDICTOR_FEATURES)
+    for position, feature_index in enumerate(used):
+        coefficients[feature_index] = solved[position]
+
+    residuals = sorted(y - sum(c * v for c, v in zip(coefficients, x)) for x, y in samples)
+    margin_mb = max(0.0, residuals[min(len(residuals) - 1, int(VRAM_PREDICTOR_UPPER_QUANTILE * len(residuals)))])
+    mean_abs_error = sum(abs(r) for r in residuals) / len(residuals)
+    return {
+        "success": True, "gpu_name": scope, "samples": len(samples), "coefficients": dict(zip(VRAM_PREDICTOR_FEATURES, coefficients)),
+        "margin_mb": margin_mb, "mean_abs_error_mb": mean_abs_error,
+        "message": (f"VRAM predictor ({scope}): {len(samples)} launches, observed ~ {coefficients[0]:.2f} x planned "
+                    f"+ {coefficients[-1]:.0f} MiB, mean error {mean_abs_error:.0f} MiB, +{margin_mb:.0f} MiB margin")
+    }
+
+
+def predict_vram_for_args(predictor: Dict[str, Any], model_analysis: dict, args_dict: dict,
+                          budget_mb: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Predicted KoboldCpp VRAM use (fit and fit + margin) for a candidate command. With budget_mb,
+    'likely_exceeds' is set when the upper prediction does not fit.
+    """
+    if not predictor or not predictor.get("success"):
+        return {"success": False, "message": (predictor or {}).get("message", "VRAM predictor not trained.")}
+    planned = estimate_vram_usage_for_args(model_analysis, args_dict)
+    if not planned.get("success"):
+        return {"success": False, "message": planned.get("message", "VRAM estimate unavailable.")}
+    planned_mb = planned["total_bytes"] / (1024 * 1024)
+    features = _vram_predictor_features(planned_mb, args_dict)
+    predicted_mb = sum(predictor["coefficients"][name] * value for name, value in zip(VRAM_PREDICTOR_FEATURES, features))
+    upper_mb = predicted_mb + predictor["margin_mb"]
+    likely_exceeds = budget_mb is not None and upper_mb > budget_mb
+    message = f"History-based VRAM prediction: ~{predicted_mb:.0f} MiB (up to {upper_mb:.0f} MiB; planned {planned_mb:.0f} MiB)"
+    if budget_mb is not None:
+        message += f" vs {budget_mb:.0f} MiB free" + (" - likely OOM" if likely_exceeds else "")
+    return {"success": True, "planned_mb": planned_mb, "predicted_mb": predicted_mb, "upper_mb": upper_mb,
+            "likely_exceeds": likely_exceeds, "message": message}
+
+
 def get_system_info():
     info = {"cpu_model": "Unknown", "cpu_cores_physical": "N/A", "cpu_cores_logical": "N/A",
             "ram_total_gb": 0, "ram_free_gb": 0, "ram_used_percent": 0,
@@ -1307,6 +1627,9 @@ def get_gpu_info_apple_metal(device_index: int = 0) -> Optional[Dict[str, Any]]:
         return {"success": False, "type": "APPLE_METAL_RUNTIME_ERROR", "message": f"Apple Metal runtime error (ID {device_index}): {e_metal_runtime}"}
 
 
+_last_detected_gpu_name: Optional[str] = None  # Recorded with launch history when the caller passes no GPU name
+
+
 def get_available_vram_mb(current_config: Optional[Dict] = None,
                           target_gpu_type: Optional[str] = None,
                           target_gpu_index: Optional[int] = None
@@ -1375,6 +1698,10 @@ def get_available_vram_mb(current_config: Optional[Dict] = None,
                 msg_suffix = f" System RAM: {sys_ram_info['ram_free_gb']:.1f}/{sys_ram_info['ram_total_gb']:.1f}GB free."
                 raw_gpu_info_dict["message"] = raw_gpu_info_dict.get("message","").rstrip('.') + msg_suffix
 
+    if raw_gpu_info_dict.get("success") and raw_gpu_info_dict.get("name"):
+        global _last_detected_gpu_name
+        _last_detected_gpu_name = raw_gpu_info_dict["name"]
+
     # Apply manual VRAM budget override if active.
     final_return_dict = raw_gpu_info_dict.copy() # Start with raw HW info
     final_return_dict["override_active"] = False
@@ -1419,6 +1746,621 @@ def get_available_vram_mb(current_config: Optional[Dict] = None,
             final_return_dict)
 
 
+# --- GGUF Header Parsing ---
+# Reads only the metadata KV section and the tensor-info table of a GGUF file; tensor data is never touched.
+GGUF_MAGIC = b"GGUF"
+GGUF_DEFAULT_ALIGNMENT = 32
+GGUF_MAX_KEPT_ARRAY_LEN = 1024  # Longer arrays (tokenizer vocab, merges, scores) are skipped; only their length is kept
+
+_GGUF_TYPE_STRING = 8
+_GGUF_TYPE_ARRAY = 9
+_GGUF_SCALAR_FORMATS = {
+    0: "B", 1: "b", 2: "H", 3: "h", 4: "I", 5: "i", 6: "f", 7: "?", 10: "Q", 11: "q", 12: "d"
+}
+
+# llama.cpp LLAMA_FTYPE_* values stored in general.file_type
+GGUF_FILE_TYPE_NAMES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1",
+    10: "Q2_K", 11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M",
+    16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S",
+    22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M",
+    28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16", 36: "TQ1_0", 37: "TQ2_0"
+}
+
+
+class _GGUFStreamReader:
+    """Sequential little/big-endian reader over a buffered file handle."""
+
+    def __init__(self, fh, endian: str = "<", version: int = 3):
+        self.fh = fh
+        self.endian = endian
+        self.version = version
+        # GGUF v1 used 32-bit lengths and counts; v2+ use 64-bit
+        self.len_fmt = "I" if version == 1 else "Q"
+
+    def read(self, fmt: str):
+        size = struct.calcsize(self.endian + fmt)
+        data = self.fh.read(size)
+        if len(data) != size:
+            raise ValueError("Unexpected end of file while reading GGUF header")
+        return struct.unpack(self.endian + fmt, data)[0]
+
+    def read_len(self) -> int:
+        return self.read(self.len_fmt)
+
+    def read_str(self) -> str:
+        length = self.read_len()
+        if length > (1 << 24):
+            raise ValueError(f"Implausible GGUF string length {length}")
+        data = self.fh.read(length)
+        if len(data) != length:
+            raise ValueError("Unexpected end of file while reading GGUF string")
+        return data.decode("utf-8", errors="replace")
+
+    def skip_str(self):
+        self.fh.seek(self.read_len(), os.SEEK_CUR)
+
+    def read_value(self, value_type: int, key: str, skipped_arrays: Dict[str, int]):
+        if value_type in _GGUF_SCALAR_FORMATS:
+            return self.read(_GGUF_SCALAR_FORMATS[value_type])
+        if value_type == _GGUF_TYPE_STRING:
+            return self.read_str()
+        if value_type == _GGUF_TYPE_ARRAY:
+            item_type = self.read("I")
+            count = self.read_len()
+            if count > GGUF_MAX_KEPT_ARRAY_LEN:
+                skipped_arrays[key] = count
+                if item_type in _GGUF_SCALAR_FORMATS:
+                    self.fh.seek(count * struct.calcsize(self.endian + _GGUF_SCALAR_FORMATS[item_type]), os.SEEK_CUR)
+                elif item_type == _GGUF_TYPE_STRING:
+                    for _ in range(count):
+                        self.skip_str()
+                else:
+                    for _ in range(count):
+                        self.read_value(item_type, key, {})
+                return None
+            return [self.read_value(item_type, key, skipped_arrays) for _ in range(count)]
+        raise ValueError(f"Unknown GGUF value type {value_type} for key '{key}'")
+
+
+def read_gguf_header(filepath: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Parses the GGUF header (metadata KVs and tensor-info table) without reading tensor data.
+    Returns (header_dict, message); header_dict is None if the file is not a readable GGUF.
+    """
+    try:
+        file_size = os.path.getsize(filepath)
+        with open(filepath, "rb", buffering=1 << 20) as fh:
+            if fh.read(4) != GGUF_MAGIC:
+                return None, "Not a GGUF file (bad magic)."
+            raw_version = fh.read(4)
+            if len(raw_version) != 4:
+                return None, "Truncated GGUF header."
+            endian = "<"
+            version = struct.unpack("<I", raw_version)[0]
+            if version > 0xFFFF:  # Byte-swapped version field means a big-endian GGUF
+                endian, version = ">", struct.unpack(">I", raw_version)[0]
+            if version not in (1, 2, 3):
+                return None, f"Unsupported GGUF version {version}."
+
+            reader = _GGUFStreamReader(fh, endian, version)
+            tensor_count = reader.read_len()
+            kv_count = reader.read_len()
+            if tensor_count > 1_000_000 or kv_count > 1_000_000:
+                return None, "GGUF header counts are implausible; file is probably corrupt."
+
+            metadata: Dict[str, Any] = {}
+            skipped_arrays: Dict[str, int] = {}
+            for _ in range(kv_count):
+                key = reader.read_str()
+                value_type = reader.read("I")
+                value = reader.read_value(value_type, key, skipped_arrays)
+                if key not in skipped_arrays:
+                    metadata[key] = value
+
+            dim_fmt = "I" if version == 1 else "Q"
+            tensors = []
+            for _ in range(tensor_count):
+                name = reader.read_str()
+                n_dims = reader.read("I")
+                if n_dims > 8:
+                    raise ValueError(f"Tensor '{name}' reports {n_dims} dimensions")
+                dims = tuple(reader.read(dim_fmt) for _ in range(n_dims))
+                ggml_type = reader.read("I")
+                offset = reader.read("Q")
+                tensors.append((name, dims, ggml_type, offset))
+
+            alignment = metadata.get("general.alignment", GGUF_DEFAULT_ALIGNMENT)
+            if not isinstance(alignment, int) or alignment <= 0:
+                alignment = GGUF_DEFAULT_ALIGNMENT
+            header_end = fh.tell()
+            data_offset = header_end + (alignment - header_end % alignment) % alignment
+            # A corrupt tensor table must fail here rather than overflow TensorInventory's typed arrays later
+            data_size = file_size - data_offset
+            for name, dims, ggml_type, offset in tensors:
+                if ggml_type > 0xFFFF:
+                    raise ValueError(f"Tensor '{name}' has invalid ggml type {ggml_type}")
+                nbytes = ggml_tensor_nbytes(ggml_type, dims) or 0
+                if offset + nbytes > data_size:
+                    raise ValueError(f"Tensor '{name}' extends past the end of the file")
+    except (OSError, ValueError, struct.error) as e:
+        return None, f"Failed to read GGUF header: {e}"
+
+    return {
+        "filepath": filepath, "file_size": file_size, "version": version, "endian": endian,
+        "tensor_count": tensor_count, "kv_count": kv_count, "metadata": metadata,
+        "skipped_arrays": skipped_arrays, "tensors": tensors,
+        "alignment": alignment, "data_offset": data_offset
+    }, f"GGUF v{version}: {kv_count} metadata keys, {tensor_count} tensors."
+
+
+def summarize_gguf_header(header: Dict[str, Any]) -> Dict[str, Any]:
+    """Extracts the model facts the launcher cares about from a parsed GGUF header."""
+    meta = header.get("metadata", {})
+    arch = meta.get("general.architecture", "unknown")
+    prefix = f"{arch}."
+
+    def arch_val(name, default=None):
+        return meta.get(prefix + name, default)
+
+    # Architecture hyper-parameters (scalars and short per-layer lists) are kept for KV/compute estimates
+    hparams = {k[len(prefix):]: v for k, v in meta.items()
+               if k.startswith(prefix) and isinstance(v, (int, float, bool, list))}
+
+    param_count = 0
+    for _, dims, _, _ in header.get("tensors", []):
+        n_elements = 1
+        for dim in dims:
+            n_elements *= dim
+        param_count += n_elements
+
+    vocab_size = arch_val("vocab_size")
+    if vocab_size is None:
+        vocab_size = header.get("skipped_arrays", {}).get("tokenizer.ggml.tokens")
+        if vocab_size is None and isinstance(meta.get("tokenizer.ggml.tokens"), list):
+            vocab_size = len(meta["tokenizer.ggml.tokens"])
+
+    file_type = meta.get("general.file_type")
+    return {
+        "architecture": arch,
+        "model_name": meta.get("general.name"),
+        "size_label": meta.get("general.size_label"),
+        "block_count": arch_val("block_count"),
+        "expert_count": arch_val("expert_count", 0) or 0,
+        "expert_used_count": arch_val("expert_used_count", 0) or 0,
+        "context_length": arch_val("context_length"),
+        "embedding_length": arch_val("embedding_length"),
+        "vocab_size": vocab_size,
+        "param_count": param_count,
+        "file_type": GGUF_FILE_TYPE_NAMES.get(file_type) if isinstance(file_type, int) else None,
+        "hparams": hparams,
+    }
+
+
+# --- Sharded GGUF Sets ---
+_GGUF_SHARD_RE = re.compile(r"^(?P<prefix>.+)-(?P<no>\d{5})-of-(?P<count>\d{5})\.gguf$", re.IGNORECASE)
+
+
+def parse_gguf_shard_name(filepath: str) -> Optional[Tuple[str, int, int]]:
+    """Returns (prefix_path, shard_no, shard_count) for '<name>-0000N-of-0000M.gguf' files, else None."""
+    shard_match = _GGUF_SHARD_RE.match(filepath)
+    if not shard_match:
+        return None
+    return shard_match.group("prefix"), int(shard_match.group("no")), int(shard_match.group("count"))
+
+
+def find_gguf_shards(filepath: str) -> List[str]:
+    """
+    All parts of a split GGUF in order, starting with the -00001- file KoboldCpp must be given.
+    Returns [filepath] for single-file models; missing parts are left out (see analysis details).
+    """
+    shard_info = parse_gguf_shard_name(filepath)
+    if not shard_info:
+        return [filepath]
+    prefix, _, shard_count = shard_info
+    width = len(_GGUF_SHARD_RE.match(filepath).group("no"))
+    ext = filepath[-5:]  # Keep the original ".gguf" casing
+    candidates = [f"{prefix}-{n:0{width}d}-of-{shard_count:0{width}d}{ext}" for n in range(1, shard_count + 1)]
+    return [c for c in candidates if os.path.isfile(c)]
+
+
+def read_gguf_model_header(filepath: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    read_gguf_header for a whole model: split GGUFs are merged into one header whose tensor list
+    spans every shard (tensor_shards gives each tensor's part) and whose file_size is the set total.
+    Without the -00001- part (which holds the model metadata and is what KoboldCpp loads) there is no header.
+    """
+    shard_paths = find_gguf_shards(filepath)
+    if len(shard_paths) <= 1 and not parse_gguf_shard_name(filepath):
+        return read_gguf_header(filepath)
+    if not shard_paths:
+        return None, "No shards of this split GGUF were found."
+    if parse_gguf_shard_name(shard_paths[0])[1] != 1:
+        return None, "The first part (-00001-) of this split GGUF is missing; it holds the model metadata and is the file KoboldCpp loads."
+
+    merged: Optional[Dict[str, Any]] = None
+    tensor_shards: List[int] = []
+    for shard_idx, shard_path in enumerate(shard_paths):
+        shard_header, msg = read_gguf_header(shard_path)
+        if shard_header is None:
+            return None, f"Shard {os.path.basename(shard_path)}: {msg}"
+        shard_summary = {"filepath": shard_path, "file_size": shard_header["file_size"], "data_offset": shard_header["data_offset"]}
+        if merged is None:
+            merged = dict(shard_header)
+            merged["tensors"] = list(shard_header["tensors"])
+            merged["shards"] = [shard_summary]
+        else:
+            merged["tensors"].extend(shard_header["tensors"])
+            merged["file_size"] += shard_header["file_size"]
+            merged["shards"].append(shard_summary)
+        tensor_shards.extend([shard_idx] * len(shard_header["tensors"]))
+
+    shard_count_expected = parse_gguf_shard_name(filepath)[2]
+    merged["filepath"] = shard_paths[0]
+    merged["tensor_shards"] = tensor_shards
+    merged["shard_paths"] = shard_paths
+    merged["tensor_count"] = len(merged["tensors"])
+    merged["missing_shards"] = shard_count_expected - len(shard_paths)
+    msg = f"Split GGUF: {len(shard_paths)}/{shard_count_expected} shards, {merged['tensor_count']} tensors."
+    return merged, msg
+
+
+# --- Model Fingerprint ---
+FINGERPRINT_SAMPLE_COUNT = 16
+FINGERPRINT_SAMPLE_BYTES = 64 * 1024
+FINGERPRINT_MAX_HEADER_BYTES = 64 * 1024 * 1024
+
+
+def compute_model_fingerprint(filepath: str, header: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Path-independent identity for a GGUF model: a BLAKE2b hash of each part's size, raw header bytes
+    and evenly spaced samples of tensor data, read through mmap so only the sampled pages are touched.
+    Moving, renaming or re-mounting the file keeps the fingerprint; re-quantizing changes it.
+    """
+    if header is None:
+        header, _ = read_gguf_model_header(filepath)
+        if header is None:
+            return None
+    parts = header.get("shards") or [{"filepath": header.get("filepath", filepath),
+                                      "file_size": header.get("file_size", 0), "data_offset": header.get("data_offset", 0)}]
+    hasher = hashlib.blake2b(digest_size=16)
+    try:
+        for part in parts:
+            file_size, data_offset = part["file_size"], min(part["data_offset"], part["file_size"])
+            hasher.update(struct.pack("<QQ", file_size, data_offset))
+            if file_size == 0:
+                continue
+            with open(part["filepath"], "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                hasher.update(mm[:min(data_offset, FINGERPRINT_MAX_HEADER_BYTES)])
+                data_len = file_size - data_offset
+                if data_len <= FINGERPRINT_SAMPLE_BYTES * FINGERPRINT_SAMPLE_COUNT:
+                    hasher.update(mm[data_offset:file_size])
+                else:
+                    stride = (data_len - FINGERPRINT_SAMPLE_BYTES) // (FINGERPRINT_SAMPLE_COUNT - 1)
+                    for i in range(FINGERPRINT_SAMPLE_COUNT):
+                        start = data_offset + i * stride
+                        hasher.update(mm[start:start + FINGERPRINT_SAMPLE_BYTES])
+    except (OSError, ValueError) as e:
+        print(f"Could not fingerprint {os.path.basename(filepath)}: {e}")
+        return None
+    return hasher.hexdigest()
+
+
+# --- Tensor Inventory ---
+# ggml type id -> (name, elements per block, bytes per block)
+GGML_TYPE_INFO = {
+    0: ("F32", 1, 4), 1: ("F16", 1, 2), 2: ("Q4_0", 32, 18), 3: ("Q4_1", 32, 20),
+    6: ("Q5_0", 32, 22), 7: ("Q5_1", 32, 24), 8: ("Q8_0", 32, 34), 9: ("Q8_1", 32, 36),
+    10: ("Q2_K", 256, 84), 11: ("Q3_K", 256, 110), 12: ("Q4_K", 256, 144), 13: ("Q5_K", 256, 176),
+    14: ("Q6_K", 256, 210), 15: ("Q8_K", 256, 292), 16: ("IQ2_XXS", 256, 66), 17: ("IQ2_XS", 256, 74),
+    18: ("IQ3_XXS", 256, 98), 19: ("IQ1_S", 256, 50), 20: ("IQ4_NL", 32, 18), 21: ("IQ3_S", 256, 110),
+    22: ("IQ2_S", 256, 82), 23: ("IQ4_XS", 256, 136), 24: ("I8", 1, 1), 25: ("I16", 1, 2),
+    26: ("I32", 1, 4), 27: ("I64", 1, 8), 28: ("F64", 1, 8), 29: ("IQ1_M", 256, 56),
+    30: ("BF16", 1, 2), 34: ("TQ1_0", 256, 54), 35: ("TQ2_0", 256, 66), 39: ("MXFP4", 32, 17)
+}
+
+TENSOR_ROLES = (
+    "attn_q", "attn_k", "attn_v", "attn_o", "attn_qkv",
+    "ffn_up", "ffn_down", "ffn_gate",
+    "ffn_up_exps", "ffn_down_exps", "ffn_gate_exps",
+    "ffn_up_shexp", "ffn_down_shexp", "ffn_gate_shexp", "ffn_gate_inp",
+    "norm", "token_embd", "output", "other"
+)
+_TENSOR_ROLE_INDEX = {role: i for i, role in enumerate(TENSOR_ROLES)}
+
+# Tensor base name (without "blk.N." and ".weight"/".bias") -> role, llama.cpp naming
+_DEFAULT_TENSOR_ROLE_NAMES = {
+    "attn_q": "attn_q", "attn_k": "attn_k", "attn_v": "attn_v", "attn_output": "attn_o", "attn_qkv": "attn_qkv",
+    "ffn_up": "ffn_up", "ffn_down": "ffn_down", "ffn_gate": "ffn_gate",
+    "ffn_up_exps": "ffn_up_exps", "ffn_down_exps": "ffn_down_exps", "ffn_gate_exps": "ffn_gate_exps",
+    "ffn_up_shexp": "ffn_up_shexp", "ffn_down_shexp": "ffn_down_shexp", "ffn_gate_shexp": "ffn_gate_shexp",
+    "ffn_gate_inp": "ffn_gate_inp", "token_embd": "token_embd", "output": "output",
+    "ffn_gate_up_exps": "ffn_up_exps", "ffn_gate_inp_shexp": "ffn_gate_inp", "ffn_exp_probs_b": "ffn_gate_inp",
+}
+
+_MLA_TENSOR_ROLE_NAMES = {
+    "attn_q_a": "attn_q", "attn_q_b": "attn_q", "attn_kv_a_mqa": "attn_k", "attn_kv_b": "attn_k",
+    "attn_k_b": "attn_k", "attn_v_b": "attn_v",
+}
+_RWKV_TENSOR_ROLE_NAMES = {
+    "time_mix_receptance": "attn_q", "time_mix_key": "attn_k", "time_mix_value": "attn_v", "time_mix_output": "attn_o",
+    "channel_mix_key": "ffn_up", "channel_mix_value": "ffn_down", "channel_mix_receptance": "ffn_gate",
+}
+# general.architecture -> base names that differ from llama naming; merged over _DEFAULT_TENSOR_ROLE_NAMES
+TENSOR_ROLE_REGISTRY: Dict[str, Dict[str, str]] = {
+    "deepseek2": _MLA_TENSOR_ROLE_NAMES, "minicpm3": _MLA_TENSOR_ROLE_NAMES, "plm": _MLA_TENSOR_ROLE_NAMES,
+    "rwkv6": _RWKV_TENSOR_ROLE_NAMES, "rwkv6qwen2": _RWKV_TENSOR_ROLE_NAMES,
+    "rwkv7": _RWKV_TENSOR_ROLE_NAMES, "arwkv7": _RWKV_TENSOR_ROLE_NAMES,
+    "mamba": {"ssm_in": "ffn_up", "ssm_out": "ffn_down"}, "mamba2": {"ssm_in": "ffn_up", "ssm_out": "ffn_down"},
+}
+_BLOCK_TENSOR_NAME_RE = re.compile(r"^blk\.(\d+)\.(.+?)(?:\.(?:weight|bias|scale))?$")
+
+
+def split_tensor_name(name: str) -> Tuple[str, int]:
+    """Returns (base_name, block_index): 'blk.7.attn_q.weight' -> ('attn_q', 7), 'output.weight' -> ('output', -1)."""
+    block_match = _BLOCK_TENSOR_NAME_RE.match(name)
+    if block_match:
+        return block_match.group(2), int(block_match.group(1))
+    return re.sub(r"\.(?:weight|bias|scale)$", "", name), -1
+
+
+def classify_tensor_name(name: str, architecture: Optional[str] = None) -> Tuple[str, int]:
+    """Returns (role, block_index) for a GGUF tensor name; block_index is -1 for non-block tensors."""
+    base, block_index = split_tensor_name(name)
+    role = TENSOR_ROLE_REGISTRY.get(architecture or "", {}).get(base) or _DEFAULT_TENSOR_ROLE_NAMES.get(base)
+    if role is None:
+        role = "norm" if base.endswith("norm") else "other"
+    return role, block_index
+
+
+def ggml_tensor_nbytes(ggml_type: int, dims: Tuple[int, ...]) -> Optional[int]:
+    type_info = GGML_TYPE_INFO.get(ggml_type)
+    if type_info is None:
+        return None
+    n_elements = 1
+    for dim in dims:
+        n_elements *= dim
+    _, block_size, type_size = type_info
+    return n_elements // block_size * type_size
+
+
+class TensorInventory:
+    """
+    Column-oriented view of a GGUF tensor-info table. Each column is a compact array indexed
+    by tensor position, so byte totals for roles, blocks or override patterns are cheap to compute.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.shapes: List[Tuple[int, ...]] = []
+        self.dtypes = array.array("H")
+        self.nbytes = array.array("Q")
+        self.offsets = array.array("Q")
+        self.blocks = array.array("i")
+        self.roles = array.array("B")
+        self.shards = array.array("H")  # Index into shard_paths for split GGUFs; offsets are relative to that part
+        self.shard_paths: List[str] = []
+        self.architecture = "unknown"
+        self.num_blocks = 0
+        self._base_names_by_role: Optional[Dict[str, List[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, dims: Tuple[int, ...], ggml_type: int, nbytes: int, offset: int, shard: int = 0):
+        role, block_index = classify_tensor_name(name, self.architecture)
+        self.names.append(name)
+        self.shapes.append(dims)
+        self.dtypes.append(ggml_type)
+        self.nbytes.append(nbytes)
+        self.offsets.append(offset)
+        self.blocks.append(block_index)
+        self.roles.append(_TENSOR_ROLE_INDEX[role])
+        self.shards.append(shard)
+        self._base_names_by_role = None
+        if block_index >= self.num_blocks:
+            self.num_blocks = block_index + 1
+
+    def role_of(self, i: int) -> str:
+        return TENSOR_ROLES[self.roles[i]]
+
+    def dtype_name(self, i: int) -> str:
+        type_info = GGML_TYPE_INFO.get(self.dtypes[i])
+        return type_info[0] if type_info else f"TYPE_{self.dtypes[i]}"
+
+    def tensor(self, i: int) -> Dict[str, Any]:
+        return {"name": self.names[i], "dtype": self.dtype_name(i), "shape": self.shapes[i],
+                "bytes": self.nbytes[i], "offset": self.offsets[i], "block": self.blocks[i], "role": self.role_of(i),
+                "shard": self.shards[i]}
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.nbytes)
+
+    def bytes_by_role(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for role_idx, size in zip(self.roles, self.nbytes):
+            role = TENSOR_ROLES[role_idx]
+            totals[role] = totals.get(role, 0) + size
+        return totals
+
+    def base_names_by_role(self) -> Dict[str, List[str]]:
+        """Distinct per-block base names ('attn_q', 'attn_kv_b', ...) present for each role, heaviest first."""
+        if self._base_names_by_role is None:
+            sizes: Dict[Tuple[str, str], int] = {}
+            for i, name in enumerate(self.names):
+                if self.blocks[i] < 0:
+                    continue
+                key = (self.role_of(i), split_tensor_name(name)[0])
+                sizes[key] = sizes.get(key, 0) + self.nbytes[i]
+            by_role: Dict[str, List[str]] = {}
+            for (role, base), _ in sorted(sizes.items(), key=lambda kv: kv[1], reverse=True):
+                by_role.setdefault(role, []).append(base)
+            self._base_names_by_role = by_role
+        return self._base_names_by_role
+
+    def bytes_by_dtype(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for i, size in enumerate(self.nbytes):
+            dtype = self.dtype_name(i)
+            totals[dtype] = totals.get(dtype, 0) + size
+        return totals
+
+    def bits_per_weight(self) -> float:
+        """Average stored bits per parameter across all tensors (the figure quant tables quote as bpw)."""
+        n_elements = 0
+        for dims in self.shapes:
+            count = 1
+            for d in dims:
+                count *= d
+            n_elements += count
+        return (self.total_bytes * 8 / n_elements) if n_elements else 0.0
+
+    def bytes_by_block(self) -> Dict[int, int]:
+        totals: Dict[int, int] = {}
+        for block_index, size in zip(self.blocks, self.nbytes):
+            totals[block_index] = totals.get(block_index, 0) + size
+        return totals
+
+    def indices_matching(self, pattern: str) -> List[int]:
+        """Indices of tensors whose name the regex matches anywhere (std::regex_search semantics)."""
+        compiled = re.compile(pattern)
+        return [i for i, name in enumerate(self.names) if compiled.search(name)]
+
+    def bytes_matching(self, pattern: str) -> int:
+        return sum(self.nbytes[i] for i in self.indices_matching(pattern))
+
+    def override_placement(self, override_tensor_str: Optional[str]) -> List[Optional[bool]]:
+        """Per tensor: True if the first matching override rule names a CPU buffer, False for another buffer, None if no rule matches."""
+        placement: List[Optional[bool]] = [None] * len(self.names)
+        compiled_rules = compile_override_tensors(override_tensor_str)[0]  # A rule that does not compile matches nothing
+        if not compiled_rules:
+            return placement
+        for i, name in enumerate(self.names):
+            for compiled, to_cpu in compiled_rules:
+                if compiled.search(name):
+                    placement[i] = to_cpu
+                    break
+        return placement
+
+    def bytes_moved_to_cpu(self, override_tensor_str: Optional[str]) -> int:
+        """Bytes a --overridetensors string assigns to CPU buffers (first matching rule wins per tensor)."""
+        return sum(size for size, to_cpu in zip(self.nbytes, self.override_placement(override_tensor_str)) if to_cpu)
+
+
+def parse_override_tensors(override_tensor_str: Optional[str]) -> List[Tuple[str, str]]:
+    """Splits an --overridetensors value into (pattern, buffer_type) rules the way llama.cpp does (comma separated)."""
+    rules = []
+    if not override_tensor_str:
+        return rules
+    for rule in override_tensor_str.split(","):
+        if "=" not in rule:
+            continue
+        pattern, buffer_type = rule.rsplit("=", 1)
+        if pattern:
+            rules.append((pattern, buffer_type.strip()))
+    return rules
+
+
+def compile_override_tensors(override_tensor_str: Optional[str]) -> Tuple[List[Tuple[Any, bool]], List[str]]:
+    """(compiled regex, goes to CPU) per valid --overridetensors rule, and an error per rule whose regex does not compile."""
+    compiled_rules, errors = [], []
+    for pattern, buffer_type in parse_override_tensors(override_tensor_str):
+        try:
+            compiled_rules.append((re.compile(pattern), buffer_type.upper().startswith("CPU")))
+        except re.error as e:
+            errors.append(f"{pattern}: {e}")
+    return compiled_rules, errors
+
+
+def build_tensor_inventory(header: Dict[str, Any]) -> TensorInventory:
+    inventory = TensorInventory()
+    inventory.architecture = header.get("metadata", {}).get("general.architecture", "unknown")
+    inventory.shard_paths = header.get("shard_paths", [header.get("filepath", "")])
+    tensors = header.get("tensors", [])
+    tensor_shards = header.get("tensor_shards") or [0] * len(tensors)
+    shards = header.get("shards") or [{"file_size": header.get("file_size", 0), "data_offset": header.get("data_offset", 0)}]
+    # Unknown ggml types fall back to the gap before the next tensor's data offset within the same part
+    next_offset: Dict[Tuple[int, int], int] = {}
+    for shard_idx, shard in enumerate(shards):
+        data_size = max(0, shard["file_size"] - shard["data_offset"])
+        sorted_offsets = sorted({t[3] for t, t_shard in zip(tensors, tensor_shards) if t_shard == shard_idx})
+        for i, off in enumerate(sorted_offsets):
+            next_offset[(shard_idx, off)] = sorted_offsets[i + 1] if i + 1 < len(sorted_offsets) else data_size
+    for (name, dims, ggml_type, offset), shard_idx in zip(tensors, tensor_shards):
+        nbytes = ggml_tensor_nbytes(ggml_type, dims)
+        if nbytes is None:
+            nbytes = max(0, next_offset.get((shard_idx, offset), offset) - offset)
+        inventory.add(name, dims, ggml_type, nbytes, offset, shard_idx)
+    return inventory
+
+
+_tensor_inventory_cache: Dict[Tuple[str, int, int], TensorInventory] = {}
+
+
+def _model_file_key(filepath: str) -> Optional[Tuple[str, int, int]]:
+    """
+    (realpath, size, mtime_ns) cache key. For a split GGUF the size is the whole set's and the mtime slot holds
+    a digest of every part's name, size and mtime_ns, so replacing, adding or removing any shard is a miss.
+    """
+    try:
+        real_path = os.path.realpath(filepath)
+        st = os.stat(real_path)
+        if not parse_gguf_shard_name(filepath):
+            return real_path, st.st_size, st.st_mtime_ns
+        hasher = hashlib.blake2b(digest_size=8)
+        total_size = 0
+        for shard_path in find_gguf_shards(filepath):
+            shard_st = os.stat(shard_path)
+            total_size += shard_st.st_size
+            hasher.update(f"{os.path.basename(shard_path)}:{shard_st.st_size}:{shard_st.st_mtime_ns}\n".encode("utf-8"))
+        return real_path, total_size, int.from_bytes(hasher.digest(), "little") >> 1  # Fits SQLite's signed INTEGER
+    except OSError:
+        return None
+
+
+def get_tensor_inventory(filepath: str, header: Optional[Dict[str, Any]] = None) -> Tuple[Optional[TensorInventory], str]:
+    """Returns the tensor inventory for a GGUF model (all parts of a split GGUF), cached in-process by _model_file_key."""
+    shard_paths = find_gguf_shards(filepath)
+    file_key = _model_file_key(shard_paths[0] if shard_paths else filepath)
+    if file_key is None:
+        return None, f"Model file not accessible: {filepath}"
+    if file_key in _tensor_inventory_cache:
+        return _tensor_inventory_cache[file_key], "Tensor inventory (cached)."
+    if header is None:
+        header, msg = read_gguf_model_header(filepath)
+        if header is None:
+            return None, msg
+    inventory = build_tensor_inventory(header)
+    _tensor_inventory_cache[file_key] = inventory
+    return inventory, f"Tensor inventory: {len(inventory)} tensors, {inventory.total_bytes / (1024**2):.0f} MiB."
+
+
+def summarize_quant_mix(inventory: TensorInventory) -> Dict[str, Any]:
+    """Bytes per tensor dtype, their shares, and the resulting bits per weight for a model's tensor table."""
+    by_dtype = sorted(inventory.bytes_by_dtype().items(), key=lambda kv: kv[1], reverse=True)
+    total = inventory.total_bytes or 1
+    return {
+        "bytes_by_dtype": dict(by_dtype),
+        "share_by_dtype": {dtype: round(size / total, 4) for dtype, size in by_dtype},
+        "dominant_dtype": by_dtype[0][0] if by_dtype else "unknown",
+        "bits_per_weight": round(inventory.bits_per_weight(), 3),
+    }
+
+
+def format_quant_mix(quant_mix: Dict[str, Any], top_n: int = 4) -> str:
+    shares = list(quant_mix.get("share_by_dtype", {}).items())[:top_n]
+    return f"{quant_mix.get('bits_per_weight', 0):.2f} bpw (" + ", ".join(f"{dtype} {share:.0%}" for dtype, share in shares) + ")"
+
+
+def format_tensor_inventory_summary(inventory: TensorInventory, top_n: int = 6) -> str:
+    by_role = sorted(inventory.bytes_by_role().items(), key=lambda kv: kv[1], reverse=True)[:top_n]
+    roles_str = ", ".join(f"{role} {size / (1024**2):.0f}" for role, size in by_role)
+    return (f"{len(inventory)} tensors in {inventory.num_blocks} blocks, "
+            f"{inventory.total_bytes / (1024**2):.0f} MiB total (MiB by role: {roles_str}); "
+            f"dtype mix {format_quant_mix(summarize_quant_mix(inventory))}")
+
+
 def analyze_filename(filepath: str) -> dict:
     filename_lower = os.path.basename(filepath).lower()
     analysis = {'filepath': filepath, 'is_moe': False, 'quant': 'unknown', 'size_b': 0, 'details': {}, 'num_layers': 32, 'estimated_vram_gb_full_gpu': 0.0}
@@ -1530,6 +2472,49 @@ def analyze_filename(filepath: str) -> dict:
     # Store final layer count
     analysis['num_layers'] = num_layers_val if num_layers_val is not None else 32
 
+    # GGUF header metadata is authoritative; the filename heuristics above are only the fallback
+    header, header_msg = read_gguf_model_header(filepath) if os.path.isfile(filepath) else (None, "File not found.")
+    if header and header.get("shard_paths"):
+        # A split GGUF is one model: report totals for the set and key it by the first part KoboldCpp loads
+        analysis['filepath'] = header['shard_paths'][0]
+        analysis['shard_count'] = len(header['shard_paths'])
+        analysis['details']['shard_paths'] = header['shard_paths']
+        if header.get('missing_shards'):
+            analysis['details']['missing_shards'] = header['missing_shards']
+    if header:
+        analysis['total_file_bytes'] = header['file_size']
+        gguf_info = summarize_gguf_header(header)
+        analysis['details']['metadata_source'] = 'gguf_header'
+        analysis['details']['filename_guess'] = {'num_layers': analysis['num_layers'], 'size_b': analysis['size_b'],
+                                                 'quant': analysis['quant'], 'is_moe': analysis['is_moe']}
+        analysis['architecture'] = gguf_info['architecture']
+        analysis['expert_count'] = gguf_info['expert_count']
+        analysis['expert_used_count'] = gguf_info['expert_used_count']
+        analysis['context_length_trained'] = gguf_info['context_length']
+        analysis['param_count'] = gguf_info['param_count']
+        analysis['gguf_info'] = gguf_info
+        analysis['fingerprint'] = compute_model_fingerprint(analysis['filepath'], header)
+        tensor_inventory, _ = get_tensor_inventory(analysis['filepath'], header)
+        if tensor_inventory is not None and len(tensor_inventory):
+            analysis['quant_mix'] = summarize_quant_mix(tensor_inventory)
+            analysis['bits_per_weight'] = analysis['quant_mix']['bits_per_weight']
+        if isinstance(gguf_info['block_count'], int) and gguf_info['block_count'] > 0:
+            analysis['num_layers'] = gguf_info['block_count']
+        analysis['is_moe'] = gguf_info['expert_count'] > 1
+        if gguf_info['param_count'] > 0:
+            size_val = round(gguf_info['param_count'] / 1e9, 1)
+            analysis['size_b'] = int(size_val) if size_val.is_integer() else size_val
+        if gguf_info['file_type']:
+            analysis['quant'] = gguf_info['file_type']
+        elif analysis.get('quant_mix'):
+            # No general.file_type: label by the dtype holding most of the bytes rather than the filename guess
+            analysis['quant'] = analysis['quant_mix']['dominant_dtype']
+        # Size and MoE-ness come straight from the tensors, so no MoE fudge factor on the estimate
+        analysis['details']['size_is_moe_special'] = True
+    else:
+        analysis['details']['metadata_source'] = 'filename'
+        analysis['details']['gguf_header_error'] = header_msg
+
     # Rest of the function remains the same...
     vram_gb_per_b_param = {
         'F32': 4.5, 'BF16': 2.5, 'F16': 2.5, 'Q8_0': 1.5,
@@ -1543,7 +2528,14 @@ def analyze_filename(filepath: str) -> dict:
     est_vram_gb_val = 0.0
     model_quant_upper, model_size_final = analysis.get('quant', 'unknown').upper(), analysis.get('size_b', 0)
 
-    if isinstance(model_size_final, (int, float)) and model_size_final > 0:
+    # With a tensor table, the full-offload estimate is measured: real weight bytes on GPU plus KV cache and
+    # compute buffer at the default context, instead of a per-quant GB/B factor that mixed quants don't follow
+    measured_vram = estimate_vram_usage_for_args(analysis, {
+        "--contextsize": DEFAULT_CONFIG_TEMPLATE["default_args"]["--contextsize"], "--flashattention": True, "--gpulayers": "999"
+    }) if analysis.get('quant_mix') else {}
+    if measured_vram.get("success"):
+        est_vram_gb_val = measured_vram["total_bytes"] / (1024**3)
+    elif isinstance(model_size_final, (int, float)) and model_size_final > 0:
         vram_factor = vram_gb_per_b_param.get(model_quant_upper)
         if vram_factor is None:
             vram_factor = next((v for k,v in vram_gb_per_b_param.items() if k in model_quant_upper), None)
@@ -1557,7 +2549,421 @@ def analyze_filename(filepath: str) -> dict:
     analysis['estimated_vram_gb_full_gpu'] = round(est_vram_gb_val, 2)
     return analysis
 
+
+# --- Model Analysis Cache ---
+def _store_cached_analyses(cursor, keyed_analyses: List[Tuple[Tuple[str, int, int], dict]]):
+    """Replaces cache rows for the given files, then evicts least recently used rows over the limit."""
+    now = time.time()
+    for file_key, analysis in keyed_analyses:
+        cursor.execute("DELETE FROM model_analysis_cache WHERE realpath = ?", (file_key[0],))
+        cursor.execute(
+            "INSERT INTO model_analysis_cache (realpath, file_size, mtime_ns, cache_version, analysis_json, last_accessed) VALUES (?, ?, ?, ?, ?, ?)",
+            (*file_key, ANALYSIS_CACHE_VERSION, json.dumps(analysis), now))
+    cursor.execute("""
+        DELETE FROM model_analysis_cache WHERE rowid IN (
+            SELECT rowid FROM model_analysis_cache ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+        )
+    """, (ANALYSIS_CACHE_MAX_ENTRIES,))
+
+def get_model_analysis(filepath: str, db_file: Optional[str] = None, force_refresh: bool = False) -> dict:
+    """
+    analyze_filename with a persistent cache in the history DB, keyed by (realpath, size, mtime_ns)
+    (for split GGUFs, of every part; see _model_file_key).
+    Rows from an older ANALYSIS_CACHE_VERSION are treated as misses; the least recently used rows
+    beyond ANALYSIS_CACHE_MAX_ENTRIES are evicted on every store.
+    """
+    file_key = _model_file_key(filepath)
+    if not db_file or file_key is None:
+        return analyze_filename(filepath)
+
+    conn = None
+    try:
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+        if not force_refresh:
+            row = cursor.execute(
+                "SELECT analysis_json, last_accessed FROM model_analysis_cache WHERE realpath = ? AND file_size = ? AND mtime_ns = ? AND cache_version = ?",
+                (*file_key, ANALYSIS_CACHE_VERSION)).fetchone()
+            if row:
+                if time.time() - row[1] > 60:  # Coarse LRU stamp; avoids a write on every rapid re-selection
+                    cursor.execute("UPDATE model_analysis_cache SET last_accessed = ? WHERE realpath = ? AND file_size = ? AND mtime_ns = ?",
+                                   (time.time(), *file_key))
+                    conn.commit()
+                analysis = json.loads(row[0])
+                if not analysis.get('shard_count'):  # Split models always report their first part
+                    analysis['filepath'] = filepath
+                analysis.setdefault('details', {})['analysis_cache'] = 'hit'
+                return analysis
+
+        analysis = analyze_filename(filepath)
+        _store_cached_analyses(cursor, [(file_key, analysis)])
+        conn.commit()
+        analysis['details']['analysis_cache'] = 'miss'
+        return analysis
+    except (sqlite3.Error, ValueError, TypeError) as e:
+        print(f"Analysis cache unavailable ({type(e).__name__}: {e}); analyzing directly.")
+        return analyze_filename(filepath)
+    finally:
+        if conn:
+            conn.close()
+
+
+# --- Model Library Indexer ---
+def find_gguf_files(directories: List[str], recursive: bool = True) -> List[str]:
+    """Walks the given directories with os.scandir and returns every .gguf file found (symlink loops are skipped)."""
+    found, visited_dirs = [], set()
+    pending = [d for d in directories if d and os.path.isdir(d)]
+    while pending:
+        current_dir = pending.pop()
+        real_dir = os.path.realpath(current_dir)
+        if real_dir in visited_dirs:
+            continue
+        visited_dirs.add(real_dir)
+        try:
+            with os.scandir(current_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=True):
+                            if recursive and not entry.name.startswith('.'):
+                                pending.append(entry.path)
+                        elif entry.name.lower().endswith(".gguf") and entry.is_file(follow_symlinks=True):
+                            found.append(os.path.abspath(entry.path))
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    # The same file may be reachable through several configured directories
+    unique_files = {}
+    for path in found:
+        unique_files.setdefault(os.path.realpath(path), path)
+    return sorted(unique_files.values(), key=lambda p: os.path.basename(p).lower())
+
+
+def _catalog_entry(filepath: str, file_size: int, analysis: dict) -> Dict[str, Any]:
+    return {
+        "filepath": filepath, "filename": os.path.basename(filepath),
+        "file_size_gb": round(file_size / (1024**3), 2),
+        "size_b": analysis.get('size_b', 0), "quant": analysis.get('quant', 'unknown'),
+        "num_layers": analysis.get('num_layers'), "is_moe": analysis.get('is_moe', False),
+        "architecture": analysis.get('architecture', 'unknown'),
+        "estimated_vram_gb_full_gpu": analysis.get('estimated_vram_gb_full_gpu', 0.0),
+    }
+
+
+def index_model_library(db_file: Optional[str], directories: List[str], max_workers: Optional[int] = None,
+                        progress_callback=None) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Builds a searchable catalog of every GGUF under the given directories. Files whose
+    (realpath, size, mtime_ns) already have a current analysis cache row are not re-read;
+    the rest are parsed in a thread pool and written back to the cache in batches as they finish,
+    so an interrupted scan keeps what it has already parsed.
+    progress_callback(done, total) is called from worker completion, not from the caller's thread.
+    """
+    start_time = time.monotonic()
+    # Split GGUFs are listed once, by their first part (which carries the whole set's analysis)
+    gguf_files = [p for p in find_gguf_files(directories)
+                  if not parse_gguf_shard_name(p) or parse_gguf_shard_name(p)[1] == 1]
+    file_keys = {path: _model_file_key(path) for path in gguf_files}
+
+    cached: Dict[Tuple[str, int, int], dict] = {}
+    conn = None
+    if db_file:
+        try:
+            conn = sqlite3.connect(db_file)
+            rows = conn.execute("SELECT realpath, file_size, mtime_ns, analysis_json FROM model_analysis_cache WHERE cache_version = ?",
+                                (ANALYSIS_CACHE_VERSION,)).fetchall()
+            cached = {(r[0], r[1], r[2]): json.loads(r[3]) for r in rows}
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Analysis cache unavailable for library index ({e}); parsing all files.")
+            if conn:
+                conn.close()
+            conn = None
+
+    analyses: Dict[str, dict] = {}
+    to_parse = []
+    for path, file_key in file_keys.items():
+        if file_key is None:
+            continue
+        if file_key in cached:
+            analyses[path] = cached[file_key]
+        else:
+            to_parse.append(path)
+
+    newly_parsed, pending_store = [], []
+
+    def flush_pending():
+        if not conn or not pending_store:
+            return
+        try:
+            _store_cached_analyses(conn.cursor(), pending_store)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Library index: could not update analysis cache: {e}")
+        pending_store.clear()
+
+    try:
+        if to_parse:
+            workers = max_workers or min(8, (os.cpu_count() or 2) * 2)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(analyze_filename, path): path for path in to_parse}
+                for done_count, future in enumerate(as_completed(futures), 1):
+                    path = futures[future]
+                    try:
+                        analyses[path] = future.result()
+                        newly_parsed.append((file_keys[path], analyses[path]))
+                        pending_store.append(newly_parsed[-1])
+                    except Exception as e:
+                        print(f"Library index: failed to analyze {os.path.basename(path)}: {e}")
+                    if len(pending_store) >= LIBRARY_INDEX_CACHE_BATCH:
+                        flush_pending()  # as_completed yields on this thread, so the connection stays single-threaded
+                    if progress_callback:
+                        progress_callback(done_count, len(to_parse))
+    finally:
+        if conn:
+            try:
+                flush_pending()  # Also on interruption: keep what was parsed
+            finally:
+                conn.close()
+
+    catalog = [_catalog_entry(path, analyses[path].get('total_file_bytes', file_keys[path][1]), analyses[path])
+               for path in gguf_files if path in analyses]
+    elapsed = time.monotonic() - start_time
+    return catalog, f"Indexed {len(catalog)} models ({len(newly_parsed)} parsed, {len(catalog) - len(newly_parsed)} cached) in {elapsed:.2f}s."
+
+
+def search_model_catalog(catalog: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
+    """Case-insensitive search; every whitespace-separated term must match the name, quant, architecture or 'moe'/'dense'."""
+    terms = [t for t in (query or "").lower().split() if t]
+    if not terms:
+        return list(catalog)
+    results = []
+    for entry in catalog:
+        haystack = " ".join([entry["filename"], str(entry["quant"]), str(entry["architecture"]),
+                             "moe" if entry["is_moe"] else "dense"]).lower()
+        if all(term in haystack for term in terms):
+            results.append(entry)
+    return results
+
       
+# --- Block Index Regex Synthesis ---
+def _digit_class(digits: List[str]) -> str:
+    digits = sorted(set(digits))
+    if len(digits) == 10:
+        return "\\d"
+    if len(digits) == 1:
+        return digits[0]
+    runs, start = [], 0
+    for i in range(1, len(digits) + 1):
+        if i == len(digits) or int(digits[i]) != int(digits[i - 1]) + 1:
+            run = digits[start:i]
+            runs.append(f"{run[0]}-{run[-1]}" if len(run) >= 3 else "".join(run))
+            start = i
+    return f"[{''.join(runs)}]"
+
+
+def _fixed_length_regex(numbers: List[str]) -> str:
+    """Regex for equal-length digit strings: a trie whose identical subtrees are merged into digit classes."""
+    trie: Dict[str, Any] = {}
+    for number in numbers:
+        node = trie
+        for ch in number:
+            node = node.setdefault(ch, {})
+
+    def emit(node: Dict[str, Any]) -> str:
+        if not node:
+            return ""
+        digits_by_suffix: Dict[str, List[str]] = {}
+        for digit, child in node.items():
+            digits_by_suffix.setdefault(emit(child), []).append(digit)
+        parts = [_digit_class(digits) + suffix for suffix, digits in sorted(digits_by_suffix.items(), key=lambda kv: min(kv[1]))]
+        return parts[0] if len(parts) == 1 else f"({'|'.join(parts)})"
+
+    return emit(trie)
+
+
+def _strip_outer_group(regex: str) -> str:
+    if not regex.startswith("("):
+        return regex
+    depth = 0
+    for i, ch in enumerate(regex):
+        depth += 1 if ch == "(" else -1 if ch == ")" else 0
+        if depth == 0:
+            return regex[1:-1] if i == len(regex) - 1 else regex
+    return regex
+
+
+def _exact_index_regex(indices: List[int]) -> str:
+    by_length: Dict[int, List[str]] = {}
+    for index in sorted(set(indices)):
+        by_length.setdefault(len(str(index)), []).append(str(index))
+    parts = [_fixed_length_regex(numbers) for _, numbers in sorted(by_length.items())]
+    return parts[0] if len(parts) == 1 else f"({'|'.join(_strip_outer_group(p) for p in parts)})"
+
+
+def synthesize_index_regex(indices: List[int], num_layers: Optional[int] = None) -> str:
+    """
+    Short regex matching exactly the given block indices (as written in 'blk.N.') among 0..num_layers-1,
+    e.g. [1, 3, ..., 39] -> '([13579]|[1-3][13579])' and all even blocks -> '\\d*[02468]'. Indices past the
+    last layer are treated as don't-care, which is what lets '\\d+' or '[4-9]\\d' stand in for ranges.
+    Every candidate is checked against 0..num_layers-1 before it is used. Top-level alternations come back
+    parenthesised, so the result can be embedded as is.
+    """
+    wanted = sorted(set(i for i in indices if i >= 0))
+    if not wanted:
+        return "NONE"
+    limit = max(num_layers or 0, wanted[-1] + 1)
+    candidates = [_exact_index_regex(wanted)]
+    if num_layers:
+        if len(wanted) == limit:
+            candidates.append("\\d+")
+        last_digits = sorted({str(i % 10) for i in wanted})
+        if wanted == [i for i in range(limit) if str(i % 10) in last_digits]:
+            candidates.append(f"\\d*{_digit_class(last_digits)}")
+        padded = wanted + list(range(limit, 10 ** len(str(limit - 1))))
+        candidates.append(_exact_index_regex(padded))
+    wanted_set = set(wanted)
+    for candidate in sorted(candidates, key=len):
+        compiled = re.compile(f"(?:{candidate})")
+        if {i for i in range(limit) if compiled.fullmatch(str(i))} == wanted_set:
+            return candidate
+    return candidates[0]
+
+
+def synthesize_block_override_pattern(blocks: List[int], base_names: List[str], num_layers: int,
+                                      inventory: Optional[TensorInventory] = None) -> str:
+    """
+    'blk\\.<indices>\\.<names>\\.weight' for the given blocks and tensor base names using the shortest
+    index regex. With an inventory, the pattern is verified against the tensor list (exactly those tensors
+    must match) and falls back to a plain index alternation if it does not.
+    """
+    index_regex = synthesize_index_regex(blocks, num_layers)
+    names_regex = _regex_alternation(base_names)
+    pattern = f"blk\\.{index_regex}\\.{names_regex}\\.weight"
+    if inventory is not None:
+        wanted_blocks, wanted_names = set(blocks), set(base_names)
+        expected = [i for i, name in enumerate(inventory.names)
+                    if inventory.blocks[i] in wanted_blocks and split_tensor_name(name)[0] in wanted_names and name.endswith(".weight")]
+        if inventory.indices_matching(pattern) != expected:
+            pattern = f"blk\\.({'|'.join(map(str, sorted(set(blocks))))})\\.{names_regex}\\.weight"
+    return pattern
+
+
+def split_override_subpatterns(pattern: str) -> List[str]:
+    """Top-level alternation branches of a pattern, looking inside one enclosing group: '(a|b\\.c)' -> ['a', 'b\\.c']."""
+    inner = _strip_outer_group(pattern)
+    branches, depth, current, escaped, in_class = [], 0, "", False, False
+    for ch in inner:
+        if escaped:
+            current += ch; escaped = False; continue
+        if ch == "\\":
+            current += ch; escaped = True; continue
+        if in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            branches.append(current); current = ""; continue
+        current += ch
+    branches.append(current)
+    return [b for b in branches if b]
+
+
+def simulate_override_tensors(model_analysis: dict, override_tensor_str: Optional[str], gpu_layers: int = 999) -> Dict[str, Any]:
+    """
+    Dry run of an --overridetensors value against the model's tensor list with llama.cpp's rules
+    (comma-separated pattern=buffer rules, regex search on the tensor name, first matching rule wins).
+    Reports per-rule matches, bytes sent to CPU, bytes left on GPU per offloaded layer, and rules or
+    alternation branches that match no tensor at all.
+    """
+    inventory = _inventory_for_analysis(model_analysis)
+    if inventory is None:
+        return {"success": False, "message": "Dry run needs the GGUF tensor table (not available for this model)."}
+    rules_out, compiled_rules, errors, unmatched = [], [], [], []
+    for pattern, buffer_type in parse_override_tensors(override_tensor_str):
+        rule = {"pattern": pattern, "buffer": buffer_type, "matched": 0, "bytes": 0, "error": None}
+        try:
+            compiled_rules.append((re.compile(pattern), buffer_type.upper().startswith("CPU"), rule))
+        except re.error as e:
+            rule["error"] = str(e)
+            errors.append(f"{pattern}: {e}")
+        rules_out.append(rule)
+    if override_tensor_str and not rules_out:
+        errors.append("No 'pattern=BUFFER' rules found.")
+
+    matched_tensors, to_cpu = [], [None] * len(inventory)
+    for i, name in enumerate(inventory.names):
+        for compiled, cpu_buffer, rule in compiled_rules:
+            if compiled.search(name):
+                rule["matched"] += 1
+                rule["bytes"] += inventory.nbytes[i]
+                matched_tensors.append(name)
+                to_cpu[i] = cpu_buffer
+                break
+
+    for compiled, _, rule in compiled_rules:
+        if rule["matched"] == 0:
+            unmatched.append(rule["pattern"])
+            continue
+        for branch in split_override_subpatterns(rule["pattern"]):
+            try:
+                branch_re = re.compile(branch)
+            except re.error:
+                continue
+            if not any(branch_re.search(name) for name in inventory.names):
+                unmatched.append(branch)
+
+    num_layers = model_analysis.get('num_layers') or inventory.num_blocks
+    first_gpu_block = num_layers - max(0, min(num_layers, gpu_layers))
+    gpu_bytes_by_block: Dict[int, int] = {}
+    cpu_bytes = gpu_bytes = 0
+    for i in range(len(inventory)):
+        block_index, size = inventory.blocks[i], inventory.nbytes[i]
+        on_gpu_device = block_index >= first_gpu_block if block_index >= 0 else (gpu_layers > num_layers and inventory.role_of(i) != "token_embd")
+        if to_cpu[i] is not None:
+            on_gpu_device = not to_cpu[i]
+        if not on_gpu_device:
+            cpu_bytes += size
+        else:
+            gpu_bytes += size
+            if block_index >= 0:
+                gpu_bytes_by_block[block_index] = gpu_bytes_by_block.get(block_index, 0) + size
+
+    message = (f"Dry run: {len(matched_tensors)} tensors matched, {sum(r['bytes'] for r in rules_out if r['buffer'].upper().startswith('CPU')) / (1024**2):.0f} MiB "
+               f"to CPU, {gpu_bytes / (1024**2):.0f} MiB of weights on GPU")
+    if unmatched:
+        message += f"; matches nothing: {', '.join(unmatched)}"
+    if errors:
+        message += f"; invalid: {'; '.join(errors)}"
+    return {
+        "success": True, "rules": rules_out, "matched_tensors": matched_tensors, "unmatched_subpatterns": unmatched,
+        "errors": errors, "cpu_bytes": cpu_bytes, "gpu_bytes": gpu_bytes, "gpu_bytes_by_block": gpu_bytes_by_block,
+        "message": message
+    }
+
+
+def simulate_override_tensors_for_args(model_analysis: dict, args_dict: dict) -> Dict[str, Any]:
+    """simulate_override_tensors for a built KoboldCpp argument set (--overridetensors and --gpulayers)."""
+    return simulate_override_tensors(model_analysis, args_dict.get("--overridetensors"), _gpu_layers_from_args(model_analysis, args_dict))
+
+
+def format_override_simulation(simulation: Dict[str, Any]) -> str:
+    """Multi-line report of simulate_override_tensors: per-rule matches and GPU MiB per offloaded layer."""
+    if not simulation.get("success"):
+        return simulation.get("message", "")
+    lines = [simulation["message"]]
+    for rule in simulation["rules"]:
+        status = f"error: {rule['error']}" if rule["error"] else f"{rule['matched']} tensors, {rule['bytes'] / (1024**2):.0f} MiB"
+        lines.append(f"  {rule['pattern']}={rule['buffer']}: {status}")
+    by_block = simulation["gpu_bytes_by_block"]
+    if by_block:
+        lines.append("  GPU MiB per layer: " + ", ".join(f"{b}:{by_block[b] / (1024**2):.0f}" for b in sorted(by_block)))
+    return "\n".join(lines)
+
+
 def get_gpu_layers_for_level(model_analysis: dict, attempt_level: int) -> int:
     """
     Completely revised function to determine GPU layers based on analysis and level.
@@ -1656,22 +3062,91 @@ def get_gpu_layers_for_level(model_analysis: dict, attempt_level: int) -> int:
             return all_layers
     
 
+def _inventory_for_analysis(model_analysis: dict) -> Optional[TensorInventory]:
+    """Tensor inventory for a header-parsed analysis (None for filename-only analyses)."""
+    filepath = model_analysis.get('filepath')
+    if not filepath or (model_analysis.get('details') or {}).get('metadata_source') != 'gguf_header':
+        return None
+    inventory, _ = get_tensor_inventory(filepath)
+    return inventory
+
+
+def _regex_alternation(names: List[str]) -> str:
+    escaped = [re.escape(n) for n in names]
+    return escaped[0] if len(escaped) == 1 else f"({'|'.join(escaped)})"
+
+
+def _override_group_names(model_analysis: dict) -> Dict[str, List[str]]:
+    """
+    Base tensor names for each group the offload levels target, taken from the names the model actually
+    contains (classified through the per-architecture role registry). Filename-only analyses get llama naming.
+    """
+    inventory = _inventory_for_analysis(model_analysis)
+    present = inventory.base_names_by_role() if inventory is not None else {}
+    default_names: Dict[str, List[str]] = {}
+    for base, role in _DEFAULT_TENSOR_ROLE_NAMES.items():
+        default_names.setdefault(role, [base])
+
+    def names_for(*roles: str, fallback: Optional[str] = None) -> List[str]:
+        found = [n for role in roles for n in present.get(role, [])]
+        if not found and fallback:
+            found = present.get(fallback, [])
+        return found or [n for role in roles for n in default_names.get(role, [])]
+
+    shared = names_for("ffn_down_shexp", "ffn_up_shexp", "ffn_gate_shexp") if present.get("ffn_down_shexp") else []
+    return {
+        "down": names_for("ffn_down"), "up": names_for("ffn_up"), "gate": names_for("ffn_gate"),
+        "down_exps": names_for("ffn_down_exps"), "up_exps": names_for("ffn_up_exps"), "gate_exps": names_for("ffn_gate_exps"),
+        # Always-active FFN weights of a MoE model: dense leading blocks plus shared experts
+        "moe_dense_ffn": names_for("ffn_down", "ffn_up", "ffn_gate") + shared,
+        "attn_all": names_for("attn_q", "attn_k", "attn_v", "attn_o", "attn_qkv"),
+        "attn_qk": names_for("attn_q", "attn_k", fallback="attn_qkv"),
+        "attn_q": names_for("attn_q", fallback="attn_qkv"),
+    }
+
+
+def get_override_name_fragments(model_analysis: dict) -> Dict[str, str]:
+    """Regex alternations (without the '.weight' suffix) for each tensor group in _override_group_names."""
+    return {group: _regex_alternation(names) for group, names in _override_group_names(model_analysis).items()}
+
+
+def _override_offloads_group(rules: List[Tuple[re.Pattern, bool]], base_names: List[str], num_layers: int) -> bool:
+    for base in base_names:
+        for block_index in range(num_layers):
+            name = f"blk.{block_index}.{base}.weight"
+            for compiled, to_cpu in rules:
+                if compiled.search(name):
+                    if to_cpu:
+                        return True
+                    break
+    return False
+
+
 def get_level_from_overridetensors(override_tensor_str: Optional[str], model_analysis: dict) -> int:
     is_moe = model_analysis.get('is_moe', False)
     if not override_tensor_str: return -25 if is_moe else -17
-    ot_lower = override_tensor_str.lower()
+    num_layers = model_analysis.get('num_layers', 32)
+    if not isinstance(num_layers, int) or num_layers <= 0: num_layers = 32
+    try:
+        rules = [(re.compile(pattern), buffer_type.upper().startswith("CPU")) for pattern, buffer_type in parse_override_tensors(override_tensor_str)]
+    except re.error:
+        return -15 if is_moe else -8
+    groups = _override_group_names(model_analysis)
+    offloads = lambda group: _override_offloads_group(rules, groups[group], num_layers)
+    # Strings saved before the role registry used 'attn\.(q|k|v|o)\.weight', which matches no llama.cpp tensor
+    has_attn = "attn\\.(q|k|v|o)\\.weight" in override_tensor_str.lower() or offloads("attn_all")
     if is_moe:
-        if "attn\\.(q|k|v|o)\\.weight" in ot_lower and "ffn_down_exps" in ot_lower and "ffn_up_exps" in ot_lower: return 8
-        elif "ffn_down_exps" in ot_lower and "ffn_up_exps" in ot_lower and "ffn_gate_exps" in ot_lower: return 1
-        elif "ffn_down_exps" in ot_lower and "ffn_up_exps" in ot_lower: return -6
-        elif "ffn_down_exps" in ot_lower and not ("ffn_up_exps" in ot_lower or "ffn_gate_exps" in ot_lower): return -10
-        elif "blk\\.(0|4|8|12|16|20|24|28)\\.ffn_down_exps" in ot_lower: return -18
+        has_down, has_up, has_gate = offloads("down_exps"), offloads("up_exps"), offloads("gate_exps")
+        if has_attn and has_down and has_up: return 8
+        elif has_down and has_up and has_gate: return 1
+        elif has_down and has_up: return -6
+        elif has_down and not (has_up or has_gate): return -10
         return -15
     else:
-        if "attn\\.(q|k|v|o)\\.weight" in ot_lower and "ffn_down.weight" in ot_lower and "ffn_up.weight" in ot_lower: return 7
-        elif "ffn_down.weight" in ot_lower and "ffn_up.weight" in ot_lower and "ffn_gate.weight" in ot_lower: return 0
-        elif "ffn_up.weight" in ot_lower and "ffn_down.weight" not in ot_lower and "ffn_gate.weight" not in ot_lower: return -5
-        elif "blk\\.(0|4|8|12|16|20|24|28)\\.ffn_up\\.weight" in ot_lower: return -11
+        has_down, has_up, has_gate = offloads("down"), offloads("up"), offloads("gate")
+        if has_attn and has_down and has_up: return 7
+        elif has_down and has_up and has_gate: return 0
+        elif has_up and not has_down and not has_gate: return -5
         return -8
 
 def get_offload_description(model_analysis: dict, attempt_level: int, current_ot_string: Optional[str]) -> str:
@@ -1747,7 +3222,11 @@ def get_offload_description(model_analysis: dict, attempt_level: int, current_ot
     return f"{base_desc_from_map}. {layers_info}"
 
 def generate_overridetensors(model_analysis: dict, attempt_level: int) -> Optional[str]:
-    moe_s, dense_s = "_exps\\.weight", "\\.weight"; d, u, g = "ffn_down", "ffn_up", "ffn_gate"
+    frag = get_override_name_fragments(model_analysis)
+    w = "\\.weight"; d, u, g = frag["down"], frag["up"], frag["gate"]
+    xd, xu, xg = frag["down_exps"], frag["up_exps"], frag["gate_exps"]
+    moe_dense = f"{frag['moe_dense_ffn']}{w}"
+    attn_all, attn_qk, attn_q = f"{frag['attn_all']}{w}", f"{frag['attn_qk']}{w}", f"{frag['attn_q']}{w}"
     all_l, even_l = "blk\\.\\d+\\.", "blk\\.\\d*[02468]\\."
     num_model_layers = model_analysis.get('num_layers', 32)
     if not isinstance(num_model_layers, int) or num_model_layers <= 0: num_model_layers = 32
@@ -1755,97 +3234,1113 @@ def generate_overridetensors(model_analysis: dict, attempt_level: int) -> Option
         if n_groups <= 0: return "blk\\.NONE\\."
         step = max(1, total_layers // n_groups if n_groups > 0 else total_layers)
         selected_blocks = [i for i in range(0, total_layers, step if step > 0 else 1)][:n_groups]
-        return f"blk\\.({'|'.join(map(str, selected_blocks))})\\." if selected_blocks else "blk\\.NONE\\."
+        if not selected_blocks: return "blk\\.NONE\\."
+        return f"blk\\.{synthesize_index_regex(selected_blocks, total_layers)}\\."
     l0369, l048 = get_nth_blocks_regex(num_model_layers, num_model_layers//3 if num_model_layers//3 > 0 else 1), get_nth_blocks_regex(num_model_layers, num_model_layers//4 if num_model_layers//4 > 0 else 1)
     eighth_blocks, sixteenth_blocks = get_nth_blocks_regex(num_model_layers, 8), get_nth_blocks_regex(num_model_layers, 16)
     parts = []
     if model_analysis.get('is_moe'):
-        if attempt_level>=10: parts.extend([f"{all_l}({d}|{u}|{g}){moe_s}",f"{all_l}({d}|{u}|{g}){dense_s}",f"{all_l}attn\\.(q|k|v|o)\\.weight",f"{all_l}attn_norm\\.weight",f"{all_l}ffn_norm\\.weight"])
-        elif attempt_level>=8: parts.extend([f"{all_l}({d}|{u}|{g}){moe_s}",f"{all_l}({d}|{u}|{g}){dense_s}",f"{all_l}attn\\.(q|k|v|o)\\.weight"])
-        elif attempt_level>=6: parts.extend([f"{all_l}({d}|{u}|{g}){moe_s}",f"{all_l}({d}|{u}|{g}){dense_s}",f"{even_l}attn\\.(q|k)\\.weight"])
-        elif attempt_level>=4: parts.extend([f"{all_l}({d}|{u}|{g}){moe_s}",f"{all_l}({d}|{u}|{g}){dense_s}",f"{l0369}attn\\.q\\.weight"])
-        elif attempt_level>=2: parts.extend([f"{all_l}({d}|{u}|{g}){moe_s}",f"{all_l}({d}|{u}|{g}){dense_s}",f"{l048}attn\\.q\\.weight"])
-        elif attempt_level==1: parts.extend([f"{all_l}({d}|{u}|{g}){moe_s}",f"{all_l}({d}|{u}|{g}){dense_s}"])
-        elif attempt_level==0: parts.extend([f"{all_l}({d}|{u}|{g}){moe_s}",f"{all_l}{d}{dense_s}"])
-        elif attempt_level>=-2: parts.append(f"{all_l}({d}|{u}|{g}){moe_s}")
-        elif attempt_level>=-4: parts.extend([f"{all_l}({d}|{u}){moe_s}",f"{even_l}{g}{moe_s}"])
-        elif attempt_level>=-6: parts.append(f"{all_l}({d}|{u}){moe_s}")
-        elif attempt_level>=-8: parts.extend([f"{all_l}{d}{moe_s}",f"{even_l}{u}{moe_s}"])
-        elif attempt_level>=-10: parts.append(f"{all_l}{d}{moe_s}")
-        elif attempt_level>=-12: parts.append(f"{even_l}{d}{moe_s}")
-        elif attempt_level>=-15: parts.append(f"{l048}{d}{moe_s}")
-        elif attempt_level>=-18: parts.append(f"{eighth_blocks}{d}{moe_s}")
-        elif attempt_level>=-21: parts.append(f"{sixteenth_blocks}{d}{moe_s}")
+        if attempt_level>=10: parts.extend([f"{all_l}({xd}|{xu}|{xg}){w}",f"{all_l}{moe_dense}",f"{all_l}{attn_all}",f"{all_l}attn_norm\\.weight",f"{all_l}ffn_norm\\.weight"])
+        elif attempt_level>=8: parts.extend([f"{all_l}({xd}|{xu}|{xg}){w}",f"{all_l}{moe_dense}",f"{all_l}{attn_all}"])
+        elif attempt_level>=6: parts.extend([f"{all_l}({xd}|{xu}|{xg}){w}",f"{all_l}{moe_dense}",f"{even_l}{attn_qk}"])
+        elif attempt_level>=4: parts.extend([f"{all_l}({xd}|{xu}|{xg}){w}",f"{all_l}{moe_dense}",f"{l0369}{attn_q}"])
+        elif attempt_level>=2: parts.extend([f"{all_l}({xd}|{xu}|{xg}){w}",f"{all_l}{moe_dense}",f"{l048}{attn_q}"])
+        elif attempt_level==1: parts.extend([f"{all_l}({xd}|{xu}|{xg}){w}",f"{all_l}{moe_dense}"])
+        elif attempt_level==0: parts.extend([f"{all_l}({xd}|{xu}|{xg}){w}",f"{all_l}{d}{w}"])
+        elif attempt_level>=-2: parts.append(f"{all_l}({xd}|{xu}|{xg}){w}")
+        elif attempt_level>=-4: parts.extend([f"{all_l}({xd}|{xu}){w}",f"{even_l}{xg}{w}"])
+        elif attempt_level>=-6: parts.append(f"{all_l}({xd}|{xu}){w}")
+        elif attempt_level>=-8: parts.extend([f"{all_l}{xd}{w}",f"{even_l}{xu}{w}"])
+        elif attempt_level>=-10: parts.append(f"{all_l}{xd}{w}")
+        elif attempt_level>=-12: parts.append(f"{even_l}{xd}{w}")
+        elif attempt_level>=-15: parts.append(f"{l048}{xd}{w}")
+        elif attempt_level>=-18: parts.append(f"{eighth_blocks}{xd}{w}")
+        elif attempt_level>=-21: parts.append(f"{sixteenth_blocks}{xd}{w}")
     else:
-        if attempt_level>=9: parts.extend([f"{all_l}({d}|{u}|{g}){dense_s}",f"{all_l}attn\\.(q|k|v|o)\\.weight",f"{all_l}attn_norm\\.weight",f"{all_l}ffn_norm\\.weight","tok_embeddings\\.weight","output\\.weight"])
-        elif attempt_level>=7: parts.extend([f"{all_l}({d}|{u}|{g}){dense_s}",f"{all_l}attn\\.(q|k|v|o)\\.weight"])
-        elif attempt_level>=5: parts.extend([f"{all_l}({d}|{u}|{g}){dense_s}",f"{even_l}attn\\.(q|k)\\.weight"])
-        elif attempt_level>=3: parts.extend([f"{all_l}({d}|{u}|{g}){dense_s}",f"{l0369}attn\\.q\\.weight"])
-        elif attempt_level>=1: parts.extend([f"{all_l}({d}|{u}|{g}){dense_s}",f"{l048}attn\\.q\\.weight"])
-        elif attempt_level==0: parts.append(f"{all_l}({d}|{u}|{g}){dense_s}")
-        elif attempt_level>=-1: parts.append(f"{all_l}({d}|{u}){dense_s}")
-        elif attempt_level>=-3: parts.extend([f"{all_l}{u}{dense_s}",f"{even_l}{d}{dense_s}"])
-        elif attempt_level>=-5: parts.append(f"{all_l}{u}{dense_s}")
-        elif attempt_level>=-7: parts.append(f"{l0369}{u}{dense_s}")
-        elif attempt_level>=-9: parts.append(f"{l048}{u}{dense_s}")
-        elif attempt_level>=-11: parts.append(f"{eighth_blocks}{u}{dense_s}")
-        elif attempt_level>=-14: parts.append(f"{sixteenth_blocks}{u}{dense_s}")
+        if attempt_level>=9: parts.extend([f"{all_l}({d}|{u}|{g}){w}",f"{all_l}{attn_all}",f"{all_l}attn_norm\\.weight",f"{all_l}ffn_norm\\.weight","token_embd\\.weight","output\\.weight"])
+        elif attempt_level>=7: parts.extend([f"{all_l}({d}|{u}|{g}){w}",f"{all_l}{attn_all}"])
+        elif attempt_level>=5: parts.extend([f"{all_l}({d}|{u}|{g}){w}",f"{even_l}{attn_qk}"])
+        elif attempt_level>=3: parts.extend([f"{all_l}({d}|{u}|{g}){w}",f"{l0369}{attn_q}"])
+        elif attempt_level>=1: parts.extend([f"{all_l}({d}|{u}|{g}){w}",f"{l048}{attn_q}"])
+        elif attempt_level==0: parts.append(f"{all_l}({d}|{u}|{g}){w}")
+        elif attempt_level>=-1: parts.append(f"{all_l}({d}|{u}){w}")
+        elif attempt_level>=-3: parts.extend([f"{all_l}{u}{w}",f"{even_l}{d}{w}"])
+        elif attempt_level>=-5: parts.append(f"{all_l}{u}{w}")
+        elif attempt_level>=-7: parts.append(f"{l0369}{u}{w}")
+        elif attempt_level>=-9: parts.append(f"{l048}{u}{w}")
+        elif attempt_level>=-11: parts.append(f"{eighth_blocks}{u}{w}")
+        elif attempt_level>=-14: parts.append(f"{sixteenth_blocks}{u}{w}")
     valid_parts = [p for p in parts if p and p != "blk\\.NONE\\."]
     if not valid_parts: return None
     return f"({'|'.join(valid_parts)})=CPU" if len(valid_parts) > 1 else f"{valid_parts[0]}=CPU"
 
-def args_list_to_dict(args_list):
-    args_dict, i = {}, 0
-    while i < len(args_list):
-        arg = args_list[i]
-        if arg.startswith("--"):
-            if i + 1 < len(args_list) and not args_list[i+1].startswith("--"):
-                args_dict[arg] = args_list[i+1]; i += 2
-            else: args_dict[arg] = True; i += 1
-        else: i += 1
-    return args_dict
+# --- Memory Estimation ---
+KV_CACHE_BYTES_PER_ELEMENT = {0: 2.0, 1: 34 / 32, 2: 18 / 32}  # --quantkv 0=F16, 1=Q8_0, 2=Q4_0
+KV_CACHE_TYPE_NAMES = {0: "F16", 1: "Q8_0", 2: "Q4_0"}
+# Every n-th layer is global attention, the rest sliding-window, when GGUFs lack attention.sliding_window_pattern
+_SWA_LAYER_PATTERNS = {"gemma2": 2, "gemma3": 6, "cohere2": 4}
 
-def args_dict_to_list(args_dict):
-    cmd_list_part = []
-    if "--model" in args_dict: cmd_list_part.extend(["--model", str(args_dict["--model"])])
-    processed_keys = {"--model"}
-    defined_keys_ordered = [arg_def["key"] for arg_def in KOBOLDCPP_ARG_DEFINITIONS if arg_def["key"] != "--model"]
-    for key in defined_keys_ordered:
-        if key in args_dict and key not in processed_keys:
-            value = args_dict[key]
-            arg_def_type = next((d.get("type_hint", "str") for d in KOBOLDCPP_ARG_DEFINITIONS if d["key"] == key), "str")
-            if arg_def_type == "bool_flag":
-                if value is True: cmd_list_part.append(key)
-            elif isinstance(value, bool):
-                if value is True: cmd_list_part.append(key)
-            elif value is not None:
-                cmd_list_part.extend([key, str(value)])
-            processed_keys.add(key)
-    for key in sorted([k for k in args_dict if k not in processed_keys]):
-        value = args_dict[key]
-        if value is True: cmd_list_part.append(key)
-        elif value not in [False, None]: cmd_list_part.extend([key, str(value)])
-    return cmd_list_part
 
-def format_command_for_display(cmd_list):
-    if not cmd_list: return ""
-    exe_part = cmd_list[0]; args_start_index = 1
-    if len(cmd_list) > 1 and cmd_list[0].lower() == sys.executable.lower() and cmd_list[1].lower().endswith(".py"):
-        exe_part = f'"{cmd_list[0]}" "{cmd_list[1]}"'; args_start_index = 2
-    elif " " in cmd_list[0] and not (cmd_list[0].startswith('"') and cmd_list[0].endswith('"')):
-        exe_part = f'"{cmd_list[0]}"'
+def _arg_as_int(args_dict: dict, key: str, default: Optional[int]) -> Optional[int]:
+    try:
+        return int(str(args_dict.get(key)).strip())
+    except (TypeError, ValueError):
+        return default
 
-    formatted_cmd_parts = [exe_part]
-    i = args_start_index
-    while i < len(cmd_list):
-        item = cmd_list[i]
-        if item.startswith("--"):
-            current_arg_part = f"\n  {item}"
-            if i + 1 < len(cmd_list) and not cmd_list[i+1].startswith("--"):
-                value_part = cmd_list[i+1]
-                if (' ' in value_part or any(c in value_part for c in ['\\', '/', ':'])) and \
-                   not value_part.startswith("blk.") and \
-                   not value_part.isdigit() and \
+
+def _arg_as_bool(args_dict: dict, key: str) -> bool:
+    val = args_dict.get(key, False)
+    return val.lower() == "true" if isinstance(val, str) else bool(val)
+
+
+def calculate_kv_cache_bytes(model_analysis: dict, context_size: int, quantkv: int = 0, flash_attention: bool = True,
+                             gpu_layers: int = 999, use_swa: bool = False, kv_offload: bool = True) -> Dict[str, Any]:
+    """
+    Exact KV-cache size from GGUF attention metadata (n_layer, n_head_kv, key/value lengths, MLA rank,
+    sliding window). Layers offloaded with --gpulayers are the last n blocks, and their cache lives on
+    the GPU unless KV offload is disabled. Without flash attention KoboldCpp only quantizes the K cache.
+    """
+    hparams = (model_analysis.get('gguf_info') or {}).get('hparams') or {}
+    n_layer = hparams.get('block_count') or model_analysis.get('num_layers')
+    n_head = hparams.get('attention.head_count')
+    n_embd = hparams.get('embedding_length')
+    if not hparams or not isinstance(n_layer, int) or not n_head or not n_embd:
+        return {"success": False, "message": "KV estimate needs GGUF attention metadata (not available for this model)."}
+
+    def per_layer(value, il, default):
+        if isinstance(value, list):
+            return value[il] if il < len(value) else default
+        return value if value is not None else default
+
+    kv_lora_rank = hparams.get('attention.kv_lora_rank')
+    if kv_lora_rank:  # MLA (DeepSeek-style): one compressed latent plus the rope part per token
+        rope_dim = hparams.get('rope.dimension_count') or 64
+        k_row, v_row = (lambda il: kv_lora_rank + rope_dim), (lambda il: kv_lora_rank)
+    else:
+        head_dim_default = n_embd // max(1, per_layer(n_head, 0, 1))
+        key_length = hparams.get('attention.key_length', head_dim_default)
+        value_length = hparams.get('attention.value_length', head_dim_default)
+        head_count_kv = hparams.get('attention.head_count_kv', n_head)
+        k_row = lambda il: per_layer(head_count_kv, il, 0) * key_length
+        v_row = lambda il: per_layer(head_count_kv, il, 0) * value_length
+
+    sliding_window = hparams.get('attention.sliding_window') or 0
+    swa_pattern = hparams.get('attention.sliding_window_pattern',
+                              _SWA_LAYER_PATTERNS.get(model_analysis.get('architecture', '')))
+
+    def is_swa_layer(il):
+        if not (use_swa and sliding_window):
+            return False
+        if isinstance(swa_pattern, list):
+            return bool(swa_pattern[il]) if il < len(swa_pattern) else False
+        if isinstance(swa_pattern, int) and swa_pattern > 1:
+            return il % swa_pattern < swa_pattern - 1
+        return False
+
+    quantkv = quantkv if quantkv in KV_CACHE_BYTES_PER_ELEMENT else 0
+    k_bytes_per_el = KV_CACHE_BYTES_PER_ELEMENT[quantkv]
+    v_quant = quantkv if flash_attention else 0
+    v_bytes_per_el = KV_CACHE_BYTES_PER_ELEMENT[v_quant]
+
+    first_gpu_layer = n_layer - max(0, min(n_layer, gpu_layers)) if kv_offload else n_layer
+    gpu_bytes = cpu_bytes = 0.0
+    swa_layers = 0
+    for il in range(n_layer):
+        cells = context_size
+        if is_swa_layer(il):
+            swa_layers += 1
+            cells = min(context_size, sliding_window)
+        layer_bytes = cells * (k_row(il) * k_bytes_per_el + v_row(il) * v_bytes_per_el)
+        if il >= first_gpu_layer:
+            gpu_bytes += layer_bytes
+        else:
+            cpu_bytes += layer_bytes
+
+    total = int(gpu_bytes + cpu_bytes)
+    return {
+        "success": True, "context_size": context_size, "total_bytes": total,
+        "gpu_bytes": int(gpu_bytes), "cpu_bytes": int(cpu_bytes),
+        "k_type": KV_CACHE_TYPE_NAMES[quantkv], "v_type": KV_CACHE_TYPE_NAMES[v_quant],
+        "swa_layers": swa_layers,
+        "message": (f"KV cache @ {context_size} ctx ({KV_CACHE_TYPE_NAMES[quantkv]}/{KV_CACHE_TYPE_NAMES[v_quant]}): "
+                    f"{total / (1024**2):.0f} MiB ({gpu_bytes / (1024**2):.0f} GPU / {cpu_bytes / (1024**2):.0f} CPU)")
+    }
+
+
+def estimate_kv_cache_for_args(model_analysis: dict, args_dict: dict) -> Dict[str, Any]:
+    """calculate_kv_cache_bytes for a built KoboldCpp argument set (use args_list_to_dict on build_command output)."""
+    context_size = _arg_as_int(args_dict, "--contextsize", 4096)
+    quantkv = _arg_as_int(args_dict, "--quantkv", 0) or 0
+    return calculate_kv_cache_bytes(model_analysis, context_size, quantkv,
+                                    flash_attention=_arg_as_bool(args_dict, "--flashattention"),
+                                    gpu_layers=_gpu_layers_from_args(model_analysis, args_dict),
+                                    use_swa=_arg_as_bool(args_dict, "--useswa"),
+                                    kv_offload=not _arg_as_bool(args_dict, "--lowvram"))
+
+
+BLAS_BATCH_SIZE_CHOICES = (512, 256, 128, 64)  # Largest first; KoboldCpp's own default is 512
+KOBOLDCPP_DEFAULT_BLAS_BATCH_SIZE = 512
+
+
+def estimate_compute_buffer_bytes(model_analysis: dict, batch_size: int, context_size: int,
+                                  flash_attention: bool = True) -> Dict[str, Any]:
+    """
+    Approximate size of the GPU compute buffer llama.cpp reserves for one prompt-processing batch.
+    The buffer holds the largest intermediate of the worst-case graph: the KQ score matrix
+    (n_head x n_ctx x batch, skipped by flash attention), the FFN activations or the batch's logits
+    (batch x n_vocab), all in F32, plus a few n_embd-wide residual tensors.
+    """
+    gguf_info = model_analysis.get('gguf_info') or {}
+    hparams = gguf_info.get('hparams') or {}
+    n_embd = hparams.get('embedding_length')
+    n_head = hparams.get('attention.head_count')
+    if not n_embd or not n_head:
+        return {"success": False, "message": "Compute buffer estimate needs GGUF metadata (not available for this model)."}
+    n_head = max(n_head) if isinstance(n_head, list) else n_head
+    n_ff = hparams.get('feed_forward_length') or 4 * n_embd
+    n_ff = max(n_ff) if isinstance(n_ff, list) else n_ff
+    if hparams.get('expert_feed_forward_length'):
+        n_ff = max(n_ff, hparams['expert_feed_forward_length'] * max(1, hparams.get('expert_used_count') or 1))
+    n_vocab = gguf_info.get('vocab_size') or 32000
+    batch_size = max(1, min(batch_size, context_size))
+
+    f32 = 4
+    residual = batch_size * n_embd * f32 * 4
+    attention = batch_size * n_embd * f32 * 2 if flash_attention else n_head * context_size * batch_size * f32
+    ffn = batch_size * n_ff * f32 * 3
+    logits = batch_size * n_vocab * f32
+    total = max(attention, ffn, logits) + residual
+    return {"success": True, "batch_size": batch_size, "total_bytes": total,
+            "message": f"Compute buffer @ batch {batch_size}: ~{total / (1024**2):.0f} MiB"}
+
+
+def estimate_gpu_weight_bytes(model_analysis: dict, gpu_layers: int, override_tensor_str: Optional[str] = None) -> Optional[int]:
+    """
+    Model weight bytes that land on the GPU: blocks in the last gpu_layers layers minus tensors an
+    --overridetensors rule keeps on CPU, plus the output head when gpu_layers exceeds the layer count.
+    Token embeddings always stay on CPU. None when the tensor table cannot be read.
+    """
+    inventory = _inventory_for_analysis(model_analysis)
+    if inventory is None:
+        return None
+    n_layer = model_analysis.get('num_layers') or inventory.num_blocks
+    first_gpu_block = n_layer - max(0, min(n_layer, gpu_layers))
+    output_on_gpu = gpu_layers > n_layer
+    cpu_rules = compile_override_tensors(override_tensor_str)[0]  # A rule that does not compile matches nothing
+    token_embd_role = _TENSOR_ROLE_INDEX["token_embd"]
+    total = 0
+    for i, name in enumerate(inventory.names):
+        block_index = inventory.blocks[i]
+        if block_index < 0:
+            if not output_on_gpu or inventory.roles[i] == token_embd_role:
+                continue
+        elif block_index < first_gpu_block:
+            continue
+        for compiled, to_cpu in cpu_rules:
+            if compiled.search(name):
+                break
+        else:
+            to_cpu = False
+        if not to_cpu:
+            total += inventory.nbytes[i]
+    return total
+
+
+def _gpu_layers_from_args(model_analysis: dict, args_dict: dict) -> int:
+    n_layer = model_analysis.get('num_layers', 32)
+    if _arg_as_bool(args_dict, "--nogpulayers"):
+        return 0
+    gpu_layers = _arg_as_int(args_dict, "--gpulayers", None)
+    return gpu_layers if gpu_layers is not None else n_layer + 1  # 'auto' is treated as everything (worst case for VRAM)
+
+
+def estimate_vram_usage_for_args(model_analysis: dict, args_dict: dict) -> Dict[str, Any]:
+    """Weights + KV cache + compute buffer on the GPU for a built KoboldCpp argument set."""
+    override_errors = compile_override_tensors(args_dict.get("--overridetensors"))[1]
+    if override_errors:
+        return {"success": False, "message": f"Invalid --overridetensors regex: {override_errors[0]}"}
+    gpu_layers = _gpu_layers_from_args(model_analysis, args_dict)
+    context_size = _arg_as_int(args_dict, "--contextsize", 4096)
+    batch_size = _arg_as_int(args_dict, "--blasbatchsize", KOBOLDCPP_DEFAULT_BLAS_BATCH_SIZE)
+    if not batch_size or batch_size < 0:
+        batch_size = 16  # -1 disables BLAS batching; llama.cpp still processes small batches
+    weights = estimate_gpu_weight_bytes(model_analysis, gpu_layers, args_dict.get("--overridetensors"))
+    kv = estimate_kv_cache_for_args(model_analysis, args_dict)
+    compute = estimate_compute_buffer_bytes(model_analysis, batch_size, context_size,
+                                            _arg_as_bool(args_dict, "--flashattention"))
+    if weights is None or not kv.get("success") or not compute.get("success"):
+        return {"success": False, "message": "VRAM estimate needs the GGUF tensor table and attention metadata."}
+    total = weights + kv["gpu_bytes"] + compute["total_bytes"]
+    return {
+        "success": True, "weights_bytes": weights, "kv_bytes": kv["gpu_bytes"], "compute_bytes": compute["total_bytes"],
+        "total_bytes": total, "batch_size": compute["batch_size"],
+        "message": (f"Est. VRAM: {total / (1024**2):.0f} MiB (weights {weights / (1024**2):.0f}, "
+                    f"KV {kv['gpu_bytes'] / (1024**2):.0f}, compute {compute['total_bytes'] / (1024**2):.0f} @ batch {compute['batch_size']})")
+    }
+
+
+def choose_blasbatchsize(model_analysis: dict, args_dict: dict, vram_budget_mb: float,
+                         max_batch_size: int = BLAS_BATCH_SIZE_CHOICES[0]) -> Optional[int]:
+    """
+    Largest --blasbatchsize whose estimated VRAM (weights + KV + compute buffer) fits the budget,
+    so a smaller prompt batch is tried before layers have to leave the GPU. Returns the smallest
+    choice when nothing fits and None when no estimate is possible.
+    """
+    candidates = [bbs for bbs in BLAS_BATCH_SIZE_CHOICES if bbs <= max_batch_size] or [BLAS_BATCH_SIZE_CHOICES[-1]]
+    budget_bytes = vram_budget_mb * 1024 * 1024
+    for bbs in candidates:
+        estimate = estimate_vram_usage_for_args(model_analysis, dict(args_dict, **{"--blasbatchsize": str(bbs)}))
+        if not estimate.get("success"):
+            return None
+        if estimate["total_bytes"] <= budget_bytes:
+            return bbs
+    return candidates[-1]
+
+
+# --- Offload Cost Model ---
+# Fallback bandwidths (GB/s) when a value is neither configured nor detectable: dual-channel DDR5, PCIe 4.0 x16, a mid-range GPU
+DEFAULT_HOST_MEMORY_BANDWIDTH_GBPS = 60.0
+DEFAULT_PCIE_BANDWIDTH_GBPS = 25.0
+DEFAULT_GPU_MEMORY_BANDWIDTH_GBPS = 450.0
+HOST_BANDWIDTH_PLAUSIBLE_GBPS = (5.0, 2000.0)  # A host copy probe outside this range is a measurement artefact
+BACKEND_TRANSITION_LATENCY_S = 20e-6  # Synchronisation each time a token's graph switches between CPU and GPU
+_PCIE_GBPS_PER_LANE = {1: 0.25, 2: 0.5, 3: 0.985, 4: 1.969, 5: 3.938, 6: 7.563}
+_EXPERT_TENSOR_ROLES = ("ffn_up_exps", "ffn_down_exps", "ffn_gate_exps")
+# Order in which a token's graph runs a block's weights; a switch between CPU and GPU along it costs a transition
+_BLOCK_EXECUTION_ORDER = (
+    "attn_qkv", "attn_q", "attn_k", "attn_v", "kv_cache", "attn_o", "ffn_gate_inp",
+    "ffn_gate_exps", "ffn_up_exps", "ffn_down_exps", "ffn_gate_shexp", "ffn_up_shexp", "ffn_down_shexp",
+    "ffn_gate", "ffn_up", "ffn_down",
+)
+_measured_host_bandwidth_gbps: Optional[float] = None
+_host_bandwidth_probe_lock = threading.Lock()
+_gpu_bandwidth_cache: Dict[int, Dict[str, Optional[float]]] = {}
+
+
+def measure_host_memory_bandwidth_gbps(sample_mb: int = 128, wait: bool = True) -> Optional[float]:
+    """
+    Host RAM bandwidth from timing a copy between two pre-faulted buffers (read + write bytes, best of three),
+    split over one thread per physical core with ctypes.memmove, which releases the GIL. Cached per process.
+    None when the result is outside HOST_BANDWIDTH_PLAUSIBLE_GBPS (callers then keep the default), or with
+    wait=False while another thread is still measuring. A configured value takes precedence over either.
+    """
+    global _measured_host_bandwidth_gbps
+    if _measured_host_bandwidth_gbps is None:
+        if not _host_bandwidth_probe_lock.acquire(blocking=wait):
+            return None
+        try:
+            if _measured_host_bandwidth_gbps is None:
+                sample_bytes = sample_mb * 1024 * 1024
+                source_buffer, target_buffer = bytearray(b"\x5a" * sample_bytes), bytearray(sample_bytes)
+                source_address = ctypes.addressof((ctypes.c_char * sample_bytes).from_buffer(source_buffer))
+                target_address = ctypes.addressof((ctypes.c_char * sample_bytes).from_buffer(target_buffer))
+                ctypes.memmove(target_address, source_address, sample_bytes)  # Fault in the target's pages before timing
+                thread_count = max(1, (psutil.cpu_count(logical=False) if psutil_available else None) or os.cpu_count() or 1)
+                chunk_bytes = sample_bytes // thread_count
+                best_elapsed = None
+                for _ in range(3):
+                    workers = [threading.Thread(target=ctypes.memmove, args=(target_address + i * chunk_bytes, source_address + i * chunk_bytes, chunk_bytes))
+                               for i in range(thread_count)]
+                    start = time.perf_counter()
+                    for worker in workers:
+                        worker.start()
+                    for worker in workers:
+                        worker.join()
+                    elapsed = time.perf_counter() - start
+                    best_elapsed = elapsed if best_elapsed is None else min(best_elapsed, elapsed)
+                measured = 2 * chunk_bytes * thread_count / (1024 ** 3) / best_elapsed if best_elapsed else 0.0
+                low, high = HOST_BANDWIDTH_PLAUSIBLE_GBPS
+                _measured_host_bandwidth_gbps = measured if low <= measured <= high else 0.0
+        except (MemoryError, OSError, ValueError):
+            _measured_host_bandwidth_gbps = 0.0
+        finally:
+            _host_bandwidth_probe_lock.release()
+    return _measured_host_bandwidth_gbps or None
+
+
+def start_host_bandwidth_probe() -> None:
+    """Runs the host copy probe on a daemon thread, so UI code can read bandwidths with wait=False without stalling."""
+    if _measured_host_bandwidth_gbps is None:
+        threading.Thread(target=measure_host_memory_bandwidth_gbps, daemon=True).start()
+
+
+def get_gpu_bandwidths_nvidia(device_index: int = 0) -> Dict[str, Optional[float]]:
+    """
+    PCIe link and VRAM bandwidth (GB/s) of an NVIDIA GPU from NVML; None for values NVML cannot report.
+    Both come from the GPU's maximums, which do not change while running, so results are cached per device.
+    """
+    if device_index in _gpu_bandwidth_cache:
+        return dict(_gpu_bandwidth_cache[device_index])
+    result: Dict[str, Optional[float]] = {"pcie_gbps": None, "gpu_gbps": None}
+    if not pynvml_available:
+        return result
+    try:
+        handle = pynvml.nvmlDeviceGetHandleByIndex(device_index)
+    except pynvml.NVMLError:
+        return result
+    try:
+        # The current generation drops while idle, so take the GPU's maximum over the negotiated width
+        link_gen = pynvml.nvmlDeviceGetMaxPcieLinkGeneration(handle)
+        link_width = pynvml.nvmlDeviceGetCurrPcieLinkWidth(handle)
+        if link_gen in _PCIE_GBPS_PER_LANE and link_width:
+            result["pcie_gbps"] = _PCIE_GBPS_PER_LANE[link_gen] * link_width
+    except pynvml.NVMLError:
+        pass
+    try:
+        mem_clock_mhz = pynvml.nvmlDeviceGetMaxClockInfo(handle, pynvml.NVML_CLOCK_MEM)
+        bus_width_bits = pynvml.nvmlDeviceGetMemoryBusWidth(handle)
+        if mem_clock_mhz and bus_width_bits:
+            result["gpu_gbps"] = mem_clock_mhz * 2 * bus_width_bits / 8 / 1000
+    except (pynvml.NVMLError, AttributeError):
+        pass
+    _gpu_bandwidth_cache[device_index] = dict(result)
+    return result
+
+
+def get_offload_bandwidths(current_config: Optional[Dict] = None, wait_for_probe: bool = True) -> Dict[str, Any]:
+    """
+    Host RAM, PCIe and VRAM bandwidths (GB/s) for the offload cost model. A positive
+    'host_memory_bandwidth_gbps' / 'pcie_bandwidth_gbps' / 'gpu_memory_bandwidth_gbps' config value wins,
+    then NVML (for the selected NVIDIA GPU) or the host copy probe, then the defaults.
+    With wait_for_probe=False a host probe still running elsewhere yields the default instead of blocking.
+    """
+    effective_config = current_config if current_config else DEFAULT_CONFIG_TEMPLATE.copy()
+    detected_gpu = get_gpu_bandwidths_nvidia(effective_config.get("selected_gpu_index", 0)) \
+        if effective_config.get("gpu_selection_mode", "auto") in ("auto", "nvidia") else {}
+    bandwidths, sources = {}, {}
+    for key, config_key, detect, default in (
+            ("host_gbps", "host_memory_bandwidth_gbps", lambda: measure_host_memory_bandwidth_gbps(wait=wait_for_probe), DEFAULT_HOST_MEMORY_BANDWIDTH_GBPS),
+            ("pcie_gbps", "pcie_bandwidth_gbps", lambda: detected_gpu.get("pcie_gbps"), DEFAULT_PCIE_BANDWIDTH_GBPS),
+            ("gpu_gbps", "gpu_memory_bandwidth_gbps", lambda: detected_gpu.get("gpu_gbps"), DEFAULT_GPU_MEMORY_BANDWIDTH_GBPS)):
+        try:
+            configured = float(effective_config.get(config_key) or 0)
+        except (TypeError, ValueError):
+            configured = 0.0
+        if configured > 0:
+            bandwidths[key], sources[key] = configured, "config"
+            continue
+        detected = detect()
+        bandwidths[key], sources[key] = (detected, "detected") if detected else (default, "default")
+    bandwidths["sources"] = sources
+    return bandwidths
+
+
+def tensor_touch_fraction(model_analysis: dict, role: str) -> float:
+    """Share of a tensor's bytes read per generated token: routed experts expert_used_count/expert_count, the embedding ~0."""
+    if role in _EXPERT_TENSOR_ROLES:
+        expert_count = model_analysis.get('expert_count') or 0
+        expert_used = model_analysis.get('expert_used_count') or 0
+        return min(1.0, expert_used / expert_count) if expert_count and expert_used else 1.0
+    if role == "token_embd":
+        return 0.0  # One row is gathered per token
+    return 1.0
+
+
+def _tensor_devices(inventory: TensorInventory, model_analysis: dict, override_tensor_str: Optional[str], gpu_layers: int) -> List[bool]:
+    """Per tensor: True if it ends up on GPU under --gpulayers (the last n blocks, output head past n_layer) and the overrides."""
+    num_layers = model_analysis.get('num_layers') or inventory.num_blocks
+    first_gpu_block = num_layers - max(0, min(num_layers, gpu_layers))
+    devices = []
+    for i, to_cpu in enumerate(inventory.override_placement(override_tensor_str)):
+        block_index = inventory.blocks[i]
+        layer_on_gpu = block_index >= first_gpu_block if block_index >= 0 else (gpu_layers > num_layers and inventory.role_of(i) != "token_embd")
+        devices.append(layer_on_gpu if to_cpu is None else not to_cpu)
+    return devices
+
+
+def _transition_cost_s(model_analysis: dict, bandwidths: Dict[str, Any]) -> float:
+    n_embd = ((model_analysis.get('gguf_info') or {}).get('hparams') or {}).get('embedding_length') or 4096
+    return BACKEND_TRANSITION_LATENCY_S + n_embd * 4 / (bandwidths["pcie_gbps"] * 1e9)
+
+
+def estimate_token_time(model_analysis: dict, override_tensor_str: Optional[str] = None, gpu_layers: int = 999,
+                        bandwidths: Optional[Dict[str, Any]] = None, batch_size: int = KOBOLDCPP_DEFAULT_BLAS_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Memory-bound time per generated token for a placement: bytes each tensor reads per token (see
+    tensor_touch_fraction) over VRAM or host bandwidth, plus a PCIe copy and sync at every CPU/GPU switch along
+    the graph. Prompt processing adds the PCIe upload of CPU-resident weights once per batch.
+    """
+    inventory = _inventory_for_analysis(model_analysis)
+    if inventory is None:
+        return {"success": False, "message": "Token time estimate needs the GGUF tensor table (not available for this model)."}
+    override_errors = compile_override_tensors(override_tensor_str)[1]
+    if override_errors:
+        return {"success": False, "message": f"Invalid --overridetensors regex: {override_errors[0]}"}
+    bandwidths = bandwidths or get_offload_bandwidths()
+    num_layers = model_analysis.get('num_layers') or inventory.num_blocks
+    first_gpu_block = num_layers - max(0, min(num_layers, gpu_layers))
+    on_gpu_by_tensor = _tensor_devices(inventory, model_analysis, override_tensor_str, gpu_layers)
+    host_bps, gpu_bps, pcie_bps = bandwidths["host_gbps"] * 1e9, bandwidths["gpu_gbps"] * 1e9, bandwidths["pcie_gbps"] * 1e9
+
+    cpu_seconds = gpu_seconds = 0.0
+    cpu_resident_bytes = 0
+    block_devices: Dict[int, Dict[str, bool]] = {}
+    for i in range(len(inventory)):
+        role, block_index, on_gpu = inventory.role_of(i), inventory.blocks[i], on_gpu_by_tensor[i]
+        touched = inventory.nbytes[i] * tensor_touch_fraction(model_analysis, role)
+        if on_gpu:
+            gpu_seconds += touched / gpu_bps
+        else:
+            cpu_seconds += touched / host_bps
+            if block_index >= 0 or role == "output":
+                cpu_resident_bytes += inventory.nbytes[i]
+        if block_index >= 0 and role in _BLOCK_EXECUTION_ORDER:
+            devices = block_devices.setdefault(block_index, {"kv_cache": block_index >= first_gpu_block})
+            devices[role] = devices.get(role, True) and on_gpu
+
+    transitions, previous_on_gpu = 0, False  # The embedding lookup runs on CPU
+    for block_index in sorted(block_devices):
+        devices = block_devices[block_index]
+        for role in _BLOCK_EXECUTION_ORDER:
+            if role in devices:
+                transitions += devices[role] != previous_on_gpu
+                previous_on_gpu = devices[role]
+    transitions += (gpu_layers > num_layers) != previous_on_gpu
+    transition_seconds = transitions * _transition_cost_s(model_analysis, bandwidths)
+
+    gen_seconds = cpu_seconds + gpu_seconds + transition_seconds
+    prompt_upload_seconds = cpu_resident_bytes / pcie_bps / max(1, batch_size)
+    return {
+        "success": True, "gen_seconds_per_token": gen_seconds, "tokens_per_second": 1.0 / gen_seconds if gen_seconds > 0 else 0.0,
+        "cpu_seconds": cpu_seconds, "gpu_seconds": gpu_seconds, "transitions": transitions, "transition_seconds": transition_seconds,
+        "prompt_upload_seconds_per_token": prompt_upload_seconds,
+        "message": (f"Predicted generation ~{1.0 / gen_seconds if gen_seconds > 0 else 0.0:.1f} t/s "
+                    f"({cpu_seconds * 1000:.1f} ms CPU reads, {gpu_seconds * 1000:.1f} ms GPU reads, {transitions} CPU/GPU switches)")
+    }
+
+
+def estimate_token_time_for_args(model_analysis: dict, args_dict: dict, bandwidths: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """estimate_token_time for a built KoboldCpp argument set (--overridetensors, --gpulayers, --blasbatchsize)."""
+    return estimate_token_time(model_analysis, args_dict.get("--overridetensors"), _gpu_layers_from_args(model_analysis, args_dict),
+                               bandwidths, _arg_as_int(args_dict, "--blasbatchsize", KOBOLDCPP_DEFAULT_BLAS_BATCH_SIZE))
+
+
+def _predicted_tokens_per_second(model_analysis: dict, override_tensor_str: Optional[str], gpu_layers: int,
+                                 bandwidths: Optional[Dict[str, Any]]) -> Optional[float]:
+    if bandwidths is None:
+        return None
+    estimate = estimate_token_time(model_analysis, override_tensor_str, gpu_layers, bandwidths)
+    return estimate["tokens_per_second"] if estimate.get("success") else None
+
+
+def _tokens_per_second_text(tokens_per_second: Optional[float]) -> str:
+    return f", ~{tokens_per_second:.1f} t/s predicted" if tokens_per_second is not None else ""
+
+
+# --- Offload Planning ---
+# Cheapest to run from system RAM first: routed experts (only expert_used_count of expert_count run per token),
+# then dense FFN weights, shared experts, and attention last
+OFFLOAD_ROLE_PRIORITY = (
+    "ffn_down_exps", "ffn_up_exps", "ffn_gate_exps",
+    "ffn_up", "ffn_gate", "ffn_down",
+    "ffn_up_shexp", "ffn_gate_shexp", "ffn_down_shexp",
+    "attn_qkv", "attn_q", "attn_k", "attn_v", "attn_o",
+)
+
+
+def build_override_tensors_from_blocks(blocks_by_base: Dict[str, List[int]], num_layers: int,
+                                       inventory: Optional[TensorInventory] = None) -> Optional[str]:
+    """
+    --overridetensors value sending the given per-block tensors (base name -> block indices) to CPU.
+    Base names that share a block set are combined into one alternation.
+    """
+    bases_by_blocks: Dict[Tuple[int, ...], List[str]] = {}
+    for base, blocks in blocks_by_base.items():
+        if blocks:
+            bases_by_blocks.setdefault(tuple(sorted(set(blocks))), []).append(base)
+    parts = []
+    for blocks, bases in bases_by_blocks.items():
+        parts.append(synthesize_block_override_pattern(list(blocks), bases, num_layers, inventory))
+    if not parts:
+        return None
+    return f"({'|'.join(parts)})=CPU" if len(parts) > 1 else f"{parts[0]}=CPU"
+
+
+def _offload_move_order(inventory: TensorInventory, model_analysis: Optional[dict] = None,
+                        bandwidths: Optional[Dict[str, Any]] = None) -> List[int]:
+    """
+    Per-block tensor indices in the order the planners move them to CPU. With bandwidths, greedily by the
+    least added time per token per byte freed: the tensor's touched bytes read from host instead of VRAM, plus
+    the two CPU/GPU switches the first CPU tensor of a block introduces. Ties, and the order without
+    bandwidths, follow OFFLOAD_ROLE_PRIORITY, then block 0 upwards.
+    """
+    role_rank = {role: rank for rank, role in enumerate(OFFLOAD_ROLE_PRIORITY)}
+    candidates = [i for i in range(len(inventory)) if inventory.blocks[i] >= 0 and inventory.role_of(i) in role_rank]
+    if model_analysis is None or bandwidths is None:
+        return sorted(candidates, key=lambda idx: (role_rank[inventory.role_of(idx)], inventory.blocks[idx]))
+
+    seconds_per_byte = max(0.0, 1 / (bandwidths["host_gbps"] * 1e9) - 1 / (bandwidths["gpu_gbps"] * 1e9))
+    block_switch_seconds = 2 * _transition_cost_s(model_analysis, bandwidths)
+
+    def heap_entry(i: int, block_started: bool) -> Tuple:
+        penalty = inventory.nbytes[i] * tensor_touch_fraction(model_analysis, inventory.role_of(i)) * seconds_per_byte
+        penalty += 0.0 if block_started else block_switch_seconds
+        return (penalty / max(1, inventory.nbytes[i]), role_rank[inventory.role_of(i)], inventory.blocks[i], i, block_started)
+
+    candidates_by_block: Dict[int, List[int]] = {}
+    for i in candidates:
+        candidates_by_block.setdefault(inventory.blocks[i], []).append(i)
+    heap = [heap_entry(i, False) for i in candidates]
+    heapq.heapify(heap)
+    started_blocks, moved, order = set(), set(), []
+    while heap:
+        _, _, block_index, i, block_started = heapq.heappop(heap)
+        if i in moved or (block_index in started_blocks and not block_started):
+            continue  # Superseded by the cheaper entry pushed when its block started
+        moved.add(i)
+        order.append(i)
+        if block_index not in started_blocks:
+            started_blocks.add(block_index)
+            for other in candidates_by_block[block_index]:
+                if other not in moved:
+                    heapq.heappush(heap, heap_entry(other, True))
+    return order
+
+
+def _max_gpu_layers_within_budget(model_analysis: dict, plan_args: dict, num_layers: int, budget_bytes: int) -> Tuple[int, Dict[str, Any]]:
+    """Binary search for the most --gpulayers (with their KV cache) whose estimate fits budget_bytes; returns (layers, estimate)."""
+    def estimate_at(layers: int) -> Dict[str, Any]:
+        return estimate_vram_usage_for_args(model_analysis, dict(plan_args, **{"--gpulayers": str(layers)}))
+    low, high = 0, num_layers
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_at(mid)["total_bytes"] <= budget_bytes:
+            low = mid
+        else:
+            high = mid - 1
+    return low, estimate_at(low)
+
+
+def plan_offload_for_budget(model_analysis: dict, vram_budget_mb: float, args_dict: Optional[dict] = None,
+                            bandwidths: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Picks which tensors go to CPU so weights + KV cache + compute buffer fit vram_budget_mb, offloading
+    whole tensors in _offload_move_order (cheapest predicted slowdown first when bandwidths are given)
+    until the excess is covered. If even every planned role on CPU is not enough, --gpulayers is lowered
+    as well. Returns the --overridetensors / --gpulayers pair with the predicted GPU bytes, and with
+    bandwidths the predicted generation speed.
+    """
+    inventory = _inventory_for_analysis(model_analysis)
+    if inventory is None:
+        return {"success": False, "message": "Offload planning needs the GGUF tensor table (not available for this model)."}
+    num_layers = model_analysis.get('num_layers') or inventory.num_blocks
+    plan_args = {k: v for k, v in (args_dict or {}).items() if k not in ("--overridetensors", "--nogpulayers")}
+    plan_args["--gpulayers"] = "999"
+    full_gpu = estimate_vram_usage_for_args(model_analysis, plan_args)
+    if not full_gpu.get("success"):
+        return {"success": False, "message": full_gpu.get("message", "VRAM estimate unavailable.")}
+
+    budget_bytes = int(vram_budget_mb * 1024 * 1024)
+    excess = full_gpu["total_bytes"] - budget_bytes
+    blocks_by_base: Dict[str, List[int]] = {}
+    offloaded = 0
+    if excess > 0:
+        for i in _offload_move_order(inventory, model_analysis, bandwidths):
+            if offloaded >= excess:
+                break
+            blocks_by_base.setdefault(split_tensor_name(inventory.names[i])[0], []).append(inventory.blocks[i])
+            offloaded += inventory.nbytes[i]
+
+    override_str = build_override_tensors_from_blocks(blocks_by_base, num_layers, inventory)
+    gpu_layers = 999
+    plan_args["--overridetensors"] = override_str
+    estimate = estimate_vram_usage_for_args(model_analysis, plan_args)
+    if estimate["total_bytes"] > budget_bytes:
+        # Planned roles alone are not enough: lower --gpulayers as well
+        gpu_layers, estimate = _max_gpu_layers_within_budget(model_analysis, plan_args, num_layers, budget_bytes)
+
+    fits = estimate["total_bytes"] <= budget_bytes
+    layers_text = "all" if gpu_layers > num_layers else f"{gpu_layers}/{num_layers}"
+    tokens_per_second = _predicted_tokens_per_second(model_analysis, override_str, gpu_layers, bandwidths)
+    return {
+        "success": True, "override_tensors": override_str, "gpu_layers": gpu_layers, "fits": fits,
+        "predicted_gpu_bytes": estimate["total_bytes"], "offloaded_bytes": inventory.bytes_moved_to_cpu(override_str),
+        "budget_bytes": budget_bytes, "predicted_tokens_per_second": tokens_per_second,
+        "message": (f"Budget plan: {estimate['total_bytes'] / (1024**2):.0f} MiB predicted on GPU "
+                    f"(budget {vram_budget_mb:.0f} MiB), {inventory.bytes_moved_to_cpu(override_str) / (1024**2):.0f} MiB "
+                    f"of tensors to CPU, GPU layers {layers_text}" + _tokens_per_second_text(tokens_per_second)
+                    + ("" if fits else " - does not fit even at 0 layers"))
+    }
+
+
+OFFLOAD_DIAL_STEP_MB = 256
+
+
+def build_offload_ladder(model_analysis: dict, args_dict: Optional[dict] = None, step_mb: float = OFFLOAD_DIAL_STEP_MB,
+                         bandwidths: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Monotone ladder of offload plans ordered from everything on GPU to nothing on GPU, with the predicted
+    GPU-resident bytes of consecutive rungs about step_mb apart (a rung never splits a tensor, so one
+    tensor larger than the step is a step of its own). Tensors leave in the same order as
+    plan_offload_for_budget given the same bandwidths; once they are all on CPU the remaining rungs lower --gpulayers.
+    Rungs are materialized into --overridetensors / --gpulayers by get_offload_ladder_rung.
+    """
+    inventory = _inventory_for_analysis(model_analysis)
+    if inventory is None:
+        return {"success": False, "message": "The offload dial needs the GGUF tensor table (not available for this model)."}
+    num_layers = model_analysis.get('num_layers') or inventory.num_blocks
+    plan_args = {k: v for k, v in (args_dict or {}).items() if k not in ("--overridetensors", "--nogpulayers")}
+    plan_args["--gpulayers"] = "999"
+    full_gpu = estimate_vram_usage_for_args(model_analysis, plan_args)
+    if not full_gpu.get("success"):
+        return {"success": False, "message": full_gpu.get("message", "VRAM estimate unavailable.")}
+
+    step_bytes = max(1, int(step_mb * 1024 * 1024))
+    moves = [(split_tensor_name(inventory.names[i])[0], inventory.blocks[i], inventory.nbytes[i]) for i in _offload_move_order(inventory, model_analysis, bandwidths)]
+    rungs = [{"moves": 0, "gpu_layers": 999, "predicted_gpu_bytes": full_gpu["total_bytes"]}]
+    resident, pending = full_gpu["total_bytes"], 0
+    for count, (_, _, size) in enumerate(moves, start=1):
+        resident -= size
+        pending += size
+        if pending >= step_bytes or count == len(moves):
+            rungs.append({"moves": count, "gpu_layers": 999, "predicted_gpu_bytes": resident})
+            pending = 0
+
+    plan_args["--overridetensors"] = build_override_tensors_from_blocks(_blocks_by_base_for_moves(moves), num_layers, inventory)
+    for gpu_layers in range(num_layers, -1, -1):
+        estimate = estimate_vram_usage_for_args(model_analysis, dict(plan_args, **{"--gpulayers": str(gpu_layers)}))
+        drop = rungs[-1]["predicted_gpu_bytes"] - estimate["total_bytes"]
+        if drop >= step_bytes or (gpu_layers == 0 and drop > 0):
+            rungs.append({"moves": len(moves), "gpu_layers": gpu_layers, "predicted_gpu_bytes": estimate["total_bytes"]})
+
+    return {
+        "success": True, "rungs": rungs, "moves": [(base, block) for base, block, _ in moves],
+        "num_layers": num_layers, "step_bytes": step_bytes, "bandwidths": bandwidths,
+        "message": (f"Offload dial: {len(rungs)} steps of ~{step_mb:.0f} MiB from {rungs[0]['predicted_gpu_bytes'] / (1024**2):.0f} "
+                    f"to {rungs[-1]['predicted_gpu_bytes'] / (1024**2):.0f} MiB GPU-resident")
+    }
+
+
+def _blocks_by_base_for_moves(moves) -> Dict[str, List[int]]:
+    blocks_by_base: Dict[str, List[int]] = {}
+    for move in moves:
+        blocks_by_base.setdefault(move[0], []).append(move[1])
+    return blocks_by_base
+
+
+def offload_ladder_index_for_bytes(ladder: Dict[str, Any], gpu_resident_bytes: float) -> int:
+    """Dial position with the most GPU-resident bytes that does not exceed gpu_resident_bytes (the last rung if none fits)."""
+    rungs = ladder["rungs"]
+    for index, rung in enumerate(rungs):
+        if rung["predicted_gpu_bytes"] <= gpu_resident_bytes:
+            return index
+    return len(rungs) - 1
+
+
+def get_offload_ladder_rung(model_analysis: dict, ladder: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """The --overridetensors / --gpulayers plan at one dial position, shaped like a plan_offload_for_budget result."""
+    index = max(0, min(index, len(ladder["rungs"]) - 1))
+    rung = ladder["rungs"][index]
+    num_layers = ladder["num_layers"]
+    inventory = _inventory_for_analysis(model_analysis)
+    override_str = build_override_tensors_from_blocks(_blocks_by_base_for_moves(ladder["moves"][:rung["moves"]]), num_layers, inventory)
+    offloaded = inventory.bytes_moved_to_cpu(override_str) if inventory is not None else 0
+    layers_text = "all" if rung["gpu_layers"] > num_layers else f"{rung['gpu_layers']}/{num_layers}"
+    tokens_per_second = _predicted_tokens_per_second(model_analysis, override_str, rung["gpu_layers"], ladder.get("bandwidths"))
+    return {
+        "success": True, "override_tensors": override_str, "gpu_layers": rung["gpu_layers"], "fits": True,
+        "predicted_gpu_bytes": rung["predicted_gpu_bytes"], "offloaded_bytes": offloaded, "dial_index": index,
+        "predicted_tokens_per_second": tokens_per_second,
+        "message": (f"Offload dial {index}/{len(ladder['rungs']) - 1}: {rung['predicted_gpu_bytes'] / (1024**2):.0f} MiB GPU-resident, "
+                    f"{offloaded / (1024**2):.0f} MiB of tensors to CPU, GPU layers {layers_text}" + _tokens_per_second_text(tokens_per_second))
+    }
+
+
+
+def step_offload_dial(model_analysis: dict, ladder: Dict[str, Any], delta: int, current_plan: Optional[dict] = None,
+                      current_gpu_bytes: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Moves the offload dial delta rungs (positive = more CPU). Starts from the rung of a dial plan, otherwise
+    from where current_gpu_bytes (a budget plan or OT level in use) falls on the ladder. None at either end.
+    """
+    last = len(ladder["rungs"]) - 1
+    if current_plan and "dial_index" in current_plan:
+        index = current_plan["dial_index"] + delta
+    elif current_gpu_bytes is None:
+        index = 0 if delta < 0 else last
+    elif delta > 0:
+        index = offload_ladder_index_for_bytes(ladder, current_gpu_bytes - 1) + delta - 1
+    else:
+        index = offload_ladder_index_for_bytes(ladder, current_gpu_bytes) + delta
+    index = max(0, min(index, last))
+    if current_plan and current_plan.get("dial_index") == index:
+        return None
+    if current_gpu_bytes is not None and (ladder["rungs"][index]["predicted_gpu_bytes"] - current_gpu_bytes) * delta >= 0:
+        return None  # The ladder has nothing further in that direction
+    return get_offload_ladder_rung(model_analysis, ladder, index)
+
+# --- MoE Expert Offload ---
+# Routed expert tensors of one block, moved to CPU together as that block's group (down first when a group is split)
+MOE_ROUTED_EXPERT_BASES_ORDER = ("ffn_down_exps", "ffn_up_exps", "ffn_gate_exps", "ffn_gate_up_exps")
+
+
+def active_bytes_per_token_by_device(model_analysis: dict, override_tensor_str: Optional[str] = None,
+                                     gpu_layers: int = 999) -> Dict[str, int]:
+    """Weight bytes read per generated token on CPU and on GPU for a placement (see tensor_touch_fraction)."""
+    inventory = _inventory_for_analysis(model_analysis)
+    active = {"cpu": 0, "gpu": 0}
+    if inventory is None:
+        return active
+    for i, on_gpu in enumerate(_tensor_devices(inventory, model_analysis, override_tensor_str, gpu_layers)):
+        active["gpu" if on_gpu else "cpu"] += int(inventory.nbytes[i] * tensor_touch_fraction(model_analysis, inventory.role_of(i)))
+    return active
+
+
+def plan_moe_expert_offload(model_analysis: dict, vram_budget_mb: float, args_dict: Optional[dict] = None,
+                            bandwidths: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    MoE-specific budget plan: attention, routers (ffn_gate_inp), shared experts and norms stay on GPU and
+    only routed expert tensors move to CPU, one block's experts at a time. Blocks are taken in groups of
+    similar expert bytes (largest first, so mixed-quant models shed the heaviest layers first) and only
+    the last group is split per tensor to land close to the budget. --gpulayers is lowered only if every
+    routed expert on CPU still does not fit. Reports active bytes per token (experts weighted by
+    expert_used_count/expert_count) on each device.
+    """
+    inventory = _inventory_for_analysis(model_analysis)
+    if inventory is None:
+        return {"success": False, "message": "MoE expert planning needs the GGUF tensor table (not available for this model)."}
+    expert_count = model_analysis.get('expert_count') or 0
+    expert_used = model_analysis.get('expert_used_count') or 0
+    expert_bytes_by_block: Dict[int, Dict[str, int]] = {}
+    for i in range(len(inventory)):
+        base = split_tensor_name(inventory.names[i])[0]
+        if inventory.blocks[i] >= 0 and base in MOE_ROUTED_EXPERT_BASES_ORDER:
+            expert_bytes_by_block.setdefault(inventory.blocks[i], {})[base] = inventory.nbytes[i]
+    if expert_count < 2 or not expert_bytes_by_block:
+        return {"success": False, "message": "Not a MoE model with routed expert tensors; use the general offload planner."}
+    num_layers = model_analysis.get('num_layers') or inventory.num_blocks
+    plan_args = {k: v for k, v in (args_dict or {}).items() if k not in ("--overridetensors", "--nogpulayers")}
+    plan_args["--gpulayers"] = "999"
+    full_gpu = estimate_vram_usage_for_args(model_analysis, plan_args)
+    if not full_gpu.get("success"):
+        return {"success": False, "message": full_gpu.get("message", "VRAM estimate unavailable.")}
+
+    budget_bytes = int(vram_budget_mb * 1024 * 1024)
+    excess = full_gpu["total_bytes"] - budget_bytes
+    blocks_by_base: Dict[str, List[int]] = {}
+    moved, whole_blocks = 0, 0
+    # Stable sort keeps blocks of equal size in order, which keeps the synthesized regex compact
+    for block_index in sorted(expert_bytes_by_block, key=lambda b: -sum(expert_bytes_by_block[b].values())):
+        if moved >= excess:
+            break
+        group = expert_bytes_by_block[block_index]
+        if moved + sum(group.values()) <= excess or len(group) == 1:
+            for base in group:
+                blocks_by_base.setdefault(base, []).append(block_index)
+            moved += sum(group.values())
+            whole_blocks += 1
+            continue
+        for base in MOE_ROUTED_EXPERT_BASES_ORDER:  # Last group: only as many of its tensors as the excess needs
+            if base in group and moved < excess:
+                blocks_by_base.setdefault(base, []).append(block_index)
+                moved += group[base]
+
+    override_str = build_override_tensors_from_blocks(blocks_by_base, num_layers, inventory)
+    plan_args["--overridetensors"] = override_str
+    gpu_layers = 999
+    estimate = estimate_vram_usage_for_args(model_analysis, plan_args)
+    if estimate["total_bytes"] > budget_bytes:
+        gpu_layers, estimate = _max_gpu_layers_within_budget(model_analysis, plan_args, num_layers, budget_bytes)
+    fits = estimate["total_bytes"] <= budget_bytes
+    active = active_bytes_per_token_by_device(model_analysis, override_str, gpu_layers)
+    tokens_per_second = _predicted_tokens_per_second(model_analysis, override_str, gpu_layers, bandwidths)
+    layers_text = "all" if gpu_layers > num_layers else f"{gpu_layers}/{num_layers}"
+    expert_blocks_on_cpu = len({b for blocks in blocks_by_base.values() for b in blocks})
+    partial_blocks = expert_blocks_on_cpu - whole_blocks
+    return {
+        "success": True, "override_tensors": override_str, "gpu_layers": gpu_layers, "fits": fits,
+        "predicted_gpu_bytes": estimate["total_bytes"], "offloaded_bytes": inventory.bytes_moved_to_cpu(override_str),
+        "budget_bytes": budget_bytes, "expert_blocks_on_cpu": expert_blocks_on_cpu,
+        "active_bytes_per_token": active, "predicted_tokens_per_second": tokens_per_second,
+        "message": (f"MoE plan ({expert_used}/{expert_count} experts active): routed experts of {expert_blocks_on_cpu} of "
+                    f"{len(expert_bytes_by_block)} blocks to CPU"
+                    + (f" ({partial_blocks} of them in part)" if partial_blocks else "")
+                    + f", {estimate['total_bytes'] / (1024**2):.0f} MiB predicted on GPU "
+                    f"(budget {vram_budget_mb:.0f} MiB), GPU layers {layers_text}; active per token "
+                    f"GPU {active['gpu'] / (1024**2):.0f} MiB / CPU {active['cpu'] / (1024**2):.0f} MiB"
+                    + _tokens_per_second_text(tokens_per_second) + ("" if fits else " - does not fit even at 0 layers"))
+    }
+
+
+# --- Multi-GPU Planning ---
+def parse_gpu_index_list(value: Any) -> List[int]:
+    """GPU IDs from a list or a comma/space separated string ('0,1' or '0 1'); invalid entries are dropped."""
+    items = value if isinstance(value, (list, tuple)) else str(value or "").replace(",", " ").split()
+    indices = []
+    for item in items:
+        try:
+            index = int(str(item).strip())
+        except ValueError:
+            continue
+        if index >= 0 and index not in indices:
+            indices.append(index)
+    return indices
+
+
+def _gpu_info_function_for_vendor(vendor: str):
+    return {"nvidia": get_gpu_info_nvidia, "amd": get_gpu_info_amd, "intel": get_gpu_info_intel}.get(vendor)
+
+
+def get_multi_gpu_vram_info(current_config: Optional[Dict] = None, device_indices: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    VRAM info for every GPU selected for splitting (config 'multi_gpu_indices' unless device_indices is given),
+    each with its 'id'. All devices come from one vendor: the configured one, or the first in auto order that
+    answers. Returns an empty list when fewer than two devices are selected.
+    """
+    effective_config = current_config if current_config else DEFAULT_CONFIG_TEMPLATE.copy()
+    indices = parse_gpu_index_list(device_indices if device_indices is not None else effective_config.get("multi_gpu_indices", []))
+    if len(indices) < 2:
+        return []
+    gpu_detection_prefs = effective_config.get("gpu_detection", DEFAULT_CONFIG_TEMPLATE["gpu_detection"].copy())
+    cfg_target_type = effective_config.get("gpu_selection_mode", "auto")
+    vendors = [cfg_target_type] if cfg_target_type != "auto" else ["nvidia", "amd", "intel"]
+    for vendor in vendors:
+        info_function = _gpu_info_function_for_vendor(vendor)
+        if not info_function or not gpu_detection_prefs.get(vendor, True):
+            continue
+        devices = []
+        for index in indices:
+            info = info_function(index)
+            if info and info.get("success"):
+                devices.append(dict(info, id=index))
+        if devices:
+            return devices
+    return []
+
+
+def _pack_layers_in_device_order(layer_costs: List[int], capacities: List[int]) -> Optional[List[int]]:
+    """Contiguous runs of layers per device, filled in device order; None if they do not all fit."""
+    counts, device, used = [0] * len(capacities), 0, 0
+    for cost in layer_costs:
+        while device < len(capacities) and used + cost > capacities[device]:
+            device, used = device + 1, 0
+        if device >= len(capacities):
+            return None
+        counts[device] += 1
+        used += cost
+    return counts
+
+
+def plan_tensor_split(model_analysis: dict, devices: List[Dict[str, Any]], args_dict: Optional[dict] = None,
+                      safety_buffer_mb: float = 0.0, main_gpu: Optional[int] = None,
+                      bandwidths: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Spreads the offloaded layers over several GPUs (dicts with 'id' and 'free_mb') as llama.cpp's layer split
+    assigns them: contiguous runs of the last --gpulayers blocks in device order, the output head counted as one
+    more layer after the last block, and each layer's KV cache on its device. The main GPU (most free VRAM unless
+    given) also holds the compute buffer. If the layers do not all fit, CPU tensor overrides for the remainder
+    come from plan_offload_for_budget over the combined budget, and --gpulayers is lowered if that is still short.
+    Returns --tensor_split / --maingpu together with the --overridetensors / --gpulayers pair.
+    """
+    inventory = _inventory_for_analysis(model_analysis)
+    if inventory is None:
+        return {"success": False, "message": "Multi-GPU planning needs the GGUF tensor table (not available for this model)."}
+    if len(devices) < 2:
+        return {"success": False, "message": "Multi-GPU planning needs at least two GPUs with VRAM information."}
+    num_layers = model_analysis.get('num_layers') or inventory.num_blocks
+    devices = sorted(devices, key=lambda dev: dev["id"])
+    device_ids = [dev["id"] for dev in devices]
+    if main_gpu not in device_ids:
+        main_gpu = max(devices, key=lambda dev: dev.get("free_mb", 0.0))["id"]
+
+    plan_args = {k: v for k, v in (args_dict or {}).items() if k not in ("--overridetensors", "--nogpulayers", "--tensor_split", "--maingpu")}
+    plan_args["--gpulayers"] = "999"
+    full_gpu = estimate_vram_usage_for_args(model_analysis, plan_args)
+    if not full_gpu.get("success"):
+        return {"success": False, "message": full_gpu.get("message", "VRAM estimate unavailable.")}
+    kv_per_layer = full_gpu["kv_bytes"] // max(1, num_layers)
+    capacities = [max(0, int((dev.get("free_mb", 0.0) - safety_buffer_mb) * 1024 * 1024)
+                      - (full_gpu["compute_bytes"] if dev["id"] == main_gpu else 0)) for dev in devices]
+
+    def layer_costs(override_str: Optional[str], gpu_layers: int) -> List[int]:
+        simulation = simulate_override_tensors(model_analysis, override_str)
+        by_block = simulation["gpu_bytes_by_block"]
+        costs = [by_block.get(b, 0) + kv_per_layer for b in range(num_layers - min(gpu_layers, num_layers), num_layers)]
+        if gpu_layers > num_layers:
+            costs.append(simulation["gpu_bytes"] - sum(by_block.values()))
+        return costs
+
+    override_str, gpu_layers = None, num_layers + 1
+    counts = _pack_layers_in_device_order(layer_costs(None, gpu_layers), capacities)
+    if counts is None:
+        combined_budget_mb = (sum(capacities) + full_gpu["compute_bytes"]) / (1024 * 1024)
+        override_str = plan_offload_for_budget(model_analysis, combined_budget_mb, args_dict, bandwidths)["override_tensors"]
+        counts = _pack_layers_in_device_order(layer_costs(override_str, gpu_layers), capacities)
+    if counts is None:
+        low, high = 0, num_layers
+        while low < high:
+            mid = (low + high + 1) // 2
+            if _pack_layers_in_device_order(layer_costs(override_str, mid), capacities) is not None:
+                low = mid
+            else:
+                high = mid - 1
+        gpu_layers = low
+        counts = _pack_layers_in_device_order(layer_costs(override_str, gpu_layers), capacities)
+
+    costs = layer_costs(override_str, gpu_layers)
+    # Spread proportionally to free VRAM rather than filling the first GPUs to the brim: shrink every
+    # capacity by the same factor as far as the layers still pack
+    low_scale, high_scale = sum(costs) / max(1, sum(capacities)), 1.0
+    for _ in range(20):
+        mid_scale = (low_scale + high_scale) / 2
+        scaled_counts = _pack_layers_in_device_order(costs, [int(cap * mid_scale) for cap in capacities])
+        if scaled_counts is not None:
+            high_scale, counts = mid_scale, scaled_counts
+        else:
+            low_scale = mid_scale
+    per_device_bytes, start = {}, 0
+    for dev, count in zip(devices, counts):
+        per_device_bytes[dev["id"]] = sum(costs[start:start + count]) + (full_gpu["compute_bytes"] if dev["id"] == main_gpu else 0)
+        start += count
+    split_by_id = {dev_id: count for dev_id, count in zip(device_ids, counts)}
+    tensor_split = " ".join(str(split_by_id.get(i, 0)) for i in range(max(device_ids) + 1))
+    fits = gpu_layers > 0
+    layers_text = "all" if gpu_layers > num_layers else f"{gpu_layers}/{num_layers}"
+    offloaded = inventory.bytes_moved_to_cpu(override_str)
+    tokens_per_second = _predicted_tokens_per_second(model_analysis, override_str, gpu_layers, bandwidths)
+    return {
+        "success": True, "tensor_split": tensor_split, "main_gpu": main_gpu, "override_tensors": override_str,
+        "gpu_layers": gpu_layers, "fits": fits, "per_device_bytes": per_device_bytes,
+        "predicted_gpu_bytes": sum(per_device_bytes.values()), "offloaded_bytes": offloaded,
+        "predicted_tokens_per_second": tokens_per_second,
+        "message": (f"Multi-GPU plan: --tensor_split {tensor_split} --maingpu {main_gpu}, GPU layers {layers_text}, "
+                    f"{offloaded / (1024**2):.0f} MiB of tensors to CPU{_tokens_per_second_text(tokens_per_second)}; per GPU "
+                    + ", ".join(f"{dev_id}: {size / (1024**2):.0f} MiB" for dev_id, size in per_device_bytes.items()))
+    }
+
+
+def plan_tensor_split_for_config(model_analysis: dict, args_dict: Optional[dict], current_config: Optional[Dict] = None) -> Dict[str, Any]:
+    """plan_tensor_split over the GPUs selected in the config, keeping its VRAM safety buffer free on each."""
+    effective_config = current_config if current_config else DEFAULT_CONFIG_TEMPLATE.copy()
+    devices = get_multi_gpu_vram_info(effective_config)
+    if len(devices) < 2:
+        return {"success": False, "message": "Multi-GPU split needs at least two detected GPUs listed in 'multi_gpu_indices'."}
+    return plan_tensor_split(model_analysis, devices, args_dict, float(effective_config.get("vram_safety_buffer_mb", 768)),
+                             bandwidths=get_offload_bandwidths(effective_config))
+
+
+# --- Level Ladder ---
+def build_level_ladder(model_path: str, model_analysis: dict, session_args: dict, min_level: int, max_level: int,
+                       vram_budget_mb: Optional[float] = None, bandwidths: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Everything a tuning session shows or launches for each OT level, computed once: OT string, --gpulayers,
+    description, the built KoboldCpp args, and predicted GPU bytes (weights + KV + compute) and CPU-resident
+    weight bytes, plus generation speed when bandwidths are given. Rebuild it when the session args change.
+    """
+    inventory = _inventory_for_analysis(model_analysis)
+    levels: Dict[int, Dict[str, Any]] = {}
+    for level in range(min_level, max_level + 1):
+        override_str = generate_overridetensors(model_analysis, level)
+        args_list = build_command(model_path, override_str, model_analysis, session_args,
+                                  current_attempt_level_for_tuning=level, vram_budget_mb=vram_budget_mb)
+        estimate = estimate_vram_usage_for_args(model_analysis, args_list_to_dict(args_list))
+        gpu_layers = get_gpu_layers_for_level(model_analysis, level)
+        levels[level] = {
+            "level": level, "override_tensors": override_str, "gpu_layers": gpu_layers,
+            "description": get_offload_description(model_analysis, level, override_str),
+            "args": args_list,
+            "predicted_gpu_bytes": estimate["total_bytes"] if estimate.get("success") else None,
+            "predicted_cpu_bytes": inventory.total_bytes - estimate["weights_bytes"] if inventory is not None and estimate.get("success") else None,
+            "predicted_tokens_per_second": _predicted_tokens_per_second(model_analysis, override_str, gpu_layers, bandwidths),
+        }
+    return {
+        "model_path": model_path, "min_level": min_level, "max_level": max_level, "levels": levels,
+        "message": f"Level ladder: {len(levels)} levels ({min_level}..{max_level}) precomputed."
+    }
+
+
+def get_level_ladder_entry(ladder: Optional[Dict[str, Any]], model_analysis: dict, level: int) -> Dict[str, Any]:
+    """A level's ladder row; levels outside the ladder (or without one) are computed on the spot, minus the predictions."""
+    entry = (ladder or {}).get("levels", {}).get(level)
+    if entry is not None:
+        return entry
+    override_str = generate_overridetensors(model_analysis, level)
+    return {"level": level, "override_tensors": override_str, "gpu_layers": get_gpu_layers_for_level(model_analysis, level),
+            "description": get_offload_description(model_analysis, level, override_str), "args": None,
+            "predicted_gpu_bytes": None, "predicted_cpu_bytes": None, "predicted_tokens_per_second": None}
+
+
+def export_level_ladder_json(ladder: Dict[str, Any], output_path: str) -> Tuple[bool, str]:
+    """Writes the level ladder as JSON (one row per level, ordered from max GPU to max CPU) for review."""
+    export_data = {
+        "model_path": ladder.get("model_path"), "exported_at": datetime.now(timezone.utc).isoformat(),
+        "launcher_core_version": CORE_VERSION,
+        "levels": [ladder["levels"][level] for level in sorted(ladder.get("levels", {}))],
+    }
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(export_data, f, indent=2)
+        return True, f"Level ladder exported to {output_path}"
+    except Exception as e:
+        return False, f"Error exporting level ladder: {e}"
+
+
+# Arguments KoboldCpp takes as several space-separated values; kept as one space-joined string in arg dicts
+MULTI_VALUE_ARGS = ("--tensor_split",)
+
+def args_list_to_dict(args_list):
+    args_dict, i = {}, 0
+    while i < len(args_list):
+        arg = args_list[i]
+        if arg.startswith("--"):
+            if arg in MULTI_VALUE_ARGS:
+                j = i + 1
+                while j < len(args_list) and not args_list[j].startswith("--"): j += 1
+                args_dict[arg] = " ".join(args_list[i+1:j]) if j > i + 1 else True; i = j
+            elif i + 1 < len(args_list) and not args_list[i+1].startswith("--"):
+                args_dict[arg] = args_list[i+1]; i += 2
+            else: args_dict[arg] = True; i += 1
+        else: i += 1
+    return args_dict
+
+def args_dict_to_list(args_dict):
+    cmd_list_part = []
+    if "--model" in args_dict: cmd_list_part.extend(["--model", str(args_dict["--model"])])
+    processed_keys = {"--model"}
+    defined_keys_ordered = [arg_def["key"] for arg_def in KOBOLDCPP_ARG_DEFINITIONS if arg_def["key"] != "--model"]
+    for key in defined_keys_ordered:
+        if key in args_dict and key not in processed_keys:
+            value = args_dict[key]
+            arg_def_type = next((d.get("type_hint", "str") for d in KOBOLDCPP_ARG_DEFINITIONS if d["key"] == key), "str")
+            if arg_def_type == "bool_flag":
+                if value is True: cmd_list_part.append(key)
+            elif isinstance(value, bool):
+                if value is True: cmd_list_part.append(key)
+            elif key in MULTI_VALUE_ARGS and value is not None:
+                split_values = str(value).replace(",", " ").split()
+                if split_values: cmd_list_part.extend([key] + split_values)
+            elif value is not None:
+                cmd_list_part.extend([key, str(value)])
+            processed_keys.add(key)
+    for key in sorted([k for k in args_dict if k not in processed_keys]):
+        value = args_dict[key]
+        if value is True: cmd_list_part.append(key)
+        elif value not in [False, None]: cmd_list_part.extend([key, str(value)])
+    return cmd_list_part
+
+def format_command_for_display(cmd_list):
+    if not cmd_list: return ""
+    exe_part = cmd_list[0]; args_start_index = 1
+    if len(cmd_list) > 1 and cmd_list[0].lower() == sys.executable.lower() and cmd_list[1].lower().endswith(".py"):
+        exe_part = f'"{cmd_list[0]}" "{cmd_list[1]}"'; args_start_index = 2
+    elif " " in cmd_list[0] and not (cmd_list[0].startswith('"') and cmd_list[0].endswith('"')):
+        exe_part = f'"{cmd_list[0]}"'
+
+    formatted_cmd_parts = [exe_part]
+    i = args_start_index
+    while i < len(cmd_list):
+        item = cmd_list[i]
+        if item.startswith("--"):
+            current_arg_part = f"\n  {item}"
+            if item in MULTI_VALUE_ARGS:  # e.g. --tensor_split 19 14: every value up to the next flag
+                while i + 1 < len(cmd_list) and not cmd_list[i+1].startswith("--"):
+                    current_arg_part += f" {cmd_list[i+1]}"
+                    i += 1
+            elif i + 1 < len(cmd_list) and not cmd_list[i+1].startswith("--"):
+                value_part = cmd_list[i+1]
+                if (' ' in value_part or any(c in value_part for c in ['\\', '/', ':'])) and \
+                   not value_part.startswith("blk.") and \
+                   not value_part.isdigit() and \
                    not (value_part.startswith("(") and value_part.endswith("=CPU")) and \
                    not (value_part.startswith('"') and value_part.endswith('"')):
                     current_arg_part += f' "{value_part}"'
@@ -1865,7 +4360,8 @@ def build_command(model_path: str,
                     model_analysis: dict,
                     session_base_args_dict: dict,
                     current_attempt_level_for_tuning: Optional[int] = None,
-                    manual_gpu_layers_override: Optional[int] = None) -> List[str]:
+                    manual_gpu_layers_override: Optional[int] = None,
+                    vram_budget_mb: Optional[float] = None) -> List[str]:
       current_cmd_args_dict = session_base_args_dict.copy()
       current_cmd_args_dict["--model"] = model_path
       model_analysis_dict = model_analysis if isinstance(model_analysis, dict) else {}
@@ -1942,8 +4438,13 @@ def build_command(model_path: str,
       if quantkv_val is None or (isinstance(quantkv_val, str) and quantkv_val.lower() == 'auto'):
           if "--quantkv" in current_cmd_args_dict: del current_cmd_args_dict["--quantkv"]
           quant_upper, size_b_val = model_analysis_dict.get('quant', 'unknown').upper(), model_analysis_dict.get('size_b', 0)
-          if any(q_str in quant_upper for q_str in ['Q5','Q6','Q8','F16','BF16','K_M','K_L','K_XL']) or \
-             'XL' in quant_upper or \
+          bits_per_weight = model_analysis_dict.get('bits_per_weight')
+          if isinstance(bits_per_weight, (int, float)) and bits_per_weight > 0:
+              # Measured bpw from the tensor table; 4.7 separates Q4_K_M-and-up from Q4_K_S/IQ4 and below
+              high_precision_weights = bits_per_weight >= 4.7
+          else:
+              high_precision_weights = any(q_str in quant_upper for q_str in ['Q5','Q6','Q8','F16','BF16','K_M','K_L','K_XL']) or 'XL' in quant_upper
+          if high_precision_weights or \
              (isinstance(size_b_val, (int,float)) and size_b_val >=30):
               current_cmd_args_dict["--quantkv"] = "1" # Typically Q8_0 for K/V cache
       elif isinstance(quantkv_val, str) and quantkv_val.lower() == 'off':
@@ -1956,11 +4457,15 @@ def build_command(model_path: str,
           size_b_bbs = model_analysis_dict.get('size_b', 0)
           current_cmd_args_dict["--blasbatchsize"] = "128" if model_analysis_dict.get('is_moe',False) else \
                                                  ("256" if isinstance(size_b_bbs,(int,float)) and size_b_bbs > 20 else "512")
+          if vram_budget_mb and vram_budget_mb > 0:
+              # With a VRAM budget, size the batch from its compute buffer instead: the largest batch that still fits
+              fitted_bbs = choose_blasbatchsize(model_analysis_dict, current_cmd_args_dict, vram_budget_mb)
+              if fitted_bbs: current_cmd_args_dict["--blasbatchsize"] = str(fitted_bbs)
       elif isinstance(bbs_val, str) and bbs_val.lower() == 'off':
           if "--blasbatchsize" in current_cmd_args_dict: del current_cmd_args_dict["--blasbatchsize"]
 
       # Boolean flags
-      for flag_key in ["--usecublas", "--usehipblas", "--flashattention", "--nommap", "--lowvram"]:
+      for flag_key in ["--usecublas", "--usehipblas", "--flashattention", "--nommap", "--lowvram", "--useswa"]:
           if flag_key in current_cmd_args_dict and current_cmd_args_dict[flag_key] is False:
               del current_cmd_args_dict[flag_key]
 
@@ -1995,6 +4500,14 @@ def kill_process(pid, force=True):
     except Exception as e:
         return False, f"Error killing process {pid}: {e}"
 
+def kill_process_and_wait(process: subprocess.Popen, timeout: float = 10) -> None:
+    """Kills a launched process and waits for it to exit, so the next launch does not race it for VRAM or the port."""
+    kill_process(process.pid, force=True)
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        pass
+
 def kill_processes_by_name(process_name_pattern, cmdline_substr_filter=None):
     if not psutil_available:
         print(f"Process Cleanup Warning: {psutil_load_error_reason or 'Psutil not available.'}")
@@ -2201,6 +4714,969 @@ def validate_and_resolve_koboldcpp_exe_path(exe_path_input: str) -> Tuple[Option
     return None, f"KoboldCpp target '{exe_path_input}' (resolved to '{potential_abs_path}') not found, not executable, not in PATH, or not a valid relative script."
 
 
+# --- Headless Launch Probe ---
+def probe_koboldcpp_launch(executable_path: str, args_list: List[str], current_config: Optional[Dict] = None,
+                           keep_running: bool = False, stop_event: Optional[threading.Event] = None,
+                           output_callback=None, outcome_suffix: str = "") -> Dict[str, Any]:
+    """
+    Launches KoboldCpp without a UI and watches its output the way the tuning monitor does: the success
+    pattern on the expected port, OOM keywords, early exit or the loading timeout. On success it waits for
+    VRAM to settle and measures KoboldCpp's VRAM use. The process is killed afterwards unless keep_running
+    is set and the load succeeded; the caller then owns result['process'].
+    """
+    effective_config = current_config if current_config else DEFAULT_CONFIG_TEMPLATE.copy()
+    success_pattern = effective_config.get("kobold_success_pattern", DEFAULT_CONFIG_TEMPLATE["kobold_success_pattern"])
+    oom_keywords = [k.lower() for k in effective_config.get("oom_error_keywords", DEFAULT_CONFIG_TEMPLATE["oom_error_keywords"])]
+    timeout_s = float(effective_config.get("loading_timeout_seconds", 60))
+    port = str(args_list_to_dict(args_list).get("--port", DEFAULT_CONFIG_TEMPLATE["default_args"]["--port"]))
+    command = get_command_to_run(executable_path, args_list)
+
+    _, _, _, gpu_info_before = get_available_vram_mb(effective_config)
+    vram_at_decision_mb = gpu_info_before.get("free_mb") if gpu_info_before.get("success") else None
+    process, launch_error = launch_process(command, capture_output=True, new_console=False, use_text_mode=False)
+    result: Dict[str, Any] = {"success": False, "outcome": "LAUNCH_FAILED_SETUP" + outcome_suffix, "process": None, "port": port,
+                              "command": command, "vram_at_decision_mb": vram_at_decision_mb, "approx_vram_used_kcpp_mb": None,
+                              "gpu_name": gpu_info_before.get("name"), "output_tail": [], "message": launch_error or ""}
+    if launch_error or not process:
+        result["message"] = f"Launch failed: {launch_error or 'Unknown error'}"
+        return result
+
+    output_lines: List[str] = []
+    success_event, oom_event = threading.Event(), threading.Event()
+
+    def read_output():
+        try:
+            for line_bytes in iter(process.stdout.readline, b''):
+                line = line_bytes.decode('utf-8', errors='replace').strip()
+                if not line:
+                    continue
+                output_lines.append(line)
+                if output_callback:
+                    output_callback(line)
+                match = re.search(success_pattern, line, re.IGNORECASE)
+                if match and (not match.groups() or str(match.group(1)) == port):
+                    success_event.set()
+                    return
+                if any(keyword in line.lower() for keyword in oom_keywords):
+                    oom_event.set()
+                    return
+        except (ValueError, OSError):
+            pass  # Pipe closed after the process was killed
+
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+    start_time = time.monotonic()
+    while True:
+        if success_event.is_set():
+            outcome = "SUCCESS_LOAD_DETECTED"
+            break
+        if oom_event.is_set():
+            outcome = "OOM_CRASH_DETECTED"
+            break
+        if stop_event is not None and stop_event.is_set():
+            outcome = "USER_STOPPED_MONITORING"
+            break
+        if process.poll() is not None:
+            reader.join(timeout=1.0)  # Let the reader drain what the process printed before exiting
+            outcome = "SUCCESS_LOAD_DETECTED" if success_event.is_set() else ("OOM_CRASH_DETECTED" if oom_event.is_set() else "PREMATURE_EXIT")
+            break
+        if time.monotonic() - start_time > timeout_s:
+            outcome = "TIMEOUT_NO_SIGNAL"
+            break
+        time.sleep(0.25)
+
+    if outcome == "SUCCESS_LOAD_DETECTED":
+        time.sleep(max(2.0, float(effective_config.get("vram_stabilization_wait_s", 3.0))))
+        _, _, _, gpu_info_after = get_available_vram_mb(effective_config)
+        if vram_at_decision_mb is not None and gpu_info_after.get("success") and gpu_info_after.get("total_mb", 0) > 0:
+            result["approx_vram_used_kcpp_mb"] = max(0.0, min(vram_at_decision_mb - gpu_info_after.get("free_mb", 0.0), gpu_info_after["total_mb"]))
+            tight = gpu_info_after.get("free_mb_budgeted", 0.0) < float(effective_config.get("min_vram_free_after_load_success_mb", 512))
+            outcome = "SUCCESS_LOAD_VRAM_TIGHT" if tight else "SUCCESS_LOAD_VRAM_OK"
+        else:
+            outcome = "SUCCESS_LOAD_NO_VRAM_CHECK"
+        result["success"] = True
+
+    if not (keep_running and result["success"]):
+        kill_process_and_wait(process)
+    else:
+        result["process"] = process
+    result["outcome"] = outcome + outcome_suffix
+    result["output_tail"] = output_lines[-20:]
+    used_text = f", ~{result['approx_vram_used_kcpp_mb']:.0f} MiB VRAM used" if result["approx_vram_used_kcpp_mb"] is not None else ""
+    result["message"] = f"Probe: {outcome}{used_text} after {time.monotonic() - start_time:.0f}s"
+    return result
+
+
+# --- Throughput Benchmark ---
+# Fixed prompt (a few hundred tokens) so prompt-processing numbers are comparable between launches
+BENCHMARK_PROMPT = ("The following is a detailed log kept by the keeper of a remote lighthouse. " * 12
+                    + "\nContinue the log with the events of the next stormy night:\n")
+BENCHMARK_MAX_TOKENS = 64
+BENCHMARK_REPEATS = 3
+
+
+def _kobold_generate_once(base_url: str, prompt: str, max_tokens: int, timeout_s: float) -> Dict[str, Any]:
+    """One /api/v1/generate request plus KoboldCpp's /api/extra/perf timings for it (wall clock if perf is unavailable)."""
+    payload = {"prompt": prompt, "max_length": int(max_tokens), "temperature": 0.7, "rep_pen": 1.1,
+               "sampler_seed": 1234, "bypass_eos": True}
+    request = urllib.request.Request(f"{base_url}/api/v1/generate", data=json.dumps(payload).encode('utf-8'),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=timeout_s) as response:
+        json.loads(response.read().decode('utf-8'))
+    elapsed = time.perf_counter() - start
+    run = {"wall_seconds": elapsed, "generated_tokens": max_tokens, "gen_tokens_per_second": max_tokens / elapsed if elapsed > 0 else 0.0,
+           "prompt_tokens_per_second": None, "ttft_seconds": None, "source": "wall clock"}
+    try:
+        with urllib.request.urlopen(f"{base_url}/api/extra/perf", timeout=10) as response:
+            perf = json.loads(response.read().decode('utf-8'))
+    except (urllib.error.URLError, OSError, ValueError):
+        return run
+    generated, eval_seconds, process_seconds = perf.get("last_token_count"), perf.get("last_eval"), perf.get("last_process")
+    if generated and eval_seconds:
+        run.update(generated_tokens=generated, gen_tokens_per_second=generated / eval_seconds, source="perf")
+        if process_seconds is not None:
+            run["ttft_seconds"] = process_seconds + eval_seconds / generated  # Prompt processing plus the first sampled token
+    if perf.get("last_input_count") and process_seconds:
+        run["prompt_tokens_per_second"] = perf["last_input_count"] / process_seconds
+    return run
+
+
+def _median(values: List[float]) -> Optional[float]:
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def benchmark_koboldcpp(port: Any, repeats: int = BENCHMARK_REPEATS, max_tokens: int = BENCHMARK_MAX_TOKENS,
+                        prompt: Optional[str] = None, host: str = "localhost", timeout_s: float = 300.0,
+                        warmup: bool = True) -> Dict[str, Any]:
+    """
+    Sends the fixed benchmark prompt to a running KoboldCpp instance repeats times (after an uncounted
+    warm-up) and reports the median prompt-processing t/s, generation t/s and time to first token.
+    """
+    base_url = f"http://{host}:{port}"
+    prompt = BENCHMARK_PROMPT if prompt is None else prompt
+    runs = []
+    try:
+        if warmup:
+            _kobold_generate_once(base_url, prompt, 8, timeout_s)
+        for _ in range(max(1, repeats)):
+            runs.append(_kobold_generate_once(base_url, prompt, max_tokens, timeout_s))
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        if not runs:
+            return {"success": False, "message": f"Benchmark request failed: {e}"}
+    result = {
+        "success": True, "repeats": len(runs), "runs": runs, "source": runs[-1]["source"],
+        "gen_tokens_per_second": _median([run["gen_tokens_per_second"] for run in runs]),
+        "prompt_tokens_per_second": _median([run["prompt_tokens_per_second"] for run in runs]),
+        "ttft_seconds": _median([run["ttft_seconds"] for run in runs]),
+    }
+    parts = [f"generation {result['gen_tokens_per_second']:.1f} t/s"]
+    if result["prompt_tokens_per_second"] is not None:
+        parts.append(f"prompt {result['prompt_tokens_per_second']:.0f} t/s")
+    if result["ttft_seconds"] is not None:
+        parts.append(f"TTFT {result['ttft_seconds']:.2f}s")
+    result["message"] = f"Benchmark (median of {len(runs)}, {result['source']}): " + ", ".join(parts)
+    return result
+
+
+def save_benchmark_to_db(db_file: str, model_filepath: str, vram_at_decision_mb, command_args_list_with_exe,
+                         attempt_level: int, benchmark: Dict[str, Any]) -> Tuple[bool, str]:
+    """Stores benchmark_koboldcpp results on the launch_history row of that launch (same key save_config_to_db uses)."""
+    if not benchmark.get("success"):
+        return False, "No benchmark results to save."
+    conn = None
+    try:
+        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        vram_at_decision_mb_int = int(vram_at_decision_mb) if vram_at_decision_mb is not None else None
+        cursor = conn.execute("""
+            UPDATE launch_history SET bench_gen_tps = ?, bench_prompt_tps = ?, bench_ttft_s = ?
+            WHERE model_filepath = ?
+              AND (vram_at_launch_decision_mb = ? OR (vram_at_launch_decision_mb IS NULL AND ? IS NULL))
+              AND kobold_args_json = ? AND attempt_level_used = ?
+        """, (benchmark["gen_tokens_per_second"], benchmark["prompt_tokens_per_second"], benchmark["ttft_seconds"],
+              model_filepath, vram_at_decision_mb_int, vram_at_decision_mb_int,
+              _args_json_for_db(command_args_list_with_exe), attempt_level))
+        conn.commit()
+        if cursor.rowcount == 0:
+            return False, "Benchmark not saved: no matching launch record."
+        return True, "Saved benchmark results with the launch record."
+    except sqlite3.Error as e:
+        return False, f"Could not save benchmark results: {e}"
+    finally:
+        if conn:
+            conn.close()
+
+
+# --- Context Size Search ---
+CONTEXT_SEARCH_STEP = 1024
+CONTEXT_SEARCH_MAX_DEFAULT = 131072  # Upper bound when the GGUF does not state its training context
+
+
+def context_size_search_bounds(model_analysis: dict, args_dict: dict, vram_budget_mb: Optional[float],
+                               step: int = CONTEXT_SEARCH_STEP) -> Dict[str, Any]:
+    """
+    Bounds for the context search from the KV calculator: the largest multiple of step whose estimated
+    VRAM (weights + KV + compute for the fixed offload plan) fits vram_budget_mb, capped at the model's
+    training context. The upper bound adds a quarter (at least one step) of headroom for estimator error.
+    """
+    trained = model_analysis.get('context_length_trained') or CONTEXT_SEARCH_MAX_DEFAULT
+    ceiling = max(step, (int(trained) // step) * step)
+    if vram_budget_mb is None:
+        return {"low": step, "high": ceiling, "estimated_max": None}
+
+    def fits(context: int) -> bool:
+        estimate = estimate_vram_usage_for_args(model_analysis, dict(args_dict, **{"--contextsize": str(context)}))
+        return not estimate.get("success") or estimate["total_bytes"] <= vram_budget_mb * 1024 * 1024
+    low, high = 0, ceiling // step
+    while low < high:
+        mid = (low + high + 1) // 2
+        if fits(mid * step):
+            low = mid
+        else:
+            high = mid - 1
+    estimated_max = low * step
+    headroom = max(step, (estimated_max // 4 // step) * step)
+    return {"low": step, "high": min(ceiling, estimated_max + headroom), "estimated_max": estimated_max or None}
+
+
+def search_max_context_size(executable_path: str, model_analysis: dict, args_list: List[str], current_config: Optional[Dict] = None,
+                            min_tokens_per_second: float = 0.0, step: int = CONTEXT_SEARCH_STEP,
+                            vram_budget_mb: Optional[float] = None, progress_callback=None,
+                            stop_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Binary-searches the largest --contextsize (a multiple of step) that loads with the fixed offload plan in
+    args_list and, when min_tokens_per_second is set, still generates at least that fast. Bounds come from
+    context_size_search_bounds; every candidate is confirmed by a real launch (probe_koboldcpp_launch).
+    """
+    args_dict = args_list_to_dict(args_list)
+    bounds = context_size_search_bounds(model_analysis, args_dict, vram_budget_mb, step)
+    low, high = bounds["low"] // step, bounds["high"] // step
+    probes: List[Dict[str, Any]] = []
+    best: Optional[Dict[str, Any]] = None
+    if progress_callback:
+        progress_callback(f"Context search: {low * step}..{high * step}" + (f" (KV estimate ~{bounds['estimated_max']})" if bounds["estimated_max"] else ""))
+
+    def try_context(context: int) -> bool:
+        nonlocal best
+        probe_args = args_dict_to_list(dict(args_dict, **{"--contextsize": str(context)}))
+        probe = probe_koboldcpp_launch(executable_path, probe_args, current_config, keep_running=min_tokens_per_second > 0,
+                                       stop_event=stop_event, outcome_suffix="_CTX_SEARCH")
+        tokens_per_second = None
+        if probe["success"] and probe["process"] is not None:
+            speed = benchmark_koboldcpp(probe["port"], repeats=1)
+            tokens_per_second = speed["gen_tokens_per_second"] if speed.get("success") else None
+            kill_process_and_wait(probe["process"])
+        ok = probe["success"] and (min_tokens_per_second <= 0 or (tokens_per_second or 0.0) >= min_tokens_per_second)
+        probes.append({"context": context, "outcome": probe["outcome"], "tokens_per_second": tokens_per_second,
+                       "approx_vram_used_kcpp_mb": probe["approx_vram_used_kcpp_mb"], "ok": ok})
+        if progress_callback:
+            speed_text = f", {tokens_per_second:.1f} t/s" if tokens_per_second is not None else ""
+            progress_callback(f"  --contextsize {context}: {probe['outcome']}{speed_text} -> {'ok' if ok else 'too big'}")
+        if ok and (best is None or context > best["context"]):
+            best = probes[-1]
+        return ok
+
+    # The lower bound must work too, otherwise there is nothing to maximize
+    if not try_context(low * step):
+        return {"success": False, "probes": probes, "bounds": bounds,
+                "message": f"Context search: even --contextsize {low * step} fails with this offload plan."}
+    while low < high and not (stop_event is not None and stop_event.is_set()):
+        mid = (low + high + 1) // 2
+        if try_context(mid * step):
+            low = mid
+        else:
+            high = mid - 1
+    speed_text = f" at {best['tokens_per_second']:.1f} t/s" if best.get("tokens_per_second") is not None else ""
+    return {"success": True, "max_context": best["context"], "tokens_per_second": best.get("tokens_per_second"),
+            "approx_vram_used_kcpp_mb": best.get("approx_vram_used_kcpp_mb"), "probes": probes, "bounds": bounds,
+            "min_tokens_per_second": min_tokens_per_second, "args": args_dict_to_list(dict(args_dict, **{"--contextsize": str(best["context"])})),
+            "message": f"Context search: max --contextsize {best['context']}{speed_text} after {len(probes)} launches"}
+
+
+def save_context_size_limit(db_file: str, model_analysis: dict, gpu_name: Optional[str], search_result: Dict[str, Any]) -> Tuple[bool, str]:
+    """Stores a search_max_context_size result as the maximum for this model on this GPU (replacing an older one)."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        conn.execute("""
+            INSERT OR REPLACE INTO context_size_limits
+            (model_key, model_filepath, gpu_name, max_context, min_tokens_per_second, tokens_per_second,
+             approx_vram_used_kcpp_mb, kobold_args_json, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (model_analysis.get('fingerprint') or model_analysis.get('filepath'), model_analysis.get('filepath'), gpu_name or "",
+              search_result["max_context"], search_result.get("min_tokens_per_second", 0.0), search_result.get("tokens_per_second"),
+              search_result.get("approx_vram_used_kcpp_mb"), json.dumps(search_result.get("args", [])), datetime.now(timezone.utc)))
+        conn.commit()
+        return True, f"Saved max --contextsize {search_result['max_context']} for this model on {gpu_name or 'this GPU'}."
+    except sqlite3.Error as e:
+        return False, f"Could not save context size limit: {e}"
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_context_size_limit(db_file: str, model_analysis: dict, gpu_name: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The stored context search result for this model on this GPU, or None."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        row = conn.execute("""
+            SELECT max_context, min_tokens_per_second, tokens_per_second, approx_vram_used_kcpp_mb, kobold_args_json, timestamp
+            FROM context_size_limits WHERE model_key = ? AND gpu_name = ?
+        """, (model_analysis.get('fingerprint') or model_analysis.get('filepath'), gpu_name or "")).fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        if conn:
+            conn.close()
+    if not row:
+        return None
+    return {"max_context": row[0], "min_tokens_per_second": row[1], "tokens_per_second": row[2],
+            "approx_vram_used_kcpp_mb": row[3], "args": json.loads(row[4]) if row[4] else [], "timestamp": row[5]}
+
+
+# --- Unattended Autotuner ---
+AUTOTUNE_OUTCOME_SUFFIX = "_AUTOTUNE"
+AUTOTUNE_BEST_SUFFIX = "_MARKED_AS_BEST_AUTOTUNE"  # Ranked like a user's "mark as best" by find_best_historical_config
+
+
+def _autotune_probe_is_feasible(outcome: str) -> bool:
+    # OOM, crashes, early exits, timeouts and VRAM_TIGHT all mean "too much on GPU"; without a VRAM reading a clean load counts
+    return outcome.startswith("SUCCESS_LOAD_VRAM_OK") or outcome.startswith("SUCCESS_LOAD_NO_VRAM_CHECK")
+
+
+def planned_offload_from_history(historical_config: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    The exact --overridetensors / --gpulayers of an autotune winner found by find_best_historical_config,
+    shaped like a planned offload so a tuning session launches it verbatim. The OT level stored with the row
+    is only the nearest coarse level of a dial rung; None for other outcomes or rows without args.
+    """
+    if not historical_config or not historical_config.get("outcome", "").endswith(AUTOTUNE_BEST_SUFFIX):
+        return None
+    args_dict = args_list_to_dict(historical_config.get("args_list") or [])
+    if not args_dict:
+        return None
+    override_str = args_dict.get("--overridetensors")
+    override_str = override_str if isinstance(override_str, str) else ""
+    try:
+        gpu_layers = int(args_dict["--gpulayers"]) if isinstance(args_dict.get("--gpulayers"), str) else None
+    except ValueError:
+        gpu_layers = None
+    layers_text = "auto" if gpu_layers is None else str(gpu_layers)
+    return {"override_tensors": override_str, "gpu_layers": gpu_layers,
+            "message": (f"Autotune best from history: --gpulayers {layers_text}, "
+                        + (f"--overridetensors {override_str}" if override_str else "no tensor overrides"))}
+
+
+def build_autotune_candidates(model_path: str, model_analysis: dict, session_args: dict,
+                              offload_ladder: Optional[Dict[str, Any]] = None, level_ladder: Optional[Dict[str, Any]] = None,
+                              vram_budget_mb: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    The plan ladder the autotuner bisects, ordered from most GPU to most CPU: the offload dial's rungs when
+    there is one (GGUF tensor table available), otherwise the OT levels. Each candidate carries its built
+    KoboldCpp args, OT level (for history) and predicted GPU bytes.
+    """
+    candidates = []
+    if offload_ladder and offload_ladder.get("rungs"):
+        for index in range(len(offload_ladder["rungs"])):
+            rung = get_offload_ladder_rung(model_analysis, offload_ladder, index)
+            level = get_level_from_overridetensors(rung["override_tensors"], model_analysis)
+            args_list = build_command(model_path, rung["override_tensors"], model_analysis, session_args,
+                                      current_attempt_level_for_tuning=level, manual_gpu_layers_override=rung["gpu_layers"],
+                                      vram_budget_mb=vram_budget_mb)
+            candidates.append({"label": f"dial {index}", "level": level, "args": args_list, "plan": rung,
+                               "predicted_gpu_bytes": rung["predicted_gpu_bytes"]})
+        return candidates
+    levels = (level_ladder or {}).get("levels", {})
+    for level in sorted(levels):
+        entry = levels[level]
+        candidates.append({"label": f"level {level}", "level": level, "args": entry["args"], "plan": None,
+                           "predicted_gpu_bytes": entry.get("predicted_gpu_bytes")})
+    return candidates
+
+
+def autotune_offload(executable_path: str, model_path: str, model_analysis: dict, candidates: List[Dict[str, Any]],
+                     db_file: str, current_config: Optional[Dict] = None, vram_budget_mb: Optional[float] = None,
+                     progress_callback=None, stop_event: Optional[threading.Event] = None,
+                     warm_start: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Headless tuning: finds the most GPU-heavy feasible candidate (SUCCESS_LOAD_VRAM_OK) by real launches,
+    assuming feasibility only improves towards CPU. The first probe is the most GPU-heavy candidate predicted
+    to fit vram_budget_mb (the learned VRAM predictor when trained, else the static estimate); from there
+    it gallops (1, 2, 4, ... rungs) until the outcome flips and bisects the bracket, so a good estimate
+    costs a handful of launches and a bad one O(log n). With a successful find_similar_tuned_models result the
+    first probe is instead the candidate closest to the neighbours' GPU weight bytes. Every probe is recorded
+    in launch_history and the winner is re-saved with AUTOTUNE_BEST_SUFFIX.
+    """
+    if not candidates:
+        return {"success": False, "probes": [], "message": "Autotune: no plans to try."}
+    probes: List[Dict[str, Any]] = []
+    feasible_cache: Dict[int, bool] = {}
+    probe_results: Dict[int, Dict[str, Any]] = {}
+    stopped = False
+
+    def report(text: str):
+        if progress_callback:
+            progress_callback(text)
+
+    def feasible(index: int) -> bool:
+        nonlocal stopped
+        if index in feasible_cache:
+            return feasible_cache[index]
+        candidate = candidates[index]
+        report(f"Autotune probe {len(probes) + 1}: {candidate['label']} (OT level {candidate['level']})...")
+        probe = probe_koboldcpp_launch(executable_path, candidate["args"], current_config, stop_event=stop_event,
+                                       outcome_suffix=AUTOTUNE_OUTCOME_SUFFIX)
+        if probe["outcome"].startswith("USER_STOPPED"):
+            stopped = True
+        else:
+            save_config_to_db(db_file, model_path, model_analysis, probe["vram_at_decision_mb"], probe["command"],
+                              candidate["level"], probe["outcome"], probe["approx_vram_used_kcpp_mb"], gpu_name=probe.get("gpu_name"))
+        ok = not stopped and _autotune_probe_is_feasible(probe["outcome"])
+        feasible_cache[index], probe_results[index] = ok, probe
+        probes.append({"index": index, "label": candidate["label"], "level": candidate["level"], "outcome": probe["outcome"],
+                       "approx_vram_used_kcpp_mb": probe["approx_vram_used_kcpp_mb"], "feasible": ok})
+        used_text = f", ~{probe['approx_vram_used_kcpp_mb']:.0f} MiB" if probe["approx_vram_used_kcpp_mb"] is not None else ""
+        report(f"  -> {probe['outcome']}{used_text}: {'feasible' if ok else 'too much GPU'}")
+        return ok
+
+    # Starting point: the most GPU-heavy candidate the predictors expect to fit
+    start = 0
+    if warm_start and warm_start.get("success"):
+        for index, candidate in enumerate(candidates):
+            estimate = estimate_vram_usage_for_args(model_analysis, args_list_to_dict(candidate["args"]))
+            start = index
+            if estimate.get("success") and estimate["weights_bytes"] <= warm_start["target_gpu_weight_bytes"]:
+                break
+        report(f"Autotune starts at {candidates[start]['label']} from similar tuned models.")
+    elif vram_budget_mb is not None:
+        predictor = train_vram_predictor(db_file, _last_detected_gpu_name)
+        for index, candidate in enumerate(candidates):
+            predicted_mb = candidate["predicted_gpu_bytes"] / (1024 * 1024) if candidate.get("predicted_gpu_bytes") is not None else None
+            if predictor.get("success"):
+                prediction = predict_vram_for_args(predictor, model_analysis, args_list_to_dict(candidate["args"]))
+                predicted_mb = prediction["upper_mb"] if prediction.get("success") else predicted_mb
+            if predicted_mb is not None and predicted_mb <= vram_budget_mb:
+                start = index
+                break
+        else:
+            start = len(candidates) - 1
+
+    # Gallop to bracket the boundary: low = known infeasible (or -1), high = known feasible (or len)
+    last = len(candidates) - 1
+    if feasible(start):
+        low, high, step = -1, start, 1
+        while high > 0 and not stopped:
+            probe_index = max(0, high - step)
+            if feasible(probe_index):
+                high = probe_index
+                if probe_index == 0:
+                    break
+            else:
+                low = probe_index
+                break
+            step *= 2
+    else:
+        low, high, step = start, len(candidates), 1
+        while low < last and not stopped:
+            probe_index = min(last, low + step)
+            if feasible(probe_index):
+                high = probe_index
+                break
+            low = probe_index
+            step *= 2
+    while high - low > 1 and not stopped:
+        mid = (low + high) // 2
+        if feasible(mid):
+            high = mid
+        else:
+            low = mid
+
+    if stopped or high >= len(candidates) or high not in probe_results:
+        reason = "stopped by user" if stopped else "no plan on the ladder loaded within the VRAM limits"
+        return {"success": False, "probes": probes, "launches": len(probes), "stopped": stopped,
+                "message": f"Autotune: {reason} after {len(probes)} launches."}
+    best, best_probe = candidates[high], probe_results[high]
+    save_config_to_db(db_file, model_path, model_analysis, best_probe["vram_at_decision_mb"], best_probe["command"],
+                      best["level"], best_probe["outcome"] + AUTOTUNE_BEST_SUFFIX, best_probe["approx_vram_used_kcpp_mb"],
+                      gpu_name=best_probe.get("gpu_name"))
+    return {"success": True, "best": best, "best_index": high, "best_outcome": best_probe["outcome"], "probes": probes,
+            "launches": len(probes),
+            "message": (f"Autotune: {best['label']} (OT level {best['level']}) is the most GPU-heavy plan that loads cleanly "
+                        f"({len(probes)} launches); marked as best in history")}
+
+
+# --- Runtime Parameter Search ---
+PARAM_SEARCH_OUTCOME_SUFFIX = "_PARAM_SEARCH"
+PARAM_SEARCH_KEYS = ("--threads", "--blasbatchsize", "--quantkv", "--flashattention")
+PARAM_SEARCH_BLAS_BATCH_SIZES = (128, 256, 512, 1024)
+PARAM_SEARCH_ATTENTION_MODES = ((False, 0), (True, 0), (True, 1), (True, 2))  # (--flashattention, --quantkv)
+PARAM_SEARCH_ETA = 3  # Successive halving keeps the best 1/eta of each round
+PARAM_SEARCH_BASE_TOKENS = 32  # Generation length of round 0; every later round generates eta times more
+_PARAM_SEARCH_PLAN_KEYS = ("--overridetensors", "--gpulayers", "--contextsize", "--tensor_split")
+
+
+def param_search_thread_candidates() -> List[int]:
+    """--threads values worth benchmarking: half, all-but-one and all performance cores, plus all logical CPUs with SMT."""
+    topology = get_cpu_topology()
+    performance_cores, logical = topology["performance_cores"], topology["logical_cpus"]
+    candidates = {max(1, performance_cores // 2), max(1, performance_cores - 1), performance_cores}
+    if topology["smt"] or topology["efficiency_cores"]:
+        candidates.add(logical)
+    return sorted(candidates)
+
+
+def _cpu_key() -> str:
+    info = get_system_info()
+    return f"{info.get('cpu_model', 'Unknown')}|{info.get('cpu_cores_logical', 'N/A')}"
+
+
+def runtime_hardware_key(gpu_name: Optional[str] = None) -> str:
+    """Identifies 'identical hardware' for stored search results: CPU model, logical CPU count and GPU name."""
+    return f"{_cpu_key()}|{gpu_name or ''}"
+
+
+def _param_search_plan_key(args_dict: dict) -> str:
+    return json.dumps({key: str(args_dict[key]) for key in _PARAM_SEARCH_PLAN_KEYS if key in args_dict}, sort_keys=True)
+
+
+def _param_search_params_key(params: dict) -> str:
+    return json.dumps({key: params.get(key) for key in PARAM_SEARCH_KEYS}, sort_keys=True)
+
+
+def apply_runtime_params(args_dict: dict, params: dict) -> dict:
+    """args_dict with the searched knobs replaced; --flashattention False drops the flag."""
+    applied = dict(args_dict)
+    for key in PARAM_SEARCH_KEYS:
+        if key in params:
+            applied[key] = params[key]
+    if not _arg_as_bool(applied, "--flashattention"):
+        applied.pop("--flashattention", None)
+    return applied
+
+
+def build_param_search_grid(model_analysis: dict, args_dict: dict, vram_budget_mb: Optional[float] = None,
+                            thread_candidates: Optional[List[int]] = None,
+                            attention_params: Optional[dict] = None) -> List[Dict[str, Any]]:
+    """
+    One stage of the runtime parameter search for a fixed offload plan. Without attention_params: the
+    (--flashattention, --quantkv) modes at the plan's --threads and --blasbatchsize. With attention_params
+    (the first stage's winner): --threads x --blasbatchsize under that mode. Combinations whose estimated
+    VRAM (larger batches grow the compute buffer, unquantized KV grows the cache) exceeds vram_budget_mb
+    are left out. The plan's current setting is always the first entry.
+    """
+    threads = thread_candidates or param_search_thread_candidates()
+    current = {"--threads": str(args_dict.get("--threads", threads[-1])),
+               "--blasbatchsize": str(_arg_as_int(args_dict, "--blasbatchsize", KOBOLDCPP_DEFAULT_BLAS_BATCH_SIZE)),
+               "--quantkv": str(_arg_as_int(args_dict, "--quantkv", 0) or 0),
+               "--flashattention": _arg_as_bool(args_dict, "--flashattention")}
+    if attention_params:
+        current.update({key: attention_params[key] for key in ("--quantkv", "--flashattention")})
+        candidates = [dict(current, **{"--blasbatchsize": str(batch_size), "--threads": str(thread_count)})
+                      for batch_size in PARAM_SEARCH_BLAS_BATCH_SIZES for thread_count in threads]
+    else:
+        candidates = [dict(current, **{"--quantkv": str(quantkv), "--flashattention": flash_attention})
+                      for flash_attention, quantkv in PARAM_SEARCH_ATTENTION_MODES]
+    grid, seen, fits_by_memory = [current], {_param_search_params_key(current)}, {}
+    for params in candidates:
+        if _param_search_params_key(params) in seen:
+            continue
+        memory_key = (params["--blasbatchsize"], params["--quantkv"], params["--flashattention"])  # --threads costs no VRAM
+        if memory_key not in fits_by_memory:
+            estimate = estimate_vram_usage_for_args(model_analysis, apply_runtime_params(args_dict, params)) if vram_budget_mb is not None else {}
+            fits_by_memory[memory_key] = not estimate.get("success") or estimate["total_bytes"] <= vram_budget_mb * 1024 * 1024
+        if fits_by_memory[memory_key]:
+            seen.add(_param_search_params_key(params))
+            grid.append(params)
+    return grid
+
+
+def _successive_halving_launches(config_count: int, eta: int) -> int:
+    launches = 0
+    while config_count > 1:
+        launches += config_count
+        config_count //= eta
+    return launches or config_count
+
+
+def estimate_param_search_launches(model_analysis: dict, args_dict: dict, vram_budget_mb: Optional[float] = None,
+                                   eta: int = PARAM_SEARCH_ETA) -> int:
+    """KoboldCpp launches search_runtime_params needs when every config loads (the second stage sized for the plan's attention mode)."""
+    eta = max(2, int(eta))
+    attention_grid = build_param_search_grid(model_analysis, args_dict, vram_budget_mb)
+    threads_grid = build_param_search_grid(model_analysis, args_dict, vram_budget_mb, attention_params=attention_grid[0])
+    return _successive_halving_launches(len(attention_grid), eta) + _successive_halving_launches(len(threads_grid), eta)
+
+
+def describe_runtime_params(params: dict) -> str:
+    attention = f"FA on, quantkv {params.get('--quantkv')}" if params.get("--flashattention") else "FA off"
+    return f"--threads {params.get('--threads')}, --blasbatchsize {params.get('--blasbatchsize')}, {attention}"
+
+
+def _save_param_search_result(db_file: str, keys: Tuple[str, str, str], search_id: str, params: dict, search_round: int,
+                              outcome: str, benchmark: Optional[Dict[str, Any]]):
+    conn = None
+    benchmark = benchmark if benchmark and benchmark.get("success") else {}
+    try:
+        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        conn.execute("""
+            INSERT OR REPLACE INTO runtime_param_results
+            (hardware_key, model_key, plan_key, search_id, params_json, search_round, launch_outcome, gen_tps, prompt_tps, ttft_s,
+             completed, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?)
+        """, (*keys, search_id, _param_search_params_key(params), search_round, outcome, benchmark.get("gen_tokens_per_second"),
+              benchmark.get("prompt_tokens_per_second"), benchmark.get("ttft_seconds"), datetime.now(timezone.utc)))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Warning: could not save parameter search result: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def _finish_param_search(db_file: str, keys: Tuple[str, str, str], search_id: str, completed: bool):
+    """A finished search replaces older grids for the plan; a stopped or failed one is dropped and the old optimum stays."""
+    conn = None
+    try:
+        conn = sqlite3.connect(db_file)
+        if completed:
+            conn.execute("UPDATE runtime_param_results SET completed = 1 WHERE search_id = ?", (search_id,))
+            conn.execute("DELETE FROM runtime_param_results WHERE hardware_key = ? AND model_key = ? AND plan_key = ? AND search_id != ?",
+                         (*keys, search_id))
+        else:
+            conn.execute("DELETE FROM runtime_param_results WHERE search_id = ?", (search_id,))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Warning: could not finish parameter search results: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_runtime_param_optimum(db_file: str, model_analysis: dict, gpu_name: Optional[str] = None,
+                              args_dict: Optional[dict] = None) -> Optional[Dict[str, Any]]:
+    """
+    The stored winner of a finished search_runtime_params run for this model on this hardware: the fastest
+    config of its last halving round. With args_dict only results for the same offload plan count.
+    """
+    conn = None
+    latest_search = "SELECT search_id FROM runtime_param_results WHERE hardware_key = ? AND model_key = ? AND completed = 1"
+    params = [runtime_hardware_key(gpu_name), model_analysis.get('fingerprint') or model_analysis.get('filepath')]
+    if args_dict is not None:
+        latest_search += " AND plan_key = ?"
+        params.append(_param_search_plan_key(args_dict))
+    try:
+        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        row = conn.execute(f"""
+            SELECT params_json, search_round, gen_tps, prompt_tps, ttft_s, plan_key FROM runtime_param_results
+            WHERE search_id = ({latest_search} ORDER BY timestamp DESC LIMIT 1) AND gen_tps IS NOT NULL
+            ORDER BY search_round DESC, gen_tps DESC LIMIT 1
+        """, params).fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        if conn:
+            conn.close()
+    if not row:
+        return None
+    return {"params": json.loads(row[0]), "round": row[1], "gen_tokens_per_second": row[2],
+            "prompt_tokens_per_second": row[3], "ttft_seconds": row[4], "plan_key": row[5]}
+
+
+def search_runtime_params(executable_path: str, model_analysis: dict, args_list: List[str], db_file: str,
+                          current_config: Optional[Dict] = None, vram_budget_mb: Optional[float] = None,
+                          gpu_name: Optional[str] = None, eta: int = PARAM_SEARCH_ETA, reuse_history: bool = True,
+                          progress_callback=None, stop_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Successive halving over --threads, --blasbatchsize, --quantkv and --flashattention for the fixed offload
+    plan in args_list, in two stages: the attention modes at the plan's threads and batch size, then threads x
+    batch size under the winning mode. Each stage launches its configs once with a short benchmark, then keeps
+    the fastest 1/eta (failed loads drop out) and benchmarks them eta times longer, until one is left. Results
+    are stored in runtime_param_results under a search id and count only once the search finishes (which also
+    replaces the plan's older grid), so with reuse_history a repeat on identical hardware returns the stored
+    optimum without launching anything.
+    """
+    args_dict = args_list_to_dict(args_list)
+    keys = (runtime_hardware_key(gpu_name), model_analysis.get('fingerprint') or model_analysis.get('filepath'),
+            _param_search_plan_key(args_dict))
+
+    def report(text: str):
+        if progress_callback:
+            progress_callback(text)
+
+    def stopped() -> bool:
+        return stop_event is not None and stop_event.is_set()
+
+    if reuse_history:
+        known = get_runtime_param_optimum(db_file, model_analysis, gpu_name, args_dict)
+        if known:
+            return {"success": True, "from_history": True, "best": known["params"], "launches": 0,
+                    "gen_tokens_per_second": known["gen_tokens_per_second"],
+                    "args": args_dict_to_list(apply_runtime_params(args_dict, known["params"])),
+                    "message": (f"Parameter search: known optimum on this hardware is {describe_runtime_params(known['params'])} "
+                                f"({known['gen_tokens_per_second']:.1f} t/s); no launches needed")}
+
+    search_id = uuid.uuid4().hex
+    eta = max(2, int(eta))
+    launches, search_round, scores = 0, 0, {}
+
+    def successive_halving(survivors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        nonlocal launches, search_round
+        stage_round = 0
+        while survivors and not stopped():
+            max_tokens = PARAM_SEARCH_BASE_TOKENS * eta ** stage_round
+            report(f"Round {search_round + 1}: {len(survivors)} configurations, {max_tokens} tokens each")
+            for params in survivors:
+                if stopped():
+                    break
+                probe = probe_koboldcpp_launch(executable_path, args_dict_to_list(apply_runtime_params(args_dict, params)), current_config,
+                                               keep_running=True, stop_event=stop_event, outcome_suffix=PARAM_SEARCH_OUTCOME_SUFFIX)
+                launches += 1
+                benchmark = None
+                if probe["success"] and probe["process"] is not None:
+                    benchmark = benchmark_koboldcpp(probe["port"], repeats=1, max_tokens=max_tokens)
+                    kill_process_and_wait(probe["process"])
+                scores[_param_search_params_key(params)] = benchmark["gen_tokens_per_second"] if benchmark and benchmark.get("success") else 0.0
+                if not probe["outcome"].startswith("USER_STOPPED"):
+                    _save_param_search_result(db_file, keys, search_id, params, search_round, probe["outcome"], benchmark)
+                report(f"  {describe_runtime_params(params)}: " + (benchmark["message"] if benchmark and benchmark.get("success") else probe["outcome"]))
+            # Rounds are numbered across both stages, so the second stage's last round holds the overall winner
+            search_round, stage_round = search_round + 1, stage_round + 1
+            ranked = sorted((p for p in survivors if scores.get(_param_search_params_key(p))),
+                            key=lambda p: scores[_param_search_params_key(p)], reverse=True)
+            survivors = ranked[:max(1, len(ranked) // eta)]
+            if len(survivors) <= 1:
+                break
+        return survivors
+
+    report(f"Parameter search: about {estimate_param_search_launches(model_analysis, args_dict, vram_budget_mb, eta)} launches "
+           f"(attention modes first, then threads x batch size), keeping the best 1/{eta} per round.")
+    survivors = successive_halving(build_param_search_grid(model_analysis, args_dict, vram_budget_mb))
+    if survivors and not stopped():
+        report(f"Attention stage winner: {describe_runtime_params(survivors[0])}; searching threads x batch size with it.")
+        survivors = successive_halving(build_param_search_grid(model_analysis, args_dict, vram_budget_mb, attention_params=survivors[0]))
+
+    if stopped():
+        _finish_param_search(db_file, keys, search_id, completed=False)
+        return {"success": False, "launches": launches, "message": f"Parameter search stopped after {launches} launches."}
+    if not survivors:
+        _finish_param_search(db_file, keys, search_id, completed=False)
+        return {"success": False, "launches": launches, "message": f"Parameter search: no configuration loaded and generated ({launches} launches)."}
+    _finish_param_search(db_file, keys, search_id, completed=True)
+    best = survivors[0]
+    best_speed = scores[_param_search_params_key(best)]
+    return {"success": True, "from_history": False, "best": best, "launches": launches, "gen_tokens_per_second": best_speed,
+            "args": args_dict_to_list(apply_runtime_params(args_dict, best)),
+            "message": f"Parameter search: {describe_runtime_params(best)} is fastest ({best_speed:.1f} t/s, {launches} launches)"}
+
+
+# --- CPU Topology & Thread Sweep ---
+THREAD_SWEEP_KNEE_FRACTION = 0.95  # The knee is the fewest threads reaching this share of the best measured speed
+THREAD_SWEEP_ARGS = ("--threads", "--nblas")
+_CPU_SYSFS_ROOT = "/sys/devices/system/cpu"
+
+
+def _read_sysfs(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _parse_cpu_list(text: Optional[str]) -> set:
+    """Parses a sysfs CPU list such as '0-7,16-23'."""
+    cpus = set()
+    for part in (text or "").split(","):
+        part = part.strip()
+        if "-" in part:
+            first, last = part.split("-", 1)
+            if first.isdigit() and last.isdigit():
+                cpus.update(range(int(first), int(last) + 1))
+        elif part.isdigit():
+            cpus.add(int(part))
+    return cpus
+
+
+def get_cpu_topology() -> Dict[str, Any]:
+    """
+    Physical cores, SMT and hybrid performance/efficiency cores. On Linux read from /sys/devices/system/cpu
+    (core ids per package; Intel hybrid CPUs list their P and E CPUs under /sys/devices/cpu_core and cpu_atom,
+    big.LITTLE ARM chips report a lower cpu_capacity for small cores); elsewhere psutil's counts, without E-cores.
+    """
+    logical = (psutil.cpu_count(logical=True) if psutil_available else None) or os.cpu_count() or 4
+    physical = (psutil.cpu_count(logical=False) if psutil_available else None) or logical
+    topology = {"logical_cpus": logical, "physical_cores": physical, "performance_cores": physical,
+                "efficiency_cores": 0, "smt": logical > physical, "sockets": 1, "source": "psutil"}
+    if not os.path.isdir(_CPU_SYSFS_ROOT):
+        return topology
+
+    online = _parse_cpu_list(_read_sysfs(os.path.join(_CPU_SYSFS_ROOT, "online")))
+    cores: Dict[Tuple[str, str], List[int]] = {}
+    capacities: Dict[int, int] = {}
+    for entry in os.listdir(_CPU_SYSFS_ROOT):
+        if not re.fullmatch(r"cpu\d+", entry) or (online and int(entry[3:]) not in online):
+            continue
+        cpu = int(entry[3:])
+        core_id = _read_sysfs(os.path.join(_CPU_SYSFS_ROOT, entry, "topology", "core_id"))
+        package_id = _read_sysfs(os.path.join(_CPU_SYSFS_ROOT, entry, "topology", "physical_package_id"))
+        if core_id is None:
+            continue
+        cores.setdefault((package_id or "0", core_id), []).append(cpu)
+        capacity = _read_sysfs(os.path.join(_CPU_SYSFS_ROOT, entry, "cpu_capacity"))
+        if capacity and capacity.isdigit():
+            capacities[cpu] = int(capacity)
+    if not cores:
+        return topology
+
+    efficiency_cpus = _parse_cpu_list(_read_sysfs("/sys/devices/cpu_atom/cpus"))
+    if not efficiency_cpus and capacities and len(set(capacities.values())) > 1:
+        efficiency_cpus = {cpu for cpu, capacity in capacities.items() if capacity < max(capacities.values())}
+    efficiency_cores = sum(1 for cpus in cores.values() if all(cpu in efficiency_cpus for cpu in cpus))
+    logical_online = sum(len(cpus) for cpus in cores.values())
+    topology.update(logical_cpus=logical_online, physical_cores=len(cores), performance_cores=len(cores) - efficiency_cores,
+                    efficiency_cores=efficiency_cores, smt=logical_online > len(cores),
+                    sockets=len({package for package, _ in cores}), source="sysfs")
+    return topology
+
+
+def describe_cpu_topology(topology: Dict[str, Any]) -> str:
+    hybrid_text = f" ({topology['performance_cores']}P + {topology['efficiency_cores']}E)" if topology["efficiency_cores"] else ""
+    return (f"{topology['physical_cores']} cores{hybrid_text}, {topology['logical_cpus']} threads"
+            f"{' (SMT)' if topology['smt'] else ''}, {topology['sockets']} socket(s) [{topology['source']}]")
+
+
+def plan_is_memory_bound(model_analysis: dict, args_dict: dict) -> bool:
+    # Any weights left on the CPU (tensor overrides or partial --gpulayers) make generation bound by RAM bandwidth
+    num_layers = model_analysis.get('num_layers') or 0
+    gpu_layers = _arg_as_int(args_dict, "--gpulayers", None)
+    return bool(args_dict.get("--overridetensors")) or args_dict.get("--nogpulayers") is True or \
+           (gpu_layers is not None and num_layers and gpu_layers < num_layers)
+
+
+def thread_sweep_candidates(topology: Dict[str, Any], memory_bound: bool = False) -> List[int]:
+    """
+    Thread counts to benchmark from the real topology: performance cores (all, all-but-one, half), all physical
+    cores when there are E-cores, all logical CPUs when there is SMT. CPU-resident expert/FFN weights saturate
+    RAM bandwidth early, so memory-bound plans add a quarter and three quarters of the P-cores.
+    """
+    performance_cores = max(1, topology["performance_cores"])
+    candidates = {performance_cores, max(1, performance_cores - 1), max(1, performance_cores // 2)}
+    if topology["efficiency_cores"]:
+        candidates.add(topology["physical_cores"])
+    if topology["smt"]:
+        candidates.add(topology["logical_cpus"])
+    if memory_bound:
+        candidates.update({max(1, performance_cores // 4), max(1, performance_cores * 3 // 4)})
+    return sorted(candidates)
+
+
+def find_curve_knee(curve: List[Dict[str, Any]], fraction: float = THREAD_SWEEP_KNEE_FRACTION) -> Optional[Dict[str, Any]]:
+    """The point with the fewest threads whose speed reaches fraction of the best point on the curve."""
+    measured = [point for point in curve if point.get("tokens_per_second")]
+    if not measured:
+        return None
+    best_speed = max(point["tokens_per_second"] for point in measured)
+    return min((point for point in measured if point["tokens_per_second"] >= fraction * best_speed), key=lambda point: point["threads"])
+
+
+def sweep_thread_counts(executable_path: str, model_analysis: dict, args_list: List[str], db_file: str,
+                        current_config: Optional[Dict] = None, arg_keys: Tuple[str, ...] = THREAD_SWEEP_ARGS,
+                        candidates: Optional[List[int]] = None, progress_callback=None,
+                        stop_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Benchmarks the fixed offload plan in args_list at each candidate thread count, once per arg in arg_keys:
+    --threads is scored by generation t/s, --nblas (BLAS threads, used for prompt processing) by prompt t/s
+    with --threads pinned to its knee. Each curve's knee is stored per CPU, model and offload plan.
+    """
+    args_dict = args_list_to_dict(args_list)
+    topology = get_cpu_topology()
+    candidates = sorted(set(candidates or thread_sweep_candidates(topology, plan_is_memory_bound(model_analysis, args_dict))))
+    keys = (_cpu_key(), model_analysis.get('fingerprint') or model_analysis.get('filepath'), _param_search_plan_key(args_dict))
+    results: Dict[str, Dict[str, Any]] = {}
+    launches = 0
+
+    def report(text: str):
+        if progress_callback:
+            progress_callback(text)
+
+    report(f"Thread sweep on {describe_cpu_topology(topology)}: {', '.join(str(c) for c in candidates)} threads")
+    for arg_key in arg_keys:
+        speed_key = "prompt_tokens_per_second" if arg_key == "--nblas" else "gen_tokens_per_second"
+        curve = []
+        for thread_count in candidates:
+            if stop_event is not None and stop_event.is_set():
+                return {"success": False, "results": results, "launches": launches, "message": f"Thread sweep stopped after {launches} launches."}
+            probe = probe_koboldcpp_launch(executable_path, args_dict_to_list(dict(args_dict, **{arg_key: str(thread_count)})),
+                                           current_config, keep_running=True, stop_event=stop_event, outcome_suffix="_THREAD_SWEEP")
+            launches += 1
+            benchmark = None
+            if probe["success"] and probe["process"] is not None:
+                benchmark = benchmark_koboldcpp(probe["port"], repeats=2)
+                kill_process_and_wait(probe["process"])
+            speed = benchmark.get(speed_key) if benchmark and benchmark.get("success") else None
+            curve.append({"threads": thread_count, "tokens_per_second": speed, "outcome": probe["outcome"]})
+            report(f"  {arg_key} {thread_count}: " + (f"{speed:.1f} t/s" if speed is not None else probe["outcome"]))
+        knee = find_curve_knee(curve)
+        if knee is None:
+            results[arg_key] = {"success": False, "curve": curve}
+            continue
+        best = max((point for point in curve if point["tokens_per_second"]), key=lambda point: point["tokens_per_second"])
+        results[arg_key] = {"success": True, "curve": curve, "knee": knee["threads"], "knee_tokens_per_second": knee["tokens_per_second"],
+                            "best": best["threads"], "best_tokens_per_second": best["tokens_per_second"]}
+        report(f"  {arg_key} knee: {knee['threads']} threads ({knee['tokens_per_second']:.1f} t/s; best {best['tokens_per_second']:.1f} t/s at {best['threads']})")
+        conn = None
+        try:
+            conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+            conn.execute("""
+                INSERT OR REPLACE INTO thread_sweep_results
+                (cpu_key, model_key, plan_key, arg_key, knee_threads, knee_tps, best_threads, best_tps, curve_json, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (*keys, arg_key, knee["threads"], knee["tokens_per_second"], best["threads"], best["tokens_per_second"],
+                  json.dumps(curve), datetime.now(timezone.utc)))
+            conn.commit()
+        except sqlite3.Error as e:
+            report(f"  Could not save thread sweep result: {e}")
+        finally:
+            if conn:
+                conn.close()
+        if arg_key == "--threads":
+            args_dict["--threads"] = str(knee["threads"])  # Later sweeps (--nblas) run at the --threads knee
+
+    knees = {arg_key: result["knee"] for arg_key, result in results.items() if result.get("success")}
+    if not knees:
+        return {"success": False, "results": results, "launches": launches, "topology": topology,
+                "message": f"Thread sweep: no candidate loaded and generated ({launches} launches)."}
+    return {"success": True, "results": results, "knees": knees, "launches": launches, "topology": topology,
+            "message": "Thread sweep: " + ", ".join(f"{arg_key} {knee}" for arg_key, knee in knees.items()) + f" ({launches} launches)"}
+
+
+def get_thread_sweep_knees(db_file: str, model_analysis: dict, args_dict: Optional[dict] = None) -> Dict[str, int]:
+    """
+    Stored --threads/--nblas knees for this model on this CPU; for args_dict's offload plan only when given, else the latest.
+    Where a tuning session also has a get_runtime_param_optimum, the knee's --threads takes precedence over the optimum's.
+    """
+    conn = None
+    query = "SELECT arg_key, knee_threads FROM thread_sweep_results WHERE cpu_key = ? AND model_key = ?"
+    params = [_cpu_key(), model_analysis.get('fingerprint') or model_analysis.get('filepath')]
+    if args_dict is not None:
+        query += " AND plan_key = ?"
+        params.append(_param_search_plan_key(args_dict))
+    try:
+        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        rows = conn.execute(query + " ORDER BY timestamp ASC", params).fetchall()
+    except sqlite3.Error:
+        return {}
+    finally:
+        if conn:
+            conn.close()
+    return {arg_key: knee for arg_key, knee in rows if knee}  # Newest row per arg wins
+
+
 def initialize_launcher():
     config, config_loaded_ok, config_message = load_config()
     db_success, db_message = init_db(config.get("db_file"))
@@ -130,6 +130,13 @@ class KoboldLauncherGUI(ctk.CTk):
         self.current_tuning_max_level = 0
         self.current_tuning_session_base_args = {}
         self.current_tuning_model_analysis = {}
+        self.current_tuning_vram_budget_mb = None  # Total VRAM budget used to size auto --blasbatchsize
+        self.current_tuning_planned_offload = None  # Active byte-budget plan; replaces the level's OT/layers until the level is stepped
+        self.current_tuning_warm_start = None  # Nearest tuned models' GPU share when this model has no history
+        self.current_tuning_offload_ladder = None  # GPU-resident MiB dial; More GPU/CPU move along it instead of the OT levels
+        self.current_tuning_level_ladder = None  # Per-level OT string, layers, args and predictions, built once per session args
+        self.autotune_stop_event = None  # Set while the unattended autotuner runs; Stop Current Monitoring sets it
+        self.benchmark_pending_outcome = None  # Outcome whose post-load choices wait for the running benchmark
         self.current_tuning_model_path = None
         self.level_of_last_monitored_run = 0
         self.current_command_list_for_db = []
@@ -256,6 +263,7 @@ class KoboldLauncherGUI(ctk.CTk):
         # These are scheduled to run after the main event loop starts, allowing the GUI to draw first
         self.after(100, self._run_first_time_setup_if_needed)
         self.after(200, self._populate_gpu_id_dropdown_on_startup) # Depends on settings being loaded
+        tensortune_core.start_host_bandwidth_probe() # Off the Tk thread; planners use defaults until it finishes
 
         self.update_save_button_state() # Initial state of save button
 
@@ -435,9 +443,12 @@ class KoboldLauncherGUI(ctk.CTk):
             btn_browse_model = ctk.CTkButton(model_controls_frame, text="Browse", command=lambda: self.browse_model(), width=80)
             btn_browse_model.grid(row=0, column=2, padx=(5, 10), pady=10, sticky="e")
             ToolTip(btn_browse_model, "Select a .gguf model file to load.")
+            btn_model_library = ctk.CTkButton(model_controls_frame, text="Library", command=lambda: self.open_model_library_dialog(), width=80)
+            btn_model_library.grid(row=0, column=3, padx=(0, 10), pady=10, sticky="e")
+            ToolTip(btn_model_library, "Index all .gguf models in the default and last-used GGUF\ndirectories and pick one from a searchable list.")
 
             self.model_info_label = ctk.CTkLabel(model_controls_frame, text="No model selected. Analysis includes: Type, Size, Quant, Layers, Est. VRAM.", justify="left", wraplength=650, font=("Segoe UI", 11))
-            self.model_info_label.grid(row=1, column=0, columnspan=3, padx=10, pady=(0, 10), sticky="w")
+            self.model_info_label.grid(row=1, column=0, columnspan=4, padx=10, pady=(0, 10), sticky="w")
 
             vram_frame = ctk.CTkFrame(self.model_selection_frame)
             vram_frame.grid(row=2, column=0, columnspan=3, padx=10, pady=5, sticky="ew")
@@ -550,6 +561,8 @@ class KoboldLauncherGUI(ctk.CTk):
             self.tuning_ot_regex_label.grid(row=4, column=0, padx=10, pady=1, sticky="ew")
             self.tuning_gpu_layers_label = ctk.CTkLabel(ot_strategy_display_frame, text="GPU Layers: N/A", justify="left", anchor="w")
             self.tuning_gpu_layers_label.grid(row=5, column=0, padx=10, pady=1, sticky="ew")
+            self.tuning_memory_estimate_label = ctk.CTkLabel(ot_strategy_display_frame, text="", justify="left", anchor="w")
+            self.tuning_memory_estimate_label.grid(row=6, column=0, padx=10, pady=1, sticky="ew")
 
             # --- Manual GPU Layers Control Frame ---
             self.manual_gpu_layers_control_frame = ctk.CTkFrame(self.tuning_mode_scrollable_content_frame, fg_color="transparent")
@@ -599,13 +612,16 @@ class KoboldLauncherGUI(ctk.CTk):
 
             self.tuning_actions_primary_frame = ctk.CTkFrame(self.tuning_mode_scrollable_content_frame)
             self.tuning_actions_primary_frame.grid(row=current_row_idx_tuning, column=0, padx=10, pady=(5, 2), sticky="ew"); current_row_idx_tuning += 1
-            self.tuning_actions_primary_frame.grid_columnconfigure((0, 1), weight=1)
+            self.tuning_actions_primary_frame.grid_columnconfigure((0, 1, 2), weight=1)
             self.btn_tune_launch_monitor = ctk.CTkButton(self.tuning_actions_primary_frame, text="Launch & Monitor Output", command=lambda: self.launch_and_monitor_for_tuning(), height=35, fg_color="seagreen", hover_color="darkgreen")
             self.btn_tune_launch_monitor.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
             ToolTip(self.btn_tune_launch_monitor, "Launch KoboldCpp with the current OT strategy and monitor its output for success or errors (e.g., OOM).")
             self.btn_tune_skip_launch_direct = ctk.CTkButton(self.tuning_actions_primary_frame, text="Skip Tune & Launch This Config", command=lambda: self.skip_tune_and_launch_direct(), height=35)
             self.btn_tune_skip_launch_direct.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
             ToolTip(self.btn_tune_skip_launch_direct, "Immediately launch KoboldCpp for use with the current OT strategy and base arguments,\nwithout further monitoring or tuning steps.")
+            self.btn_tune_autotune = ctk.CTkButton(self.tuning_actions_primary_frame, text="Autotune (Unattended)", command=lambda: self.run_autotune(), height=35)
+            self.btn_tune_autotune.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+            ToolTip(self.btn_tune_autotune, "Bisect the offload plans with real launches until the most GPU-heavy plan that loads\nwith VRAM to spare is found (usually 4-8 launches). Every probe is saved to history.")
 
             self.tuning_stop_monitor_frame = ctk.CTkFrame(self.tuning_mode_scrollable_content_frame, fg_color="transparent")
             self.tuning_stop_monitor_frame.grid(row=current_row_idx_tuning, column=0, padx=10, pady=(0, 2), sticky="ew"); current_row_idx_tuning += 1
@@ -616,23 +632,38 @@ class KoboldLauncherGUI(ctk.CTk):
 
             self.tuning_actions_secondary_frame = ctk.CTkFrame(self.tuning_mode_scrollable_content_frame)
             self.tuning_actions_secondary_frame.grid(row=current_row_idx_tuning, column=0, padx=10, pady=0, sticky="ew"); current_row_idx_tuning += 1
-            self.tuning_actions_secondary_frame.grid_columnconfigure((0, 1), weight=1)
+            self.tuning_actions_secondary_frame.grid_columnconfigure((0, 1, 2), weight=1)
             self.btn_tune_more_gpu = ctk.CTkButton(self.tuning_actions_secondary_frame, text="More GPU (↓ Level)", command=lambda: self.adjust_ot_level(-1))
             self.btn_tune_more_gpu.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
             ToolTip(self.btn_tune_more_gpu, "Adjust the OT strategy to offload more layers/tensors to the GPU (decreases OT level).")
             self.btn_tune_more_cpu = ctk.CTkButton(self.tuning_actions_secondary_frame, text="More CPU (↑ Level)", command=lambda: self.adjust_ot_level(1))
             self.btn_tune_more_cpu.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
             ToolTip(self.btn_tune_more_cpu, "Adjust the OT strategy to offload more layers/tensors to the CPU (increases OT level),\nreducing VRAM usage.")
+            self.btn_tune_budget_plan = ctk.CTkButton(self.tuning_actions_secondary_frame, text="Plan for Free VRAM", command=lambda: self.apply_budget_plan_action())
+            self.btn_tune_budget_plan.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+            ToolTip(self.btn_tune_budget_plan, "Pick the tensors to keep on CPU from the model's tensor table so the predicted\nVRAM use fits the currently free VRAM (minus the safety buffer).")
 
             self.tuning_edit_args_buttons_frame = ctk.CTkFrame(self.tuning_mode_scrollable_content_frame)
             self.tuning_edit_args_buttons_frame.grid(row=current_row_idx_tuning, column=0, padx=10, pady=2, sticky="ew"); current_row_idx_tuning += 1
-            self.tuning_edit_args_buttons_frame.grid_columnconfigure((0, 1), weight=1)
+            self.tuning_edit_args_buttons_frame.grid_columnconfigure((0, 1, 2, 3, 4, 5), weight=1)
             self.btn_tune_edit_args = ctk.CTkButton(self.tuning_edit_args_buttons_frame, text="Edit Base Args (This Session)", command=lambda: self.edit_base_args_for_tuning_session())
             self.btn_tune_edit_args.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
             ToolTip(self.btn_tune_edit_args, "Modify the base KoboldCpp arguments (e.g., context size, threads)\nfor this tuning session only.")
             self.btn_tune_edit_model_perm_args = ctk.CTkButton(self.tuning_edit_args_buttons_frame, text="Edit Base Args (Permanent for This Model)", command=lambda: self.edit_permanent_model_args())
             self.btn_tune_edit_model_perm_args.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
             ToolTip(self.btn_tune_edit_model_perm_args, "Modify and save the base KoboldCpp arguments specifically for the current model.")
+            self.btn_tune_export_ladder = ctk.CTkButton(self.tuning_edit_args_buttons_frame, text="Export Level Ladder", command=lambda: self.export_level_ladder_action())
+            self.btn_tune_export_ladder.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+            ToolTip(self.btn_tune_export_ladder, "Save every OT level's override string, GPU layers, command args and\npredicted GPU/CPU bytes for this session as JSON.")
+            self.btn_tune_context_search = ctk.CTkButton(self.tuning_edit_args_buttons_frame, text="Max Context Search", command=lambda: self.run_context_size_search())
+            self.btn_tune_context_search.grid(row=0, column=3, padx=5, pady=5, sticky="ew")
+            ToolTip(self.btn_tune_context_search, "Binary-search the largest --contextsize that loads (and reaches a minimum t/s)\nwith the current offload plan, using real launches. Stored per model and GPU.")
+            self.btn_tune_param_search = ctk.CTkButton(self.tuning_edit_args_buttons_frame, text="Runtime Param Search", command=lambda: self.run_runtime_param_search())
+            self.btn_tune_param_search.grid(row=0, column=4, padx=5, pady=5, sticky="ew")
+            ToolTip(self.btn_tune_param_search, "Successive-halving search over --threads, --blasbatchsize, --quantkv and flash attention\nfor the current offload plan with short benchmark launches. Results are stored per hardware.")
+            self.btn_tune_thread_sweep = ctk.CTkButton(self.tuning_edit_args_buttons_frame, text="Thread Sweep", command=lambda: self.run_thread_sweep())
+            self.btn_tune_thread_sweep.grid(row=0, column=5, padx=5, pady=5, sticky="ew")
+            ToolTip(self.btn_tune_thread_sweep, "Benchmark --threads (generation) and --nblas (prompt processing) at thread counts taken from\nthe CPU topology (P/E cores, SMT) and store the knee per model, CPU and offload plan.")
 
             self.tuning_actions_navigation_frame = ctk.CTkFrame(self.tuning_mode_scrollable_content_frame)
             self.tuning_actions_navigation_frame.grid(row=current_row_idx_tuning, column=0, padx=10, pady=2, sticky="ew"); current_row_idx_tuning += 1
@@ -771,6 +802,14 @@ class KoboldLauncherGUI(ctk.CTk):
         self.manual_vram_entry.bind("<KeyRelease>", self.mark_settings_dirty)
         ToolTip(self.manual_vram_entry, "Enter total VRAM in MB for override.")
 
+        multi_gpu_subframe = ctk.CTkFrame(gpu_management_frame)
+        multi_gpu_subframe.pack(fill="x", pady=(5, 5))
+        ctk.CTkLabel(multi_gpu_subframe, text="Split Across GPU IDs:").pack(side="left", padx=5, pady=5)
+        self.multi_gpu_entry = ctk.CTkEntry(multi_gpu_subframe, width=150, placeholder_text="e.g. 0,1")
+        self.multi_gpu_entry.pack(side="left", padx=2, pady=5)
+        self.multi_gpu_entry.bind("<KeyRelease>", self.mark_settings_dirty)
+        ToolTip(self.multi_gpu_entry, "Two or more GPU IDs (same vendor) make budget plans spread layers across them\nwith --tensor_split / --maingpu. Leave blank for a single GPU.")
+
         global_args_collapsible_frame = self._create_collapsible_frame(sf, "Global KoboldCpp Default Arguments", initially_collapsed=True)
         global_args_collapsible_frame.pack(fill="x", expand=False, padx=10, pady=(20, 10))
         self.settings_widgets = {}
@@ -1016,6 +1055,11 @@ class KoboldLauncherGUI(ctk.CTk):
             self.manual_vram_entry.delete(0, "end")
             self.manual_vram_entry.insert(0, str(self.config.get("manual_vram_total_mb", 8192))) # Default to a string
         
+        if hasattr(self, 'multi_gpu_entry') and self.multi_gpu_entry.winfo_exists():
+            self.multi_gpu_entry.delete(0, "end")
+            multi_gpu_ids_text = ",".join(str(i) for i in tensortune_core.parse_gpu_index_list(self.config.get("multi_gpu_indices", [])))
+            if multi_gpu_ids_text: self.multi_gpu_entry.insert(0, multi_gpu_ids_text)
+
         self._toggle_manual_vram_entry_state() # Ensure enabled/disabled state is correct
 
         # Load global default arguments
@@ -1090,6 +1134,9 @@ class KoboldLauncherGUI(ctk.CTk):
                 self.log_to_console(f"Warning: Invalid manual VRAM total '{manual_vram_val_str}', defaulted.")
         else: # Fallback
             self.config["manual_vram_total_mb"] = tensortune_core.DEFAULT_CONFIG_TEMPLATE["manual_vram_total_mb"]
+        if hasattr(self, 'multi_gpu_entry') and self.multi_gpu_entry.winfo_exists():
+            multi_gpu_ids = tensortune_core.parse_gpu_index_list(self.multi_gpu_entry.get())
+            self.config["multi_gpu_indices"] = multi_gpu_ids if len(multi_gpu_ids) > 1 else []
 
 
         # Global KoboldCpp Arguments
@@ -1370,7 +1417,8 @@ class KoboldLauncherGUI(ctk.CTk):
             main_dialog_frame.grid_columnconfigure(0, weight=1)
             main_dialog_frame.grid_rowconfigure(0, weight=1) 
 
-            content_frame, widgets_info_dialog = self._create_args_dialog_content_revised(main_dialog_frame, args_for_display, param_defs)
+            model_analysis_for_dialog = tensortune_core.get_model_analysis(model_path_to_edit, self.db_path)
+            content_frame, widgets_info_dialog = self._create_args_dialog_content_revised(main_dialog_frame, args_for_display, param_defs, model_analysis_for_dialog)
             content_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
 
             # Store any changes in a temporary dictionary
@@ -1467,6 +1515,7 @@ class KoboldLauncherGUI(ctk.CTk):
                             if self.tuning_in_progress and self.current_tuning_model_path == model_path_to_edit:
                                 if hasattr(self, '_reinitialize_session_base_args') and callable(self._reinitialize_session_base_args):
                                     self._reinitialize_session_base_args()
+                                    self.rebuild_tuning_ladders()
                                     
                                 if hasattr(self, 'update_tuning_display') and callable(self.update_tuning_display):
                                     self.update_tuning_display()
@@ -1515,7 +1564,7 @@ class KoboldLauncherGUI(ctk.CTk):
         # self.after(50, self.focus_set) # Safeguard
 
 
-    def _create_args_dialog_content_revised(self, parent_frame_for_scrollable, current_args_to_display, param_definitions_list):
+    def _create_args_dialog_content_revised(self, parent_frame_for_scrollable, current_args_to_display, param_definitions_list, model_analysis=None):
         scrollable_content_frame = ctk.CTkScrollableFrame(parent_frame_for_scrollable, label_text="Model Arguments") # Label for context
         widgets_information = {}
 
@@ -1554,6 +1603,36 @@ class KoboldLauncherGUI(ctk.CTk):
                 widget_for_param.pack(side="left", padx=(0,5))
             
             widgets_information[param_key] = {"widget": widget_for_param, "type_hint": type_hint}
+
+            if param_key == "--overridetensors" and model_analysis and model_analysis.get('filepath'):
+                widget_for_param.configure(width=400)
+                dry_run_label = ctk.CTkLabel(scrollable_content_frame, text="", justify="left", anchor="w", wraplength=650)
+                dry_run_label.pack(fill="x", padx=(190, 5))
+
+                def _update_override_dry_run(_event=None, entry=widget_for_param, label=dry_run_label):
+                    ot_value = entry.get().strip()
+                    if not ot_value:
+                        label.configure(text="")
+                        return
+                    simulation = tensortune_core.simulate_override_tensors(model_analysis, ot_value)
+                    label.configure(text=tensortune_core.format_override_simulation(simulation),
+                                    text_color="orange" if simulation.get("unmatched_subpatterns") or simulation.get("errors") else ("gray10", "gray90"))
+
+                pending_dry_run = {"after_id": None}
+
+                def _schedule_override_dry_run(_event=None, entry=widget_for_param, pending=pending_dry_run):
+                    # Re-simulating walks the whole tensor table; wait until typing pauses
+                    if pending["after_id"] is not None:
+                        entry.after_cancel(pending["after_id"])
+                    pending["after_id"] = entry.after(300, _run_scheduled_dry_run)
+
+                def _run_scheduled_dry_run(pending=pending_dry_run, entry=widget_for_param, update=_update_override_dry_run):
+                    pending["after_id"] = None
+                    if entry.winfo_exists():
+                        update()
+
+                widget_for_param.bind("<KeyRelease>", _schedule_override_dry_run)
+                _update_override_dry_run()
         
         return scrollable_content_frame, widgets_information
 
@@ -1573,6 +1652,7 @@ class KoboldLauncherGUI(ctk.CTk):
                     # If tuning this model, re-init session args and update tuning display
                     if self.tuning_in_progress and self.current_tuning_model_path == model_path_to_delete:
                         self._reinitialize_session_base_args()
+                        self.rebuild_tuning_ladders()
                         self.update_tuning_display()
                 else:
                     self.log_to_console("Failed to save config after deleting model specific.")
@@ -1816,6 +1896,7 @@ class KoboldLauncherGUI(ctk.CTk):
         safety_buffer_mb = float(self.config.get("vram_safety_buffer_mb", 768))
         min_free_after_load_mb = float(self.config.get("min_vram_free_after_load_success_mb", 512))
         effective_vram_budget_for_heuristic_mb = current_gpu_full_info.get("total_mb_budgeted", 0.0) - safety_buffer_mb - min_free_after_load_mb
+        self.current_tuning_vram_budget_mb = effective_vram_budget_for_heuristic_mb if current_gpu_full_info.get("success") and effective_vram_budget_for_heuristic_mb > 0 else None
 
         if estimated_vram_needed_mb > 0 and current_vram_budgeted > 0: # current_vram_budgeted is free_mb_budgeted
             if estimated_vram_needed_mb > effective_vram_budget_for_heuristic_mb * 1.1: # Needs more than available comfortably
@@ -1853,7 +1934,7 @@ class KoboldLauncherGUI(ctk.CTk):
 
             # Adjust starting level based on historical outcome and current VRAM
             # Handle starting level based on historical outcome and current VRAM - prioritize exact match for USER_MARKED_AS_BEST
-            if hist_outcome.endswith("_USER_MARKED_AS_BEST_GUI") or hist_outcome.endswith("_USER_MARKED_AS_BEST_CLI"):
+            if hist_outcome.endswith("_USER_MARKED_AS_BEST_GUI") or hist_outcome.endswith("_USER_MARKED_AS_BEST_CLI") or hist_outcome.endswith(tensortune_core.AUTOTUNE_BEST_SUFFIX):
                 # For preferred configurations, use exactly the same level
                 initial_heuristic_level = hist_level
                 self.log_to_console(f"Using exact level {hist_level} from preferred historical configuration")
@@ -1881,6 +1962,26 @@ class KoboldLauncherGUI(ctk.CTk):
         else:
             self.log_to_console(f"No suitable historical config found. Starting with heuristic OT Level: {initial_heuristic_level}")
 
+        # An autotune winner is restored with its exact offload; its stored OT level is only the nearest coarse level
+        self.current_tuning_planned_offload = tensortune_core.planned_offload_from_history(best_hist_config)
+        if self.current_tuning_planned_offload:
+            self.log_to_console(self.current_tuning_planned_offload["message"])
+        self.current_tuning_warm_start = None
+        if not (best_hist_config and best_hist_config.get("outcome", "").startswith("SUCCESS")) and current_gpu_full_info.get("success"):
+            # No proven config: start from the byte-budget plan instead of walking the level ladder launch by launch
+            plan_budget_mb = current_vram_budgeted - safety_buffer_mb
+            warm_start = tensortune_core.find_similar_tuned_models(self.db_path, self.current_tuning_model_analysis, current_actual_hw_vram_mb)
+            warm_start_budget_mb = tensortune_core.warm_start_vram_budget_mb(self.current_tuning_model_analysis, self._tuning_planner_args(), warm_start)
+            if warm_start_budget_mb:
+                # Similar models' proven GPU share is a better first guess than the static estimate
+                self.current_tuning_warm_start = warm_start
+                self.log_to_console(warm_start["message"])
+                plan_budget_mb = min(warm_start_budget_mb, self.current_tuning_vram_budget_mb or warm_start_budget_mb)
+            self.current_tuning_planned_offload = self.plan_tuning_offload(plan_budget_mb)
+            if self.current_tuning_planned_offload:
+                initial_heuristic_level = tensortune_core.get_level_from_overridetensors(self.current_tuning_planned_offload["override_tensors"], self.current_tuning_model_analysis)
+        self.rebuild_tuning_ladders()
+
         self.current_tuning_attempt_level = max(self.current_tuning_min_level, min(initial_heuristic_level, self.current_tuning_max_level))
         self.level_of_last_monitored_run = self.current_tuning_attempt_level # Store initial level
         # Check if this is our first update after loading a historical "best" config
@@ -1889,7 +1990,7 @@ class KoboldLauncherGUI(ctk.CTk):
             historical_outcome = self.last_successful_monitored_run_details_gui.get('outcome', '')
             
             # If we have a preferred/best historical config, prioritize using that exact level
-            if historical_outcome and historical_level is not None and '_USER_MARKED_AS_BEST_' in historical_outcome:
+            if historical_outcome and historical_level is not None and ('_USER_MARKED_AS_BEST_' in historical_outcome or historical_outcome.endswith(tensortune_core.AUTOTUNE_BEST_SUFFIX)):
                 if self.current_tuning_attempt_level != historical_level:
                     self.log_to_console(f"Adjusting to exact historical preferred level: {historical_level}")
                     self.current_tuning_attempt_level = historical_level
@@ -1899,6 +2000,7 @@ class KoboldLauncherGUI(ctk.CTk):
         self.manual_gpu_layers_entry_var.set("")
         self._on_auto_gpu_layers_toggle() # Update entry state
         self.effective_gpu_layers_for_command.set("auto")
+        self.apply_stored_runtime_tuning(current_gpu_full_info.get("name"))
         
         self._show_tuning_mode_view()
         #self.update_tuning_display() # Called by _show_tuning_mode_view via _return_to_full_tuning_menu
@@ -1909,6 +2011,315 @@ class KoboldLauncherGUI(ctk.CTk):
             self.kcpp_console_line_count = 0
             # No initial message here, update_tuning_display will populate command
 
+    def _tuning_planner_args(self) -> dict:
+        return tensortune_core.args_list_to_dict(tensortune_core.build_command(
+            self.current_tuning_model_path, None, self.current_tuning_model_analysis, self.current_tuning_session_base_args,
+            vram_budget_mb=self.current_tuning_vram_budget_mb))
+
+    def plan_tuning_offload(self, vram_budget_mb: float):
+        """Runs the byte-budget offload planner for the current tuning session; returns the plan or None."""
+        if len(tensortune_core.parse_gpu_index_list(self.config.get("multi_gpu_indices", []))) > 1:
+            plan = tensortune_core.plan_tensor_split_for_config(self.current_tuning_model_analysis, self._tuning_planner_args(), self.config)
+            if plan.get("success"):
+                self.current_tuning_session_base_args.update({"--tensor_split": plan["tensor_split"], "--maingpu": str(plan["main_gpu"])})
+        else:
+            bandwidths = tensortune_core.get_offload_bandwidths(self.config, wait_for_probe=False)
+            plan = {}
+            if self.current_tuning_model_analysis.get('is_moe'):
+                plan = tensortune_core.plan_moe_expert_offload(self.current_tuning_model_analysis, vram_budget_mb, self._tuning_planner_args(), bandwidths)
+            if not plan.get("success"):
+                plan = tensortune_core.plan_offload_for_budget(self.current_tuning_model_analysis, vram_budget_mb, self._tuning_planner_args(),
+                                                               bandwidths=bandwidths)
+        self.log_to_console(plan.get("message", "Offload planning failed."))
+        return plan if plan.get("success") else None
+
+    def rebuild_tuning_ladders(self):
+        self.current_tuning_level_ladder = tensortune_core.build_level_ladder(
+            self.current_tuning_model_path, self.current_tuning_model_analysis, self.current_tuning_session_base_args,
+            self.current_tuning_min_level, self.current_tuning_max_level, vram_budget_mb=self.current_tuning_vram_budget_mb,
+            bandwidths=tensortune_core.get_offload_bandwidths(self.config, wait_for_probe=False))
+        self.build_tuning_offload_ladder()
+
+    def _tuning_level_entry(self, level: Optional[int] = None) -> dict:
+        return tensortune_core.get_level_ladder_entry(self.current_tuning_level_ladder, self.current_tuning_model_analysis,
+                                                      self.current_tuning_attempt_level if level is None else level)
+
+    def export_level_ladder_action(self):
+        if not self.tuning_in_progress or not self.current_tuning_level_ladder:
+            return
+        export_filepath = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            title="Export Level Ladder to...",
+            initialfile=f"{os.path.splitext(os.path.basename(self.current_tuning_model_path))[0]}_ladder.json",
+            parent=self
+        )
+        if not export_filepath:
+            return
+        success, message = tensortune_core.export_level_ladder_json(self.current_tuning_level_ladder, export_filepath)
+        self.log_to_console(message)
+        if not success:
+            messagebox.showerror("Export Error", message, parent=self)
+
+    def build_tuning_offload_ladder(self):
+        """(Re)builds the GPU-resident MiB dial for the session; stays None for models without a GGUF tensor table."""
+        ladder = tensortune_core.build_offload_ladder(self.current_tuning_model_analysis, self._tuning_planner_args(),
+                                                       bandwidths=tensortune_core.get_offload_bandwidths(self.config, wait_for_probe=False))
+        self.current_tuning_offload_ladder = ladder if ladder.get("success") else None
+        if self.current_tuning_offload_ladder:
+            self.log_to_console(ladder["message"])
+        if hasattr(self, 'btn_tune_more_gpu') and hasattr(self, 'btn_tune_more_cpu'):
+            step_text = f"~{ladder['step_bytes'] // (1024**2)} MiB" if self.current_tuning_offload_ladder else None
+            self.btn_tune_more_gpu.configure(text=f"More GPU (↑ {step_text})" if step_text else "More GPU (↓ Level)")
+            self.btn_tune_more_cpu.configure(text=f"More CPU (↓ {step_text})" if step_text else "More CPU (↑ Level)")
+
+    def _step_offload_dial(self, delta: int) -> bool:
+        """Moves the offload dial for More GPU (-1) / More CPU (+1). False when there is no dial and the OT level should step."""
+        if not self.current_tuning_offload_ladder:
+            return False
+        plan = self.current_tuning_planned_offload
+        current_gpu_bytes = None
+        if not (plan and "dial_index" in plan):
+            current_args = tensortune_core.args_list_to_dict(tensortune_core.build_command(
+                self.current_tuning_model_path, self._tuning_ot_string(), self.current_tuning_model_analysis,
+                self.current_tuning_session_base_args, current_attempt_level_for_tuning=self.current_tuning_attempt_level,
+                manual_gpu_layers_override=plan["gpu_layers"] if plan else None, vram_budget_mb=self.current_tuning_vram_budget_mb))
+            current_gpu_bytes = tensortune_core.estimate_vram_usage_for_args(self.current_tuning_model_analysis, current_args).get("total_bytes")
+        rung = tensortune_core.step_offload_dial(self.current_tuning_model_analysis, self.current_tuning_offload_ladder, delta, plan, current_gpu_bytes)
+        if rung is None:
+            self.log_to_console(f"Already at {'Max CPU' if delta > 0 else 'Max GPU'} on the offload dial.")
+            return True
+        self.current_tuning_planned_offload = rung
+        self.current_tuning_attempt_level = tensortune_core.get_level_from_overridetensors(rung["override_tensors"], self.current_tuning_model_analysis)
+        self.log_to_console(rung["message"])
+        if not self.manual_gpu_layers_var.get():  # The rung sets --gpulayers itself
+            self.manual_gpu_layers_var.set(True)
+            self._on_auto_gpu_layers_toggle()
+        return True
+
+    def apply_budget_plan_action(self):
+        if not self.tuning_in_progress:
+            return
+        _, _, _, gpu_info_for_plan = tensortune_core.get_available_vram_mb(
+            self.config,
+            target_gpu_type=self.config.get("gpu_selection_mode", "auto") if self.config.get("gpu_selection_mode", "auto") != "auto" else None,
+            target_gpu_index=self.config.get("selected_gpu_index", 0)
+        )
+        if not gpu_info_for_plan.get("success"):
+            self.log_to_console("Budget plan needs GPU VRAM information.")
+            return
+        safety_buffer_mb = float(self.config.get("vram_safety_buffer_mb", 768))
+        plan = self.plan_tuning_offload(gpu_info_for_plan.get("free_mb_budgeted", 0.0) - safety_buffer_mb)
+        if plan:
+            self.current_tuning_planned_offload = plan
+            self.current_tuning_attempt_level = tensortune_core.get_level_from_overridetensors(plan["override_tensors"], self.current_tuning_model_analysis)
+            self.update_tuning_display()
+
+    def _tuning_launch_args(self) -> list:
+        """KoboldCpp args for the current level or planned offload, with the GPU layers shown in the tuning view."""
+        # Key fix: Properly process manual GPU layers
+        manual_gpu_override_for_command = None
+        effective_gpu_setting = self.effective_gpu_layers_for_command.get()
+        
+        if effective_gpu_setting and effective_gpu_setting.isdigit():
+            manual_gpu_override_for_command = int(effective_gpu_setting)
+
+        return tensortune_core.build_command(
+            self.current_tuning_model_path, 
+            self._tuning_ot_string(), 
+            self.current_tuning_model_analysis,
+            self.current_tuning_session_base_args, 
+            current_attempt_level_for_tuning=self.current_tuning_attempt_level,
+            manual_gpu_layers_override=manual_gpu_override_for_command,
+            vram_budget_mb=self.current_tuning_vram_budget_mb
+        )
+
+    def apply_stored_runtime_tuning(self, gpu_name):
+        """
+        Applies stored search results for the session's offload plan; they are keyed by the plan, so call this once it is chosen.
+        The parameter search's optimum goes first; swept thread knees then replace its --threads (and set --nblas), since
+        the sweep measures every topology-derived count while the parameter search only tries a few.
+        """
+        plan_args = tensortune_core.args_list_to_dict(self._tuning_launch_args())
+        known_runtime_params = tensortune_core.get_runtime_param_optimum(self.db_path, self.current_tuning_model_analysis, gpu_name, plan_args)
+        if known_runtime_params:
+            self.current_tuning_session_base_args.update(known_runtime_params["params"])
+            self.log_to_console(f"Using the searched optimum for this plan and hardware: {tensortune_core.describe_runtime_params(known_runtime_params['params'])}")
+        thread_knees = tensortune_core.get_thread_sweep_knees(self.db_path, self.current_tuning_model_analysis, plan_args)
+        if thread_knees:
+            self.current_tuning_session_base_args.update({arg_key: str(knee) for arg_key, knee in thread_knees.items()})
+            self.log_to_console("Using swept thread counts for this plan and CPU: " + ", ".join(f"{arg_key} {knee}" for arg_key, knee in thread_knees.items()))
+        if known_runtime_params:
+            self.rebuild_tuning_ladders()  # The batch size and KV quant change the VRAM estimates
+
+    def run_context_size_search(self):
+        """Searches the largest --contextsize for the current offload plan with real launches (in a worker thread)."""
+        if not self.tuning_in_progress:
+            return
+        if self.kcpp_process_obj and self.kcpp_process_obj.poll() is None:
+            messagebox.showwarning("Process Running", "Stop the running KoboldCpp process before searching context sizes.", parent=self)
+            return
+        _, _, _, gpu_info = tensortune_core.get_available_vram_mb(self.config)
+        gpu_name = gpu_info.get("name")
+        stored_limit = tensortune_core.get_context_size_limit(self.db_path, self.current_tuning_model_analysis, gpu_name)
+        stored_text = f"Stored maximum on this GPU: --contextsize {stored_limit['max_context']}\n\n" if stored_limit else ""
+        min_tokens_per_second = simpledialog.askfloat(
+            "Max Context Search",
+            f"{stored_text}Minimum generation speed in t/s (0 = only require a successful load).\n"
+            "Each step launches KoboldCpp with the current offload plan; this can take several minutes.",
+            initialvalue=0.0, minvalue=0.0, parent=self)
+        if min_tokens_per_second is None:
+            return
+        args_list = self._tuning_launch_args()
+        model_analysis = self.current_tuning_model_analysis
+        self._set_tuning_buttons_state("disabled")
+        self.log_to_console("Context search started.")
+
+        def search_worker():
+            try:
+                search_result = tensortune_core.search_max_context_size(
+                    self.koboldcpp_executable, model_analysis, args_list, self.config,
+                    min_tokens_per_second=min_tokens_per_second, vram_budget_mb=self.current_tuning_vram_budget_mb,
+                    progress_callback=self.log_to_console)
+                if search_result.get("success"):
+                    _, save_msg = tensortune_core.save_context_size_limit(self.db_path, model_analysis, gpu_name, search_result)
+                    self.log_to_console(save_msg)
+            except Exception as e:  # The buttons stay disabled unless _finish_context_size_search runs
+                search_result = {"success": False, "message": f"Context search failed: {type(e).__name__}: {e}"}
+            self.after(0, lambda: self._finish_context_size_search(search_result))
+
+        threading.Thread(target=search_worker, daemon=True).start()
+
+    def _finish_context_size_search(self, search_result: dict):
+        self._set_tuning_buttons_state("normal")
+        self.log_to_console(search_result.get("message", "Context search failed."))
+        if not search_result.get("success") or not self.tuning_in_progress:
+            return
+        if messagebox.askyesno("Max Context Search", f"{search_result['message']}.\n\nUse --contextsize {search_result['max_context']} "
+                               "for this tuning session?", parent=self):
+            self.current_tuning_session_base_args["--contextsize"] = str(search_result["max_context"])
+            self.rebuild_tuning_ladders()
+            self.update_tuning_display()
+
+    def run_autotune(self):
+        """Bisects the plan ladder with unattended launches (worker thread) and switches the session to the result."""
+        if not self.tuning_in_progress or self.autotune_stop_event is not None:
+            return
+        if self.kcpp_process_obj and self.kcpp_process_obj.poll() is None:
+            messagebox.showwarning("Process Running", "Stop the running KoboldCpp process before autotuning.", parent=self)
+            return
+        candidates = tensortune_core.build_autotune_candidates(
+            self.current_tuning_model_path, self.current_tuning_model_analysis, self.current_tuning_session_base_args,
+            self.current_tuning_offload_ladder, self.current_tuning_level_ladder, self.current_tuning_vram_budget_mb)
+        self.autotune_stop_event = threading.Event()
+        self._set_tuning_buttons_state("disabled", monitoring_active=True)
+        self.log_to_console(f"Autotune: bisecting {len(candidates)} plans with real launches.")
+
+        def autotune_worker():
+            try:
+                result = tensortune_core.autotune_offload(
+                    self.koboldcpp_executable, self.current_tuning_model_path, self.current_tuning_model_analysis, candidates,
+                    self.db_path, self.config, self.current_tuning_vram_budget_mb, progress_callback=self.log_to_console,
+                    stop_event=self.autotune_stop_event, warm_start=self.current_tuning_warm_start)
+            except Exception as e:  # _finish_autotune must run to clear the stop event and re-enable the buttons
+                result = {"success": False, "message": f"Autotune failed: {type(e).__name__}: {e}"}
+            self.after(0, lambda: self._finish_autotune(result))
+
+        threading.Thread(target=autotune_worker, daemon=True).start()
+
+    def _finish_autotune(self, result: dict):
+        self.autotune_stop_event = None
+        self._set_tuning_buttons_state("normal", monitoring_active=False)
+        self.log_to_console(result.get("message", "Autotune did not finish."))
+        if result.get("success") and self.tuning_in_progress:
+            self.current_tuning_attempt_level, self.current_tuning_planned_offload = result["best"]["level"], result["best"]["plan"]
+            self.update_tuning_display()
+
+    def run_runtime_param_search(self):
+        """Searches threads/BLAS batch/KV quant/flash attention for the current offload plan (worker thread, stoppable)."""
+        if not self.tuning_in_progress or self.autotune_stop_event is not None:
+            return
+        if self.kcpp_process_obj and self.kcpp_process_obj.poll() is None:
+            messagebox.showwarning("Process Running", "Stop the running KoboldCpp process before searching runtime parameters.", parent=self)
+            return
+        _, _, _, gpu_info = tensortune_core.get_available_vram_mb(self.config)
+        gpu_name = gpu_info.get("name")
+        args_list = self._tuning_launch_args()
+        args_dict = tensortune_core.args_list_to_dict(args_list)
+        reuse_history = bool(tensortune_core.get_runtime_param_optimum(self.db_path, self.current_tuning_model_analysis, gpu_name, args_dict)) \
+            and not messagebox.askyesno("Runtime Param Search", "A stored optimum exists for this plan on this hardware.\n\n"
+                                        "Search again anyway?", parent=self)
+        if not reuse_history:
+            launch_estimate = tensortune_core.estimate_param_search_launches(self.current_tuning_model_analysis, args_dict,
+                                                                             self.current_tuning_vram_budget_mb)
+            if not messagebox.askyesno("Runtime Param Search", f"The search needs about {launch_estimate} KoboldCpp launches.\n\n"
+                                       "Start it?", parent=self):
+                return
+        self.autotune_stop_event = threading.Event()  # The Stop button ends any unattended search
+        self._set_tuning_buttons_state("disabled", monitoring_active=True)
+        self.log_to_console("Runtime parameter search started.")
+
+        def search_worker():
+            try:
+                result = tensortune_core.search_runtime_params(
+                    self.koboldcpp_executable, self.current_tuning_model_analysis, args_list, self.db_path, self.config,
+                    self.current_tuning_vram_budget_mb, gpu_name, reuse_history=reuse_history,
+                    progress_callback=self.log_to_console, stop_event=self.autotune_stop_event)
+            except Exception as e:  # _finish_runtime_param_search must run to clear the stop event and re-enable the buttons
+                result = {"success": False, "message": f"Parameter search failed: {type(e).__name__}: {e}"}
+            self.after(0, lambda: self._finish_runtime_param_search(result))
+
+        threading.Thread(target=search_worker, daemon=True).start()
+
+    def _finish_runtime_param_search(self, result: dict):
+        self.autotune_stop_event = None
+        self._set_tuning_buttons_state("normal", monitoring_active=False)
+        self.log_to_console(result.get("message", "Parameter search did not finish."))
+        if not result.get("success") or not self.tuning_in_progress:
+            return
+        if messagebox.askyesno("Runtime Param Search", f"{result['message']}.\n\nUse "
+                               f"{tensortune_core.describe_runtime_params(result['best'])} for this tuning session?", parent=self):
+            self.current_tuning_session_base_args.update(result["best"])
+            self.rebuild_tuning_ladders()
+            self.update_tuning_display()
+
+    def run_thread_sweep(self):
+        """Sweeps --threads and --nblas at topology-derived counts for the current plan (worker thread, stoppable)."""
+        if not self.tuning_in_progress or self.autotune_stop_event is not None:
+            return
+        if self.kcpp_process_obj and self.kcpp_process_obj.poll() is None:
+            messagebox.showwarning("Process Running", "Stop the running KoboldCpp process before sweeping thread counts.", parent=self)
+            return
+        args_list = self._tuning_launch_args()
+        self.autotune_stop_event = threading.Event()
+        self._set_tuning_buttons_state("disabled", monitoring_active=True)
+
+        def sweep_worker():
+            try:
+                result = tensortune_core.sweep_thread_counts(
+                    self.koboldcpp_executable, self.current_tuning_model_analysis, args_list, self.db_path, self.config,
+                    progress_callback=self.log_to_console, stop_event=self.autotune_stop_event)
+            except Exception as e:  # _finish_thread_sweep must run to clear the stop event and re-enable the buttons
+                result = {"success": False, "message": f"Thread sweep failed: {type(e).__name__}: {e}"}
+            self.after(0, lambda: self._finish_thread_sweep(result))
+
+        threading.Thread(target=sweep_worker, daemon=True).start()
+
+    def _finish_thread_sweep(self, result: dict):
+        self.autotune_stop_event = None
+        self._set_tuning_buttons_state("normal", monitoring_active=False)
+        self.log_to_console(result.get("message", "Thread sweep did not finish."))
+        if not result.get("success") or not self.tuning_in_progress:
+            return
+        if messagebox.askyesno("Thread Sweep", f"{result['message']}.\n\nUse these thread counts for this tuning session?", parent=self):
+            self.current_tuning_session_base_args.update({arg_key: str(knee) for arg_key, knee in result["knees"].items()})
+            self.update_tuning_display()
+
+    def _tuning_ot_string(self) -> Optional[str]:
+        if self.current_tuning_planned_offload:
+            return self.current_tuning_planned_offload["override_tensors"]
+        return self._tuning_level_entry()["override_tensors"]
+
     def get_qualitative_ot_level_desc(self, level: int, is_moe: bool) -> str:
         if is_moe: # MoE thresholds
             if level <= -18: return "Strong GPU Bias"
@@ -1938,8 +2349,12 @@ class KoboldLauncherGUI(ctk.CTk):
             # [this section remains unchanged]
             pass  # Keep existing code for this section
 
-        ot_string = tensortune_core.generate_overridetensors(self.current_tuning_model_analysis, self.current_tuning_attempt_level)
-        description = tensortune_core.get_offload_description(self.current_tuning_model_analysis, self.current_tuning_attempt_level, ot_string)
+        ot_string = self._tuning_ot_string()
+        description = self._tuning_level_entry()["description"]
+        if self.current_tuning_planned_offload:
+            description = self.current_tuning_planned_offload["message"]
+            if "dial_index" not in self.current_tuning_planned_offload:
+                description += " (More GPU/CPU moves the offload dial)" if self.current_tuning_offload_ladder else " (More GPU/CPU returns to OT levels)"
         
         # KEY FIX: Properly handle manual GPU layers
         effective_gpu_layers_value = "auto"  # Default to auto
@@ -1949,6 +2364,8 @@ class KoboldLauncherGUI(ctk.CTk):
                 effective_gpu_layers_value = int(manual_entry_val)
             elif manual_entry_val.lower() == "auto":  # User typed "auto" in manual box
                 effective_gpu_layers_value = "auto"
+        if effective_gpu_layers_value == "auto" and self.current_tuning_planned_offload:
+            effective_gpu_layers_value = self.current_tuning_planned_offload["gpu_layers"]
         
         # Store for command building
         self.effective_gpu_layers_for_command.set(str(effective_gpu_layers_value))
@@ -1958,9 +2375,7 @@ class KoboldLauncherGUI(ctk.CTk):
         if isinstance(effective_gpu_layers_value, int):
             gpu_layers_for_ot_calc_display = effective_gpu_layers_value
         else:  # It's "auto" or invalid, use level-based for OT and display
-            gpu_layers_for_ot_calc_display = tensortune_core.get_gpu_layers_for_level(
-                self.current_tuning_model_analysis, self.current_tuning_attempt_level
-            )
+            gpu_layers_for_ot_calc_display = self._tuning_level_entry()["gpu_layers"]
         total_layers = self.current_tuning_model_analysis.get('num_layers', 32)  # Default if not found
 
         # Update UI elements
@@ -1984,9 +2399,7 @@ class KoboldLauncherGUI(ctk.CTk):
         if hasattr(self, 'tuning_gpu_layers_label'):
             display_gpu_layers_text = str(self.effective_gpu_layers_for_command.get())
             if display_gpu_layers_text.lower() == "auto":
-                auto_calculated_layers = tensortune_core.get_gpu_layers_for_level(
-                    self.current_tuning_model_analysis, self.current_tuning_attempt_level
-                )
+                auto_calculated_layers = self._tuning_level_entry()["gpu_layers"]
                 display_gpu_layers_text = f"Auto ({auto_calculated_layers})"
             self.tuning_gpu_layers_label.configure(text=f"Effective GPU Layers: {display_gpu_layers_text}/{total_layers}")
 
@@ -2004,12 +2417,26 @@ class KoboldLauncherGUI(ctk.CTk):
             self.current_tuning_model_analysis,
             self.current_tuning_session_base_args,
             current_attempt_level_for_tuning=self.current_tuning_attempt_level,
-            manual_gpu_layers_override=manual_gpu_override_for_command 
+            manual_gpu_layers_override=manual_gpu_override_for_command,
+            vram_budget_mb=self.current_tuning_vram_budget_mb
         )
         
         full_command_list = tensortune_core.get_command_to_run(self.koboldcpp_executable, args_for_kcpp_list)
         display_command_str = tensortune_core.format_command_for_display(full_command_list)
 
+        if hasattr(self, 'tuning_memory_estimate_label'):
+            display_args_dict = tensortune_core.args_list_to_dict(args_for_kcpp_list)
+            kv_estimate = tensortune_core.estimate_kv_cache_for_args(self.current_tuning_model_analysis, display_args_dict)
+            vram_estimate = tensortune_core.estimate_vram_usage_for_args(self.current_tuning_model_analysis, display_args_dict)
+            token_time_estimate = tensortune_core.estimate_token_time_for_args(
+                self.current_tuning_model_analysis, display_args_dict, tensortune_core.get_offload_bandwidths(self.config, wait_for_probe=False))
+            estimate_lines = [est["message"] for est in (kv_estimate, vram_estimate, token_time_estimate) if est.get("success")]
+            if display_args_dict.get("--overridetensors"):
+                override_simulation = tensortune_core.simulate_override_tensors_for_args(self.current_tuning_model_analysis, display_args_dict)
+                if override_simulation.get("success"):
+                    estimate_lines.append(override_simulation["message"])
+            self.tuning_memory_estimate_label.configure(text="\n".join(estimate_lines))
+
         if hasattr(self, 'tuning_proposed_command_text'):
             self.tuning_proposed_command_text.configure(state="normal")
             self.tuning_proposed_command_text.delete("1.0", "end")
@@ -2122,6 +2549,8 @@ class KoboldLauncherGUI(ctk.CTk):
             self.last_approx_vram_used_kcpp_mb
         )
         self.load_history()
+        if final_db_outcome.startswith("SUCCESS_LOAD"):
+            self._benchmark_monitored_launch(final_db_outcome)
         self._present_post_monitoring_choices(final_db_outcome)
 
 
@@ -2139,6 +2568,40 @@ class KoboldLauncherGUI(ctk.CTk):
         self.load_history() # Refresh history tab
         self._present_post_monitoring_choices(final_db_outcome)
 
+    def _benchmark_monitored_launch(self, outcome: str):
+        """
+        Runs the throughput benchmark against the just-loaded instance in the background and stores it with the launch.
+        The post-load choices for outcome are held back until _finish_benchmark, so the instance is not stopped mid-run.
+        """
+        if not self.config.get("benchmark_after_load", True) or not self.kcpp_process_obj or self.kcpp_process_obj.poll() is not None:
+            return
+        effective_args_for_port = {**self.config.get("default_args", {}), **self.current_tuning_session_base_args}
+        port = effective_args_for_port.get("--port", "5000")
+        launch_record = (self.db_path, self.current_tuning_model_path, self.vram_at_decision_for_db,
+                         list(self.current_command_list_for_db), self.level_of_last_monitored_run)
+        self._log_to_kcpp_live_output("Benchmarking prompt processing, generation speed and time to first token...\n")
+        self.benchmark_pending_outcome = outcome
+
+        def benchmark_worker():
+            try:
+                benchmark = tensortune_core.benchmark_koboldcpp(port)
+                if benchmark.get("success"):
+                    tensortune_core.save_benchmark_to_db(*launch_record, benchmark)
+            except Exception as e:  # _finish_benchmark holds the pending post-load choices; it must always run
+                benchmark = {"success": False, "message": f"Benchmark failed: {type(e).__name__}: {e}"}
+            self.after(0, lambda: self._finish_benchmark(benchmark))
+
+        threading.Thread(target=benchmark_worker, daemon=True).start()
+
+    def _finish_benchmark(self, benchmark: dict):
+        self._log_to_kcpp_live_output(benchmark["message"] + "\n")
+        self.log_to_console(benchmark["message"])
+        if benchmark.get("success"):
+            self.load_history()
+        pending_outcome, self.benchmark_pending_outcome = self.benchmark_pending_outcome, None
+        if pending_outcome is not None:
+            self._present_post_monitoring_choices(pending_outcome)
+
     def _present_post_monitoring_choices(self, outcome: str):
         # Hide primary tuning action frames
         frames_to_hide_names = [
@@ -2164,6 +2627,10 @@ class KoboldLauncherGUI(ctk.CTk):
             widget.destroy()
 
         ctk.CTkLabel(self.post_monitor_choices_frame, text=f"Outcome: {outcome}", font=ctk.CTkFont(weight="bold")).pack(pady=(10, 2), anchor="w", padx=5)
+        if self.benchmark_pending_outcome is not None:
+            # _finish_benchmark shows the choices once the benchmark is done
+            ctk.CTkLabel(self.post_monitor_choices_frame, text="Benchmarking the loaded model; choices appear when it finishes...").pack(pady=1, anchor="w", padx=5)
+            return
         
         if self.last_free_vram_after_load_mb is not None:
             ctk.CTkLabel(self.post_monitor_choices_frame, text=f"Budgeted VRAM After Load: {self.last_free_vram_after_load_mb:.0f} MB free").pack(pady=1, anchor="w", padx=5)
@@ -2409,9 +2876,7 @@ class KoboldLauncherGUI(ctk.CTk):
         last_layers = None
         
         for level in level_range:
-            layers = tensortune_core.get_gpu_layers_for_level(
-                self.current_tuning_model_analysis, level
-            )
+            layers = self._tuning_level_entry(level)["gpu_layers"]
             
             # Mark significant jumps
             jump_marker = ""
@@ -2433,13 +2898,15 @@ class KoboldLauncherGUI(ctk.CTk):
     def adjust_ot_level(self, delta):
         if not self.tuning_in_progress:
             return
+        if self._step_offload_dial(1 if delta > 0 else -1):
+            self.update_tuning_display()
+            return
+        self.current_tuning_planned_offload = None  # Stepping the level hands control back to the OT ladder
         
         # Get current GPU layers for context
         current_model_layers = self.current_tuning_model_analysis.get('num_layers', 32)
         is_moe = self.current_tuning_model_analysis.get('is_moe', False)
-        current_gpu_layers = tensortune_core.get_gpu_layers_for_level(
-            self.current_tuning_model_analysis, self.current_tuning_attempt_level
-        )
+        current_gpu_layers = self._tuning_level_entry()["gpu_layers"]
         
         # Store original level for logging
         original_level = self.current_tuning_attempt_level
@@ -2460,9 +2927,7 @@ class KoboldLauncherGUI(ctk.CTk):
             return
             
         # Check what would happen at the next level
-        next_gpu_layers = tensortune_core.get_gpu_layers_for_level(
-            self.current_tuning_model_analysis, next_level
-        )
+        next_gpu_layers = self._tuning_level_entry(next_level)["gpu_layers"]
         
         # Special handling for the big jump to 999
         if delta < 0 and next_gpu_layers == 999 and current_gpu_layers < 100:
@@ -2499,9 +2964,7 @@ class KoboldLauncherGUI(ctk.CTk):
         
         # Get new GPU layers count for logging
         if self.manual_gpu_layers_var.get():  # Auto mode
-            new_gpu_layers = tensortune_core.get_gpu_layers_for_level(
-                self.current_tuning_model_analysis, self.current_tuning_attempt_level
-            )
+            new_gpu_layers = self._tuning_level_entry()["gpu_layers"]
         else:  # Manual mode
             try:
                 new_gpu_layers = int(self.manual_gpu_layers_entry_var.get())
@@ -2542,7 +3005,7 @@ class KoboldLauncherGUI(ctk.CTk):
             dialog_main_frame.grid_columnconfigure(0, weight=1)
             dialog_main_frame.grid_rowconfigure(0, weight=1)
 
-            content_frame, widgets_info = self._create_args_dialog_content_revised(dialog_main_frame, current_display_args, param_defs)
+            content_frame, widgets_info = self._create_args_dialog_content_revised(dialog_main_frame, current_display_args, param_defs, self.current_tuning_model_analysis)
             content_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
 
             # Store any changes in a temporary dictionary
@@ -2637,6 +3100,7 @@ class KoboldLauncherGUI(ctk.CTk):
                     
                     if changes_applied:
                         self.log_to_console("Session base arguments updated for current tuning.")
+                        self.rebuild_tuning_ladders()  # Context/KV settings move the predicted bytes of every level and rung
                         # Update UI safely
                         if hasattr(self, 'update_tuning_display') and callable(self.update_tuning_display):
                             self.update_tuning_display()
@@ -2733,23 +3197,7 @@ class KoboldLauncherGUI(ctk.CTk):
         self.last_approx_vram_used_kcpp_mb = None
         self.level_of_last_monitored_run = self.current_tuning_attempt_level
 
-        ot_string = tensortune_core.generate_overridetensors(self.current_tuning_model_analysis, self.current_tuning_attempt_level)
-        
-        # Key fix: Properly process manual GPU layers
-        manual_gpu_override_for_command = None
-        effective_gpu_setting = self.effective_gpu_layers_for_command.get()
-        
-        if effective_gpu_setting and effective_gpu_setting.isdigit():
-            manual_gpu_override_for_command = int(effective_gpu_setting)
-
-        args_list = tensortune_core.build_command(
-            self.current_tuning_model_path, 
-            ot_string, 
-            self.current_tuning_model_analysis,
-            self.current_tuning_session_base_args, 
-            current_attempt_level_for_tuning=self.current_tuning_attempt_level,
-            manual_gpu_layers_override=manual_gpu_override_for_command 
-        )
+        args_list = self._tuning_launch_args()
         
         self.current_command_list_for_db = tensortune_core.get_command_to_run(self.koboldcpp_executable, args_list)
         
@@ -2760,6 +3208,19 @@ class KoboldLauncherGUI(ctk.CTk):
         )
         self.vram_at_decision_for_db = gpu_info_before_launch.get("free_mb") 
 
+        vram_prediction = tensortune_core.predict_vram_for_args(
+            tensortune_core.train_vram_predictor(self.db_path, gpu_info_before_launch.get("name")), self.current_tuning_model_analysis,
+            tensortune_core.args_list_to_dict(args_list), self.vram_at_decision_for_db or None)
+        if vram_prediction.get("success"):
+            self.log_to_console(vram_prediction["message"])
+            if vram_prediction["likely_exceeds"] and self.config.get("vram_predictor_block_likely_oom", True) and not messagebox.askyesno(
+                    "Likely Out of VRAM",
+                    f"{vram_prediction['message']}.\n\nLaunch history predicts this command will not fit. Launch anyway?",
+                    parent=self):
+                self.log_to_console("Launch skipped: predicted VRAM exceeds free VRAM. Try More CPU or a Budget Plan.")
+                self._set_tuning_buttons_state("normal", monitoring_active=False)
+                return
+
         self.kcpp_process_obj, launch_error_msg = tensortune_core.launch_process(
             self.current_command_list_for_db, capture_output=True, new_console=False, use_text_mode=False 
         )
@@ -2880,7 +3341,7 @@ class KoboldLauncherGUI(ctk.CTk):
 
     def _set_tuning_buttons_state(self, state="normal", monitoring_active=False):
             # Primary launch buttons
-            for btn_attr in ['btn_tune_launch_monitor', 'btn_tune_skip_launch_direct']:
+            for btn_attr in ['btn_tune_launch_monitor', 'btn_tune_skip_launch_direct', 'btn_tune_autotune']:
                 btn = getattr(self, btn_attr, None)
                 if btn and hasattr(btn, 'winfo_exists') and btn.winfo_exists():
                     btn.configure(state="disabled" if monitoring_active else state)
@@ -2910,8 +3371,8 @@ class KoboldLauncherGUI(ctk.CTk):
 
             # Secondary and navigation buttons
             secondary_nav_buttons = [
-                'btn_tune_more_gpu', 'btn_tune_more_cpu', 'btn_tune_edit_args',
-                'btn_tune_edit_model_perm_args', 'btn_tune_new_gguf',
+                'btn_tune_more_gpu', 'btn_tune_more_cpu', 'btn_tune_budget_plan', 'btn_tune_edit_args',
+                'btn_tune_edit_model_perm_args', 'btn_tune_export_ladder', 'btn_tune_context_search', 'btn_tune_param_search', 'btn_tune_thread_sweep', 'btn_tune_new_gguf',
                 'btn_tune_history', 'btn_tune_quit_tuning'
             ]
             for btn_attr in secondary_nav_buttons:
@@ -2930,7 +3391,10 @@ class KoboldLauncherGUI(ctk.CTk):
 
 
     def _stop_current_monitoring_action(self):
-        if self.tuning_in_progress and self.kcpp_process_obj and self.kcpp_process_obj.poll() is None:
+        if self.autotune_stop_event is not None:
+            self.log_to_console("User requested to stop the autotuner; the current probe is being cleaned up.")
+            self.autotune_stop_event.set()
+        elif self.tuning_in_progress and self.kcpp_process_obj and self.kcpp_process_obj.poll() is None:
             self.log_to_console("User requested to stop current KCPP monitoring.")
             self.user_requested_stop_monitoring = True # Signal the polling loop/monitor thread
         else:
@@ -3011,14 +3475,19 @@ class KoboldLauncherGUI(ctk.CTk):
                 return
             
             # Adjust OT level for continued tuning
-            if action_key in ["save_good_more_gpu", "more_gpu_now"]: # More GPU
-                if self.current_tuning_attempt_level > self.current_tuning_min_level:
-                    self.current_tuning_attempt_level -= 1
-                else: self.log_to_console("Already at Max GPU (Min Level). Cannot decrease further.")
-            elif action_key in ["auto_adjust_cpu", "more_cpu_after_fail", "more_cpu_now"]: # More CPU
-                if self.current_tuning_attempt_level < self.current_tuning_max_level:
-                    self.current_tuning_attempt_level += 1
-                else: self.log_to_console("Already at Max CPU (Max Level). Cannot increase further.")
+            level_step_actions = ["save_good_more_gpu", "more_gpu_now", "auto_adjust_cpu", "more_cpu_after_fail", "more_cpu_now"]
+            if action_key in level_step_actions and self._step_offload_dial(-1 if action_key in ["save_good_more_gpu", "more_gpu_now"] else 1):
+                pass  # The offload dial moved instead of the OT level
+            elif action_key in level_step_actions:
+                self.current_tuning_planned_offload = None  # Stepping the level hands control back to the OT ladder
+                if action_key in ["save_good_more_gpu", "more_gpu_now"]: # More GPU
+                    if self.current_tuning_attempt_level > self.current_tuning_min_level:
+                        self.current_tuning_attempt_level -= 1
+                    else: self.log_to_console("Already at Max GPU (Min Level). Cannot decrease further.")
+                else: # More CPU
+                    if self.current_tuning_attempt_level < self.current_tuning_max_level:
+                        self.current_tuning_attempt_level += 1
+                    else: self.log_to_console("Already at Max CPU (Max Level). Cannot increase further.")
 
             # For "set_as_preferred", "return_to_tuning_menu", or any other action that continues tuning:
             self._return_to_full_tuning_menu() # This also calls update_tuning_display
@@ -3147,7 +3616,7 @@ class KoboldLauncherGUI(ctk.CTk):
         if self.vram_at_decision_for_db is None:  # If not set by a prior monitoring
             self.vram_at_decision_for_db = gpu_info_at_direct_launch.get("free_mb")
 
-        ot_string_for_launch = tensortune_core.generate_overridetensors(self.current_tuning_model_analysis, self.current_tuning_attempt_level)
+        ot_string_for_launch = self._tuning_ot_string()
         
         # Key fix: Properly handle manual GPU layers
         manual_gpu_override_for_command = None
@@ -3380,9 +3849,7 @@ class KoboldLauncherGUI(ctk.CTk):
         last_value = None
         
         for level in level_range:
-            layers = tensortune_core.get_gpu_layers_for_level(
-                self.current_tuning_model_analysis, level
-            )
+            layers = self._tuning_level_entry(level)["gpu_layers"]
             
             # Track unique values and changes
             if layers != last_value:
@@ -3444,23 +3911,112 @@ class KoboldLauncherGUI(ctk.CTk):
             
             self.analyze_model_action(self.current_model_path)
 
+    def open_model_library_dialog(self):
+        """Indexes the configured GGUF directories in the background and shows a searchable model list."""
+        library_dirs = [d for d in [self.config.get("default_gguf_dir"), self.config.get("last_used_gguf_dir")] if d and os.path.isdir(d)]
+        if not library_dirs:
+            messagebox.showinfo("Model Library", "No GGUF directories configured. Set a Default GGUF Directory in Settings first.", parent=self)
+            return
+
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Model Library")
+        dialog.geometry("900x600")
+        dialog.transient(self)
+        dialog.grid_columnconfigure(0, weight=1)
+        dialog.grid_rowconfigure(1, weight=1)
+
+        search_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        search_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(10, 5))
+        search_frame.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(search_frame, text="Search:").grid(row=0, column=0, padx=(0, 5))
+        search_entry = ctk.CTkEntry(search_frame, placeholder_text="e.g. qwen moe q4")
+        search_entry.grid(row=0, column=1, sticky="ew")
+        status_label = ctk.CTkLabel(search_frame, text=f"Indexing {', '.join(library_dirs)}...", anchor="w")
+        status_label.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+
+        results_frame = ctk.CTkScrollableFrame(dialog)
+        results_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=(0, 10))
+        results_frame.grid_columnconfigure(0, weight=1)
+        catalog_holder = {"catalog": []}
+
+        def select_model(filepath):
+            dialog.destroy()
+            if hasattr(self, 'model_path_entry') and self.model_path_entry.winfo_exists():
+                self.model_path_entry.delete(0, "end")
+                self.model_path_entry.insert(0, filepath)
+            self.current_model_path = os.path.abspath(filepath)
+            new_last_dir = os.path.dirname(self.current_model_path)
+            if self.config.get("last_used_gguf_dir") != new_last_dir:
+                self.config["last_used_gguf_dir"] = new_last_dir
+                self.save_config()
+            self.analyze_model_action(self.current_model_path)
+
+        def refresh_results(*_):
+            if not dialog.winfo_exists():
+                return
+            for child in results_frame.winfo_children():
+                child.destroy()
+            matches = tensortune_core.search_model_catalog(catalog_holder["catalog"], search_entry.get())
+            for row_idx, entry in enumerate(matches[:200]):
+                label_text = (f"{entry['filename']}  |  {entry['file_size_gb']:.1f} GB  |  {entry['size_b']}B {entry['quant']}  |  "
+                              f"{entry['num_layers']} layers  |  {'MoE' if entry['is_moe'] else 'Dense'}  |  ~{entry['estimated_vram_gb_full_gpu']:.1f} GB VRAM")
+                ctk.CTkButton(results_frame, text=label_text, anchor="w", fg_color="transparent", border_width=1,
+                              text_color=("gray10", "gray90"),
+                              command=lambda fp=entry["filepath"]: select_model(fp)).grid(row=row_idx, column=0, sticky="ew", pady=1)
+            if len(matches) > 200:
+                ctk.CTkLabel(results_frame, text=f"{len(matches) - 200} more matches; refine the search.").grid(row=200, column=0, sticky="w")
+
+        def on_index_complete(catalog, index_msg):
+            if not dialog.winfo_exists():
+                return
+            catalog_holder["catalog"] = catalog
+            status_label.configure(text=index_msg)
+            self.log_to_console(f"Model library: {index_msg}")
+            refresh_results()
+
+        def index_worker():
+            catalog, index_msg = tensortune_core.index_model_library(self.db_path, library_dirs)
+            try:
+                self.after(0, lambda: on_index_complete(catalog, index_msg))
+            except RuntimeError:
+                pass
+
+        search_entry.bind("<KeyRelease>", refresh_results)
+        threading.Thread(target=index_worker, daemon=True).start()
+        dialog.after(100, search_entry.focus_set)
+
     def analyze_model_action(self, model_filepath_to_analyze: str):
         self.log_to_console(f"Analyzing model: {os.path.basename(model_filepath_to_analyze)}")
-        self.model_analysis_info = tensortune_core.analyze_filename(model_filepath_to_analyze)
+        self.model_analysis_info = tensortune_core.get_model_analysis(model_filepath_to_analyze, self.db_path)
+        if self.model_analysis_info.get('shard_count') and self.model_analysis_info['filepath'] != model_filepath_to_analyze:
+            # KoboldCpp must be given the first part of a split GGUF; history is keyed by it too
+            self.log_to_console(f"Split GGUF detected ({self.model_analysis_info['shard_count']} parts); using first part {os.path.basename(self.model_analysis_info['filepath'])}.")
+            if self.current_model_path == model_filepath_to_analyze:
+                self.current_model_path = self.model_analysis_info['filepath']
+                if hasattr(self, 'model_path_entry') and self.model_path_entry.winfo_exists():
+                    self.model_path_entry.delete(0, "end")
+                    self.model_path_entry.insert(0, self.current_model_path)
+            model_filepath_to_analyze = self.model_analysis_info['filepath']
+        elif tensortune_core.parse_gguf_shard_name(model_filepath_to_analyze) and self.model_analysis_info.get('details', {}).get('metadata_source') != 'gguf_header':
+            self.log_to_console(f"Split GGUF: {self.model_analysis_info['details'].get('gguf_header_error', 'header unreadable')} Using filename estimates.")
         
         moe_str = 'MoE' if self.model_analysis_info.get('is_moe') else 'Dense'
         size_b_str = self.model_analysis_info.get('size_b', "N/A")
+        shard_str = f", {self.model_analysis_info['shard_count']} parts" if self.model_analysis_info.get('shard_count') else ""
         quant_str = self.model_analysis_info.get('quant', "N/A")
         num_layers_str = self.model_analysis_info.get('num_layers', "N/A")
         est_vram_str = self.model_analysis_info.get('estimated_vram_gb_full_gpu', "N/A")
         
         info_text = (
             f"Type: {moe_str}, Size: ~{size_b_str}B, Quant: {quant_str}, "
-            f"Layers: {num_layers_str}, Est. Full VRAM: {est_vram_str}GB"
+            f"Layers: {num_layers_str}, Est. Full VRAM: {est_vram_str}GB{shard_str}"
         )
         if hasattr(self, 'model_info_label') and self.model_info_label.winfo_exists():
             self.model_info_label.configure(text=info_text)
         self.log_to_console(f"Model Analysis Complete - {info_text}")
+        tensor_inventory, _ = tensortune_core.get_tensor_inventory(model_filepath_to_analyze)
+        if tensor_inventory:
+            self.log_to_console(f"Tensor inventory: {tensortune_core.format_tensor_inventory_summary(tensor_inventory)}")
         self.on_model_analyzed()
             
         # If in tuning mode and this is the model being tuned, update tuning analysis
@@ -3472,6 +4028,10 @@ class KoboldLauncherGUI(ctk.CTk):
         """Called after a model is analyzed to handle special cases"""
         if not self.model_analysis_info:
             return
+
+        # Layer counts read from the GGUF header are exact; the corrections below only patch filename guesses
+        if self.model_analysis_info.get('details', {}).get('metadata_source') == 'gguf_header':
+            return
             
         # Special handling for MoE models to ensure they get enough layers
         if self.model_analysis_info.get('is_moe', False):
@@ -0,0 +1,127 @@
+import http.server
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tensortune_core  # noqa: E402
+
+
+class _FakeKoboldHandler(http.server.BaseHTTPRequestHandler):
+    """KoboldCpp's generate endpoint; /api/extra/perf reports timings for the last request unless perf_enabled is off."""
+    perf_enabled = True
+    last_max_length = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).last_max_length = body["max_length"]
+        self._send_json({"results": [{"text": "The wind rose."}]})
+
+    def do_GET(self):
+        if self.path != "/api/extra/perf" or not self.perf_enabled:
+            self.send_response(404)
+            self.end_headers()
+            return
+        generated = type(self).last_max_length
+        self._send_json({"last_token_count": generated, "last_eval": generated / 40.0,
+                         "last_input_count": 300, "last_process": 0.5})
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class BenchmarkKoboldcppTests(unittest.TestCase):
+    def setUp(self):
+        handler = type("Handler", (_FakeKoboldHandler,), {})
+        self.handler = handler
+        self.server = http.server.ThreadingHTTPServer(("localhost", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.port = self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_uses_perf_endpoint_timings(self):
+        result = tensortune_core.benchmark_koboldcpp(self.port, repeats=3, max_tokens=16, timeout_s=10)
+        self.assertTrue(result["success"])
+        self.assertEqual(result["source"], "perf")
+        self.assertEqual(result["repeats"], 3)
+        self.assertAlmostEqual(result["gen_tokens_per_second"], 40.0)
+        self.assertAlmostEqual(result["prompt_tokens_per_second"], 600.0)
+        self.assertAlmostEqual(result["ttft_seconds"], 0.5 + 1 / 40.0)
+
+    def test_falls_back_to_wall_clock_without_perf(self):
+        self.handler.perf_enabled = False
+        result = tensortune_core.benchmark_koboldcpp(self.port, repeats=1, max_tokens=16, timeout_s=10)
+        self.assertTrue(result["success"])
+        self.assertEqual(result["source"], "wall clock")
+        self.assertGreater(result["gen_tokens_per_second"], 0)
+        self.assertIsNone(result["prompt_tokens_per_second"])
+        self.assertIsNone(result["ttft_seconds"])
+
+    def test_connection_refused_fails_cleanly(self):
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            closed_port = sock.getsockname()[1]
+        result = tensortune_core.benchmark_koboldcpp(closed_port, repeats=1, timeout_s=5)
+        self.assertFalse(result["success"])
+        self.assertIn("Benchmark request failed", result["message"])
+
+
+class SaveBenchmarkToDbTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, "history.db")
+        tensortune_core.init_db(self.db_file)
+        self.model_path = os.path.join(self.temp_dir.name, "Bench-7B-Q4_K_M.gguf")
+        self.model_analysis = tensortune_core.analyze_filename(self.model_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _benchmark(self, gen_tps):
+        return {"success": True, "gen_tokens_per_second": gen_tps, "prompt_tokens_per_second": 500.0, "ttft_seconds": 0.4}
+
+    def _launch(self, gpu_layers, gen_tps):
+        command = ["koboldcpp", "--model", self.model_path, "--gpulayers", str(gpu_layers)]
+        tensortune_core.save_config_to_db(self.db_file, self.model_path, self.model_analysis, 8000, command, 0,
+                                          "SUCCESS_LOAD_VRAM_OK_GUI", 6000)
+        return tensortune_core.save_benchmark_to_db(self.db_file, self.model_path, 8000, command, 0, self._benchmark(gen_tps))
+
+    def test_fastest_benchmarked_launch_is_best(self):
+        self.assertTrue(self._launch(24, 18.0)[0])
+        self.assertTrue(self._launch(20, 12.5)[0])  # Newer, but slower
+        best = tensortune_core.find_best_historical_config(
+            self.db_file, self.model_analysis, 8000, tensortune_core.DEFAULT_CONFIG_TEMPLATE.copy())
+        self.assertIsNotNone(best)
+        self.assertEqual(best["bench_gen_tps"], 18.0)
+        self.assertEqual(tensortune_core.args_list_to_dict(best["args_list"])["--gpulayers"], "24")
+
+    def test_unknown_launch_is_not_saved(self):
+        saved, message = tensortune_core.save_benchmark_to_db(
+            self.db_file, self.model_path, 8000, ["koboldcpp", "--model", self.model_path], 0, self._benchmark(10.0))
+        self.assertFalse(saved)
+        self.assertIn("no matching launch record", message)
+
+    def test_failed_benchmark_is_not_saved(self):
+        saved, _ = tensortune_core.save_benchmark_to_db(
+            self.db_file, self.model_path, 8000, ["koboldcpp"], 0, {"success": False, "message": "refused"})
+        self.assertFalse(saved)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,271 @@
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tensortune_core  # noqa: E402
+
+GGML_F32, GGML_F16, GGML_Q4_K = 0, 1, 12
+_GGML_BLOCKS = {GGML_F32: (1, 4), GGML_F16: (1, 2), GGML_Q4_K: (256, 144)}  # type: (block size, bytes per block)
+_GGUF_UINT32, _GGUF_FLOAT32, _GGUF_STRING = 4, 6, 8
+
+
+def write_gguf(path, metadata, tensors, version=3, endian="<", alignment=32):
+    """
+    Writes a GGUF with the given metadata [(key, value)] and tensor table [(name, dims, ggml_type)].
+    The file is extended to its full size without writing tensor data, so large shapes stay cheap.
+    """
+    len_fmt = endian + ("I" if version == 1 else "Q")
+    dim_fmt = len_fmt
+
+    def gguf_str(text):
+        data = text.encode("utf-8")
+        return struct.pack(len_fmt, len(data)) + data
+
+    out = bytearray(b"GGUF" + struct.pack(endian + "I", version))
+    out += struct.pack(len_fmt, len(tensors)) + struct.pack(len_fmt, len(metadata))
+    for key, value in metadata:
+        out += gguf_str(key)
+        if isinstance(value, str):
+            out += struct.pack(endian + "I", _GGUF_STRING) + gguf_str(value)
+        elif isinstance(value, float):
+            out += struct.pack(endian + "If", _GGUF_FLOAT32, value)
+        else:
+            out += struct.pack(endian + "II", _GGUF_UINT32, value)
+    offset = 0
+    for name, dims, ggml_type in tensors:
+        out += gguf_str(name) + struct.pack(endian + "I", len(dims))
+        out += b"".join(struct.pack(dim_fmt, dim) for dim in dims)
+        out += struct.pack(endian + "I", ggml_type) + struct.pack(endian + "Q", offset)
+        n_elements = 1
+        for dim in dims:
+            n_elements *= dim
+        block_size, type_size = _GGML_BLOCKS[ggml_type]
+        offset += -(-(n_elements // block_size * type_size) // alignment) * alignment
+    out += b"\0" * (-len(out) % alignment)
+    with open(path, "wb") as fh:
+        fh.write(out)
+        fh.truncate(len(out) + offset)
+    return len(out)
+
+
+def llama_gguf(path, n_layer=4, n_embd=256, n_head=8, n_head_kv=2, n_ff=512, n_vocab=1024, extra_blocks=0, **kwargs):
+    """A small llama-architecture GGUF; extra_blocks adds tensors past block_count (like an MTP layer)."""
+    metadata = [
+        ("general.architecture", "llama"), ("general.name", "Tiny"), ("llama.block_count", n_layer),
+        ("llama.context_length", 8192), ("llama.embedding_length", n_embd), ("llama.feed_forward_length", n_ff),
+        ("llama.attention.head_count", n_head), ("llama.attention.head_count_kv", n_head_kv),
+        ("llama.rope.freq_base", 10000.0),
+    ]
+    head_dim = n_embd // n_head
+    tensors = [("token_embd.weight", (n_embd, n_vocab), GGML_Q4_K)]
+    for i in range(n_layer + extra_blocks):
+        tensors += [
+            (f"blk.{i}.attn_norm.weight", (n_embd,), GGML_F32),
+            (f"blk.{i}.attn_q.weight", (n_embd, n_embd), GGML_Q4_K),
+            (f"blk.{i}.attn_k.weight", (n_embd, n_head_kv * head_dim), GGML_Q4_K),
+            (f"blk.{i}.attn_v.weight", (n_embd, n_head_kv * head_dim), GGML_Q4_K),
+            (f"blk.{i}.attn_output.weight", (n_embd, n_embd), GGML_Q4_K),
+            (f"blk.{i}.ffn_norm.weight", (n_embd,), GGML_F32),
+            (f"blk.{i}.ffn_gate.weight", (n_embd, n_ff), GGML_Q4_K),
+            (f"blk.{i}.ffn_up.weight", (n_embd, n_ff), GGML_Q4_K),
+            (f"blk.{i}.ffn_down.weight", (n_ff, n_embd), GGML_Q4_K),
+        ]
+    tensors += [("output_norm.weight", (n_embd,), GGML_F32), ("output.weight", (n_embd, n_vocab), GGML_F16)]
+    write_gguf(path, metadata, tensors, **kwargs)
+    return tensors
+
+
+class ReadGgufHeaderTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.temp_dir.name, "Tiny-1B-Q4_K_M.gguf")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _assert_tiny_header(self, header, version, endian):
+        self.assertIsNotNone(header)
+        self.assertEqual(header["version"], version)
+        self.assertEqual(header["endian"], endian)
+        self.assertEqual(header["metadata"]["general.architecture"], "llama")
+        self.assertEqual(header["metadata"]["llama.block_count"], 4)
+        self.assertAlmostEqual(header["metadata"]["llama.rope.freq_base"], 10000.0)
+        self.assertEqual(header["tensor_count"], 1 + 4 * 9 + 2)
+        self.assertEqual(header["tensors"][0], ("token_embd.weight", (256, 1024), GGML_Q4_K, 0))
+        self.assertEqual(header["data_offset"] % header["alignment"], 0)
+
+    def test_reads_every_version(self):
+        for version in (1, 2, 3):
+            with self.subTest(version=version):
+                llama_gguf(self.model_path, version=version)
+                header, message = tensortune_core.read_gguf_header(self.model_path)
+                self._assert_tiny_header(header, version, "<")
+                self.assertIn(f"GGUF v{version}", message)
+
+    def test_reads_big_endian(self):
+        llama_gguf(self.model_path, endian=">")
+        header, _ = tensortune_core.read_gguf_header(self.model_path)
+        self._assert_tiny_header(header, 3, ">")
+
+    def test_tensor_table_is_read_in_order(self):
+        tensors = llama_gguf(self.model_path)
+        header, _ = tensortune_core.read_gguf_header(self.model_path)
+        self.assertEqual([t[0] for t in header["tensors"]], [t[0] for t in tensors])
+        self.assertEqual([t[1] for t in header["tensors"]], [t[1] for t in tensors])
+        self.assertLess(header["data_offset"] + header["tensors"][-1][3], header["file_size"])
+
+    def test_truncated_header_fails_cleanly(self):
+        header_size = write_gguf(self.model_path, [("general.architecture", "llama")],
+                                 [("token_embd.weight", (256, 1024), GGML_Q4_K)])
+        with open(self.model_path, "r+b") as fh:
+            fh.truncate(header_size - 40)  # Inside the tensor-info table
+        header, message = tensortune_core.read_gguf_header(self.model_path)
+        self.assertIsNone(header)
+        self.assertIn("Failed to read GGUF header", message)
+
+    def test_corrupt_tensor_table_falls_back_to_filename(self):
+        for label, ggml_type, offset in (("type", 70000, 0), ("offset", GGML_Q4_K, 2**64 - 8)):
+            with self.subTest(corrupt=label):
+                write_gguf(self.model_path, [("general.architecture", "llama")], [("token_embd.weight", (256, 1024), GGML_Q4_K)])
+                with open(self.model_path, "r+b") as fh:
+                    dims_at = fh.read(4096).index(b"token_embd.weight") + len("token_embd.weight") + 4
+                    fh.seek(dims_at + 2 * 8)  # The tensor's ggml type, then its data offset
+                    fh.write(struct.pack("<IQ", ggml_type, offset))
+                header, message = tensortune_core.read_gguf_header(self.model_path)
+                self.assertIsNone(header)
+                self.assertIn("token_embd.weight", message)
+                analysis = tensortune_core.analyze_filename(self.model_path)
+                self.assertEqual(analysis["details"]["metadata_source"], "filename")
+
+    def test_missing_tensor_data_fails_cleanly(self):
+        llama_gguf(self.model_path)
+        os.truncate(self.model_path, os.path.getsize(self.model_path) // 2)
+        header, message = tensortune_core.read_gguf_header(self.model_path)
+        self.assertIsNone(header)
+        self.assertIn("extends past the end of the file", message)
+
+    def test_rejects_other_files(self):
+        with open(self.model_path, "wb") as fh:
+            fh.write(b"GGML" + b"\0" * 64)
+        self.assertEqual(tensortune_core.read_gguf_header(self.model_path), (None, "Not a GGUF file (bad magic)."))
+        with open(self.model_path, "wb") as fh:
+            fh.write(b"GGUF" + struct.pack("<I", 4) + b"\0" * 16)
+        self.assertEqual(tensortune_core.read_gguf_header(self.model_path), (None, "Unsupported GGUF version 4."))
+
+
+class CalculateKvCacheBytesTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        model_path = os.path.join(self.temp_dir.name, "Tiny-1B-Q4_K_M.gguf")
+        llama_gguf(model_path, n_layer=4, n_embd=256, n_head=8, n_head_kv=2)
+        self.analysis = tensortune_core.analyze_filename(model_path)
+        self.row_elements = 2 * 32  # n_head_kv * head_dim, for K and for V
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_f16_cache_from_header(self):
+        kv = tensortune_core.calculate_kv_cache_bytes(self.analysis, 4096)
+        self.assertTrue(kv["success"])
+        self.assertEqual(kv["total_bytes"], 4 * 4096 * (self.row_elements * 2 + self.row_elements * 2))
+        self.assertEqual(kv["gpu_bytes"], kv["total_bytes"])
+        self.assertEqual((kv["k_type"], kv["v_type"]), ("F16", "F16"))
+
+    def test_quantized_k_without_flash_attention_splits_by_gpu_layers(self):
+        kv = tensortune_core.calculate_kv_cache_bytes(self.analysis, 4096, quantkv=1, flash_attention=False, gpu_layers=1)
+        per_layer = 4096 * (self.row_elements * 1.0625 + self.row_elements * 2)  # Q8_0 K; V stays F16 without flash attention
+        self.assertEqual((kv["k_type"], kv["v_type"]), ("Q8_0", "F16"))
+        self.assertEqual(kv["gpu_bytes"], per_layer)
+        self.assertEqual(kv["cpu_bytes"], 3 * per_layer)
+
+    def test_lowvram_keeps_cache_on_cpu(self):
+        kv = tensortune_core.calculate_kv_cache_bytes(self.analysis, 2048, kv_offload=False)
+        self.assertEqual(kv["gpu_bytes"], 0)
+        self.assertEqual(kv["cpu_bytes"], kv["total_bytes"])
+
+    def test_filename_only_analysis_has_no_estimate(self):
+        analysis = tensortune_core.analyze_filename(os.path.join(self.temp_dir.name, "Missing-7B-Q4_K_M.gguf"))
+        self.assertFalse(tensortune_core.calculate_kv_cache_bytes(analysis, 4096)["success"])
+
+
+class SynthesizeOverridePatternTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        model_path = os.path.join(self.temp_dir.name, "Deep-1B-Q4_K_M.gguf")
+        # 48 counted blocks plus one past block_count, which '[1-9]\d'-style padding would wrongly cover
+        llama_gguf(model_path, n_layer=48, n_embd=64, n_head=4, n_ff=128, n_vocab=64, extra_blocks=1)
+        self.inventory, _ = tensortune_core.get_tensor_inventory(model_path)
+        self.names = ["ffn_up", "ffn_down"]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _matched_blocks(self, pattern):
+        return sorted({self.inventory.blocks[i] for i in self.inventory.indices_matching(pattern)})
+
+    def test_index_regex(self):
+        self.assertEqual(tensortune_core.synthesize_index_regex(list(range(1, 48, 2)), 48), "\\d*[13579]")
+        self.assertEqual(tensortune_core.synthesize_index_regex(list(range(10, 48)), 48), "[1-9]\\d")
+        self.assertEqual(tensortune_core.synthesize_index_regex(list(range(48)), 48), "\\d+")
+        self.assertEqual(tensortune_core.synthesize_index_regex([3, 17, 22], 48), "(3|17|22)")
+        self.assertEqual(tensortune_core.synthesize_index_regex([], 48), "NONE")
+
+    def test_odd_blocks_pattern_is_verified(self):
+        blocks = list(range(1, 48, 2))
+        pattern = tensortune_core.synthesize_block_override_pattern(blocks, self.names, 48, self.inventory)
+        self.assertEqual(pattern, "blk\\.\\d*[13579]\\.(ffn_up|ffn_down)\\.weight")
+        self.assertEqual(self._matched_blocks(pattern), blocks)
+        self.assertEqual(len(self.inventory.indices_matching(pattern)), 2 * len(blocks))
+
+    def test_padded_range_falls_back_when_it_matches_extra_blocks(self):
+        blocks = list(range(10, 48))
+        unverified = tensortune_core.synthesize_block_override_pattern(blocks, self.names, 48)
+        self.assertEqual(unverified, "blk\\.[1-9]\\d\\.(ffn_up|ffn_down)\\.weight")
+        self.assertEqual(self._matched_blocks(unverified), blocks + [48])
+        pattern = tensortune_core.synthesize_block_override_pattern(blocks, self.names, 48, self.inventory)
+        self.assertEqual(pattern, f"blk\\.({'|'.join(map(str, blocks))})\\.(ffn_up|ffn_down)\\.weight")
+        self.assertEqual(self._matched_blocks(pattern), blocks)
+
+
+class SimulateOverrideTensorsTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        model_path = os.path.join(self.temp_dir.name, "Tiny-1B-Q4_K_M.gguf")
+        llama_gguf(model_path, n_layer=4)
+        self.analysis = tensortune_core.analyze_filename(model_path)
+        self.inventory, _ = tensortune_core.get_tensor_inventory(model_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _bytes(self, names):
+        return sum(self.inventory.nbytes[self.inventory.names.index(name)] for name in names)
+
+    def test_first_matching_rule_wins(self):
+        simulation = tensortune_core.simulate_override_tensors(
+            self.analysis, "blk\\.0\\.ffn_.*=CUDA0,ffn_.*=CPU,blk\\.9\\.attn_q=CPU")
+        self.assertTrue(simulation["success"])
+        keep_rule, cpu_rule, dead_rule = simulation["rules"]
+        ffn_names = ["ffn_norm", "ffn_gate", "ffn_up", "ffn_down"]
+        self.assertEqual(keep_rule["matched"], 4)  # blk.0's FFN tensors never reach the CPU rule
+        self.assertEqual(cpu_rule["matched"], 3 * 4)
+        self.assertEqual(cpu_rule["bytes"], self._bytes(f"blk.{i}.{n}.weight" for i in (1, 2, 3) for n in ffn_names))
+        self.assertEqual(dead_rule["matched"], 0)
+        self.assertEqual(simulation["unmatched_subpatterns"], ["blk\\.9\\.attn_q"])
+        self.assertEqual(simulation["cpu_bytes"], cpu_rule["bytes"] + self._bytes(["token_embd.weight"]))  # Embeddings stay on CPU
+        self.assertEqual(simulation["cpu_bytes"] + simulation["gpu_bytes"], self.inventory.total_bytes)
+
+    def test_invalid_rule_is_reported(self):
+        simulation = tensortune_core.simulate_override_tensors(self.analysis, "blk\\.(=CPU,ffn_up=CPU")
+        self.assertTrue(simulation["success"])
+        self.assertIsNotNone(simulation["rules"][0]["error"])
+        self.assertEqual(simulation["rules"][1]["matched"], 4)
+        self.assertEqual(len(simulation["errors"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()